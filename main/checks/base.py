@@ -1,11 +1,25 @@
 from abc import ABC, abstractmethod 
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+from .os_detector import get_host_facts
+from .result import CheckResult, Metric
+from .process_scan import describe, process_scanner
+from tools.baseline import baseline_store
 
 #abc is a built in module in Python that provides tools for defining abstract base classes.
 #it allows you to create classes that cannot be instantiated directly, and must be subclassed by other classes.
 #@ is a decorator that is used to define abstract methods in a class.  an abstract method is a method that is declared but contains no implementation.
 #subclasses of the abstract base class must provide an implementation for the abstract method in order to be instantiated.
 
+# Ordering used when several statuses have to be collapsed into one.
+STATUS_SEVERITY = {"OK": 0, "UNKNOWN": 1, "WARN": 2, "CRIT": 3}
+
+
+def worst_status(*statuses: str) -> str:
+    """Return the most severe of `statuses` ("OK" if none are given)."""
+    return max(statuses, key=lambda status: STATUS_SEVERITY.get(status, 1), default="OK")
+
+
 class Check(ABC):
     """
     Abstract base for all Argus checks.
@@ -13,25 +27,87 @@ class Check(ABC):
     """
     name: str = "base"
 
+    # Other names this check answers to in config (e.g. components_enabled uses "RAM").
+    aliases: tuple = ()
+
+    # Maps platform.system() names to the method that gathers this check's
+    # results on that platform, e.g. {"Linux": "_get_linux_disk_info"}.
+    platform_collectors: Dict[str, str] = {}
+
+    # When set ("cpu" or "memory"), a WARN/CRIT result on Linux gets the top
+    # processes by that resource attached (see process_scan.py).
+    process_ranking: str = None
+
     def __init__(self, config: Dict[str, Any]):
         self.config = config
+        # Resolve the collector for this host once instead of branching on the OS every run.
+        self.os_type = get_host_facts().operating_system
+        collector_name = self.platform_collectors.get(self.os_type)
+        self._collector = getattr(self, collector_name) if collector_name else None
+        # (metric_name, value, warn, crit) of every evaluate() call in the latest
+        # run, for schedulers that adapt to how close a metric is to its thresholds.
+        self.last_evaluations = []
 
     @abstractmethod
-    def run(self) -> Dict[str, Any]:
+    def run(self, snapshot=None) -> List[CheckResult]:
         """
-        Execute the check and return:
+        Execute the check and return a list of CheckResult (see result.py), each with:
           - name (str)
-          - status ("OK","WARN","CRIT","UNKNOWN")
-          - metrics (Dict[str, Any])
+          - status (Status: OK, WARN, CRIT, UNKNOWN)
+          - metrics (tuple of Metric: name, value, unit)
           - details (Optional[str])
+
+        `snapshot` is the cycle's SnapshotView (see snapshot.py); kernel
+        sources should be read through it so each is read once per cycle.
+        Checks run on their own may get None and read sources directly.
+        """
+
+    def collect(self, snapshot=None) -> List[CheckResult]:
         """
+        Run the collector registered for this platform in `platform_collectors`,
+        passing it the cycle snapshot. Returns a single UNKNOWN result on
+        platforms without one.
+
+        Metrics with a learned baseline (see tools/baseline.py) are scored
+        against it, which can raise a result's status beyond what the static
+        thresholds in evaluate() gave it.
+        """
+        self.last_evaluations = []
+        if self._collector is None:
+            return [CheckResult.unknown(self.name, "Unsupported OS: {}", self.os_type)]
+        results = self._collector(snapshot)
+        if baseline_store.watches(self.name):
+            baseline_store.observe(self.name, results)
+        if self.process_ranking and self.os_type == "Linux":
+            self._attach_top_processes(results)
+        return results
+
+    def _attach_top_processes(self, results):
+        """Answer "which process?" for breached results; nothing is scanned while all is well."""
+        breached = [result for result in results if result.status.severity >= STATUS_SEVERITY["WARN"]]
+        scan_config = self.config.get("process_scan", {})
+        if not breached or not scan_config.get("enabled", True):
+            return
+
+        top = process_scanner.scan(self.process_ranking, int(scan_config.get("top_n", 5)))
+        if not top:
+            return
+        summary = describe(top)
+        for result in breached:
+            result.metrics = result.metrics + (Metric("Top Processes", tuple(top)),)
+            result.extend_details(f"Top processes: {summary}.")
 
     def evaluate(self, metric_name: str, value: float) -> str:
         """
         Compare `value` against `self.config['thresholds'][self.name]` definitions.
+        A nested entry named after the metric (e.g. thresholds['disk']['io_wait_time'])
+        overrides the component-wide warn/crit for that metric.
         Returns status string.
         """
         thresholds = self.config.get('thresholds', {}).get(self.name, {})
+        if isinstance(thresholds.get(metric_name), dict):
+            thresholds = thresholds[metric_name]
+        self.last_evaluations.append((metric_name, value, thresholds.get('warn'), thresholds.get('crit')))
         if value >= thresholds.get('crit', float('inf')):
             return "CRIT"
         if value >= thresholds.get('warn', float('inf')):
@@ -0,0 +1,548 @@
+"""
+Per-cgroup resource accounting for cgroup v2.
+
+Host-wide CPU, memory and disk figures cannot say which container is the
+problem. CgroupCheck walks the cgroup v2 tree and reports CPU, throttling,
+memory, OOM kills, I/O and pressure for every cgroup, each evaluated against
+that cgroup's own limits (cpu.max, cpuset, memory.max) and its ancestors'.
+
+The tree is not re-walked every cycle: the root's cgroup.stat counts the
+descendants, so the walk is repeated only when that count changes, a known
+cgroup disappears, or rescan_interval_sec passes (to catch a create and a
+remove in the same interval). Between walks, every stat file is read through
+a descriptor kept open across cycles with pread() at offset 0. A removed
+cgroup fails that read (ENODEV), which drops it and triggers a rescan.
+
+CgroupLimitSampler covers the other direction: the limits of the cgroup the
+agent itself runs in, so CPUCheck and RAMCheck can report against the CPUs and
+memory the container actually has rather than the host's /proc figures.
+
+Every path comes from the root given to the samplers, so they can be pointed
+at a fake cgroupfs tree.
+"""
+
+from .base import Check, worst_status
+from ..logging_setup import configure_daily_logging
+from .snapshot import host_facts, read_source, sample_time
+from .result import CheckResult, Metric, UNIT_BYTES, UNIT_BYTES_PER_SECOND, UNIT_COUNT, UNIT_PERCENT, UNIT_PER_SECOND
+from ..utils.procfs import parse_vmstat, parse_pressure, parse_io_stat, parse_cgroup_max, parse_cpu_list
+from tools.write_to_json_file import write_to_check_results
+
+import fnmatch
+import os
+import re
+import threading
+import time
+import logging
+
+configure_daily_logging()
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DEPTH = 4
+DEFAULT_MAX_CGROUPS = 1000
+DEFAULT_RESCAN_INTERVAL = 60.0
+# Limits change rarely; the agent's own are re-read this often.
+LIMIT_REFRESH_SECONDS = 60.0
+
+try:
+    import resource
+    _OPEN_FILE_LIMIT = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+except (ImportError, ValueError, OSError):
+    _OPEN_FILE_LIMIT = 1024
+
+# The files read from every cgroup that has them (controllers not enabled for
+# a cgroup leave their files out).
+STAT_FILES = (
+    "cpu.stat", "cpu.max", "cpuset.cpus.effective",
+    "memory.current", "memory.max", "memory.stat", "memory.events",
+    "io.stat", "cpu.pressure", "memory.pressure", "io.pressure",
+)
+
+CPU_STAT_KEYS = ("usage_usec", "throttled_usec", "nr_throttled", "nr_periods")
+MEMORY_EVENT_KEYS = ("high", "max", "oom", "oom_kill")
+# Counters turned into per-interval deltas.
+COUNTERS = ("usage_usec", "throttled_usec", "nr_throttled", "oom_kill", "high", "rbytes", "wbytes", "rios", "wios")
+_PRESSURE_LABELS = {"cpu": "CPU", "memory": "Memory", "io": "IO"}
+
+
+def _cpu_limit(files):
+    """CPUs the cgroup may use: the cpu.max quota, capped by its cpuset. None when unlimited."""
+    limit = None
+    cpu_max = parse_cgroup_max(files["cpu.max"]) if files.get("cpu.max") else None
+    if cpu_max and cpu_max[0] is not None and cpu_max[1]:
+        limit = cpu_max[0] / cpu_max[1]
+    cpus = parse_cpu_list(files.get("cpuset.cpus.effective"))
+    if cpus and (limit is None or len(cpus) < limit):
+        limit = float(len(cpus))
+    return limit
+
+
+def _min_limit(*limits):
+    limits = [limit for limit in limits if limit is not None]
+    return min(limits) if limits else None
+
+
+def parse_cgroup_files(files):
+    """
+    Turn the raw text of a cgroup's STAT_FILES (name -> text, missing files
+    absent) into counters and gauges: (counters, memory_current,
+    working_set, memory_limit, cpu_limit, pressure).
+    """
+    counters = parse_vmstat(files.get("cpu.stat", ""), CPU_STAT_KEYS)
+    counters.update(parse_vmstat(files.get("memory.events", ""), MEMORY_EVENT_KEYS))
+    for device in parse_io_stat(files.get("io.stat", "")).values():
+        for key in ("rbytes", "wbytes", "rios", "wios"):
+            counters[key] = counters.get(key, 0) + device.get(key, 0)
+
+    memory_current = int(files["memory.current"]) if files.get("memory.current") else None
+    working_set = memory_current
+    if memory_current is not None and files.get("memory.stat"):
+        # What the kernel cannot reclaim easily: usage minus inactive page cache.
+        inactive_file = parse_vmstat(files["memory.stat"], ("inactive_file",)).get("inactive_file", 0)
+        working_set = max(memory_current - inactive_file, 0)
+    memory_limit = parse_cgroup_max(files["memory.max"]) if files.get("memory.max") else None
+
+    pressure = {
+        resource_name: parse_pressure(files[f"{resource_name}.pressure"])
+        for resource_name in ("cpu", "memory", "io") if files.get(f"{resource_name}.pressure")
+    }
+    return counters, memory_current, working_set, memory_limit, _cpu_limit(files), pressure
+
+
+class _Cgroup:
+
+    __slots__ = ("name", "path", "parent", "files", "fds", "previous", "previous_time")
+
+    def __init__(self, name, path, parent, files):
+        self.name = name
+        self.path = path
+        self.parent = parent
+        self.files = files
+        self.fds = {}
+        self.previous = None
+        self.previous_time = None
+
+
+class CgroupTreeSampler:
+    """
+    Persistent sampler of a cgroup v2 tree. Each call to sample() reads every
+    known cgroup's stat files once and returns their figures, with counter
+    deltas for the interval since the previous call. A cgroup seen for the
+    first time has no interval yet and reports gauges only.
+    """
+
+    def __init__(self, root: str, max_depth: int = DEFAULT_MAX_DEPTH, max_cgroups: int = DEFAULT_MAX_CGROUPS,
+                 rescan_interval: float = DEFAULT_RESCAN_INTERVAL, exclude=(), max_cached_fds: int = None):
+        self.root = root.rstrip("/") or "/"
+        self.max_depth = max_depth
+        self.max_cgroups = max_cgroups
+        self.rescan_interval = rescan_interval
+        self._exclude = re.compile("|".join(fnmatch.translate(pattern) for pattern in exclude)) if exclude else None
+        # The process scanner may hold up to half of the open-file limit; stay within a quarter.
+        limit = max(0, _OPEN_FILE_LIMIT // 4 - 64)
+        self.max_cached_fds = limit if max_cached_fds is None else min(max_cached_fds, limit)
+        self.scans = 0
+        self._cached_fds = 0
+        self._cgroups = {}
+        self._descendants = None
+        self._scanned_at = None
+        self._lock = threading.Lock()
+
+    def _relative(self, path):
+        relative = path[len(self.root):]
+        return relative or "/"
+
+    def _scan(self, now):
+        """Walk the tree breadth first, keeping the state of cgroups that are still there."""
+        previous = self._cgroups
+        found = {}
+        level = [(self.root, None)]
+        depth = 0
+        while level and len(found) < self.max_cgroups:
+            next_level = []
+            for path, parent in level:
+                try:
+                    entries = list(os.scandir(path))
+                except OSError:
+                    continue
+                name = self._relative(path)
+                files = frozenset(entry.name for entry in entries if entry.name in STAT_FILES or entry.name == "cgroup.stat")
+                cgroup = previous.get(name)
+                if cgroup is None or cgroup.files != files:
+                    if cgroup is not None:
+                        self._close(cgroup)
+                    cgroup = _Cgroup(name, path, parent, files)
+                else:
+                    cgroup.parent = parent
+                found[name] = cgroup
+                if len(found) >= self.max_cgroups:
+                    logger.warning(f"Cgroup tree under {self.root} has more than {self.max_cgroups} cgroups; reporting the first {self.max_cgroups}")
+                    break
+                if depth < self.max_depth:
+                    for entry in entries:
+                        if not entry.is_dir(follow_symlinks=False):
+                            continue
+                        child = os.path.join(path, entry.name)
+                        if self._exclude is not None and self._exclude.match(self._relative(child)):
+                            continue
+                        next_level.append((child, name))
+            level = next_level
+            depth += 1
+
+        for name, cgroup in previous.items():
+            if found.get(name) is not cgroup:
+                self._close(cgroup)
+        self._cgroups = found
+        self._scanned_at = now
+        self.scans += 1
+
+    def _close(self, cgroup):
+        for fd in cgroup.fds.values():
+            os.close(fd)
+        self._cached_fds -= len(cgroup.fds)
+        cgroup.fds.clear()
+
+    def _read(self, cgroup, filename):
+        """Text of one of the cgroup's files, or None once the cgroup is gone."""
+        fd = cgroup.fds.get(filename)
+        if fd is not None:
+            try:
+                return os.pread(fd, 65536, 0).decode("utf-8", "replace")
+            except OSError:
+                return None
+
+        try:
+            fd = os.open(os.path.join(cgroup.path, filename), os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            data = os.pread(fd, 65536, 0)
+        except OSError:
+            os.close(fd)
+            return None
+        if self._cached_fds < self.max_cached_fds:
+            cgroup.fds[filename] = fd
+            self._cached_fds += 1
+        else:
+            os.close(fd)
+        return data.decode("utf-8", "replace")
+
+    def _read_files(self, cgroup):
+        """{filename: text} of the cgroup's stat files, or None once the cgroup is gone."""
+        files = {}
+        for filename in cgroup.files:
+            if filename == "cgroup.stat":
+                continue
+            text = self._read(cgroup, filename)
+            if text is None:
+                return None
+            files[filename] = text
+        return files
+
+    def _root_descendants(self):
+        root = self._cgroups.get("/")
+        if root is None or "cgroup.stat" not in root.files:
+            return None
+        stat = self._read(root, "cgroup.stat")
+        return parse_vmstat(stat, ("nr_descendants",)).get("nr_descendants") if stat else None
+
+    def sample(self, now=None):
+        """
+        Return [stats] in tree order, one dict per cgroup with name,
+        memory_current, working_set, effective memory_limit and cpu_limit,
+        pressure, and deltas/elapsed (None on a cgroup's first sample).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            descendants = self._root_descendants()
+            if self._scanned_at is None or now - self._scanned_at >= self.rescan_interval or descendants != self._descendants:
+                self._scan(now)
+                descendants = self._root_descendants()
+            self._descendants = descendants
+
+            stats = []
+            limits = {}
+            vanished = []
+            for name, cgroup in self._cgroups.items():
+                files = self._read_files(cgroup)
+                if files is None:
+                    vanished.append(name)
+                    continue
+
+                counters, memory_current, working_set, memory_limit, cpu_limit, pressure = parse_cgroup_files(files)
+                parent_memory_limit, parent_cpu_limit = limits.get(cgroup.parent, (None, None))
+                memory_limit = _min_limit(memory_limit, parent_memory_limit)
+                cpu_limit = _min_limit(cpu_limit, parent_cpu_limit)
+                limits[name] = (memory_limit, cpu_limit)
+
+                deltas = elapsed = None
+                if cgroup.previous is not None and now > cgroup.previous_time:
+                    elapsed = now - cgroup.previous_time
+                    # Counters only go back if the cgroup was recreated under the same name.
+                    deltas = {key: max(counters.get(key, 0) - cgroup.previous.get(key, 0), 0) for key in COUNTERS}
+                cgroup.previous, cgroup.previous_time = counters, now
+
+                # The real root has no limit files; it stands for the whole host, which the other checks cover.
+                if name == "/" and "cpu.max" not in cgroup.files and "memory.max" not in cgroup.files:
+                    continue
+                stats.append({
+                    "name": name,
+                    "deltas": deltas,
+                    "elapsed": elapsed,
+                    "memory_current": memory_current,
+                    "working_set": working_set,
+                    "memory_limit": memory_limit,
+                    "cpu_limit": cpu_limit,
+                    "pressure": pressure,
+                })
+
+            for name in vanished:
+                self._close(self._cgroups.pop(name))
+            if vanished:
+                # Pick up whatever replaced them on the next call.
+                self._scanned_at = None
+            return stats
+
+    def close(self):
+        with self._lock:
+            for cgroup in self._cgroups.values():
+                self._close(cgroup)
+            self._cgroups = {}
+            self._scanned_at = None
+
+
+class CgroupLimitSampler:
+    """
+    Limits and usage of the cgroup the agent runs in. The limits are the
+    tightest on the way up to the cgroup root, re-read every
+    LIMIT_REFRESH_SECONDS. cpu() returns the CPUs used since its previous
+    call, so only one caller (CPUCheck) should use it.
+    """
+
+    def __init__(self):
+        self._previous = None
+        self._limits = None
+        self._limits_key = None
+        self._limits_at = None
+        self._lock = threading.Lock()
+
+    def _locate(self, snapshot, directory, root):
+        if directory is None:
+            facts = host_facts(snapshot)
+            directory, root = facts.cgroup, facts.cgroup_root
+        return directory, root or directory
+
+    def _read_limits(self, directory, root, snapshot):
+        memory_limit = cpu_limit = None
+        while True:
+            files = {}
+            for filename in ("cpu.max", "cpuset.cpus.effective", "memory.max"):
+                try:
+                    files[filename] = read_source(snapshot, os.path.join(directory, filename))
+                except OSError:
+                    pass
+            memory_limit = _min_limit(memory_limit, parse_cgroup_max(files["memory.max"]) if files.get("memory.max") else None)
+            cpu_limit = _min_limit(cpu_limit, _cpu_limit(files))
+            if len(directory) <= len(root):
+                return memory_limit, cpu_limit
+            directory = os.path.dirname(directory)
+
+    def limits(self, snapshot=None, directory=None, root=None):
+        """(memory_limit, cpu_limit) of the agent's cgroup (or `directory` under `root`); None for no limit."""
+        directory, root = self._locate(snapshot, directory, root)
+        if directory is None:
+            return None, None
+        now = sample_time(snapshot)
+        with self._lock:
+            if self._limits_key != directory or now - self._limits_at >= LIMIT_REFRESH_SECONDS:
+                self._limits = self._read_limits(directory, root, snapshot)
+                self._limits_key, self._limits_at = directory, now
+            return self._limits
+
+    def cpu(self, snapshot=None, directory=None, root=None):
+        """(cpu_limit, cores_used); cores_used is None on the first call or without cgroup v2."""
+        directory, root = self._locate(snapshot, directory, root)
+        if directory is None:
+            return None, None
+        _, cpu_limit = self.limits(snapshot, directory, root)
+        try:
+            usage = parse_vmstat(read_source(snapshot, os.path.join(directory, "cpu.stat")), ("usage_usec",)).get("usage_usec")
+        except OSError:
+            usage = None
+        now = sample_time(snapshot)
+
+        with self._lock:
+            previous = self._previous
+            self._previous = (now, usage) if usage is not None else None
+
+        if previous is None or usage is None or now <= previous[0]:
+            return cpu_limit, None
+        return cpu_limit, round(max(usage - previous[1], 0) / 1e6 / (now - previous[0]), 3)
+
+    def memory(self, snapshot=None, directory=None, root=None):
+        """(memory_limit, working_set), both None without cgroup v2."""
+        directory, root = self._locate(snapshot, directory, root)
+        if directory is None:
+            return None, None
+        memory_limit, _ = self.limits(snapshot, directory, root)
+        files = {}
+        for filename in ("memory.current", "memory.stat"):
+            try:
+                files[filename] = read_source(snapshot, os.path.join(directory, filename))
+            except OSError:
+                pass
+        _, _, working_set, _, _, _ = parse_cgroup_files(files)
+        return memory_limit, working_set
+
+
+# Shared by CPUCheck and RAMCheck so the agent's limits are looked up once per refresh.
+own_cgroup_sampler = CgroupLimitSampler()
+
+
+# One tree sampler per process, shared by every CgroupCheck instance (checks are
+# rebuilt each cycle) so descriptors and previous counters survive between cycles.
+_tree_sampler = None
+_tree_sampler_settings = None
+_tree_sampler_lock = threading.Lock()
+
+
+def get_tree_sampler(root, max_depth=DEFAULT_MAX_DEPTH, max_cgroups=DEFAULT_MAX_CGROUPS,
+                     rescan_interval=DEFAULT_RESCAN_INTERVAL, exclude=()):
+    """
+    The shared CgroupTreeSampler for these settings. A sampler with other
+    settings is closed and replaced.
+    """
+    global _tree_sampler, _tree_sampler_settings
+
+    settings = (root, max_depth, max_cgroups, rescan_interval, tuple(exclude))
+    with _tree_sampler_lock:
+        if _tree_sampler is None or _tree_sampler_settings != settings:
+            if _tree_sampler is not None:
+                _tree_sampler.close()
+            _tree_sampler = CgroupTreeSampler(root, max_depth, max_cgroups, rescan_interval, exclude)
+            _tree_sampler_settings = settings
+        return _tree_sampler
+
+
+class CgroupCheck(Check):
+
+    name = "cgroup"
+    aliases = ("cgroups", "containers")
+    platform_collectors = {
+        "Linux": "_get_linux_cgroup_info",
+    }
+
+    def run(self, snapshot=None):
+
+        results = self.collect(snapshot)
+        if self._collector is None:
+            logger.error(f"Unsupported OS for cgroup check: {self.os_type}")
+
+        for result in results:
+            write_to_check_results({"Cgroup Information": result})
+
+        return results
+
+    def _tree_sampler(self, snapshot):
+        cgroup_config = self.config.get("cgroup", {})
+        root = cgroup_config.get("root") or host_facts(snapshot).cgroup_root
+        if root is None:
+            return None
+        return get_tree_sampler(
+            root,
+            max_depth=cgroup_config.get("max_depth", DEFAULT_MAX_DEPTH),
+            max_cgroups=cgroup_config.get("max_cgroups", DEFAULT_MAX_CGROUPS),
+            rescan_interval=cgroup_config.get("rescan_interval_sec", DEFAULT_RESCAN_INTERVAL),
+            exclude=cgroup_config.get("exclude", ()),
+        )
+
+    def _cgroup_result(self, entry):
+        deltas, elapsed = entry["deltas"], entry["elapsed"]
+        statuses = []
+
+        cores_used = throttled_percent = None
+        oom_kills = 0
+        if deltas is not None:
+            cores_used = round(deltas["usage_usec"] / 1e6 / elapsed, 3)
+            throttled_percent = round(min(100.0 * deltas["throttled_usec"] / 1e6 / elapsed, 100.0), 2)
+            oom_kills = deltas["oom_kill"]
+            statuses.append(self.evaluate("throttled", throttled_percent))
+            statuses.append(self.evaluate("oom_kills", oom_kills))
+
+        cpu_limit = entry["cpu_limit"]
+        cpu_percent = None
+        if cpu_limit and cores_used is not None:
+            cpu_percent = round(100.0 * cores_used / cpu_limit, 2)
+            statuses.append(self.evaluate("cpu_limit", cpu_percent))
+
+        memory_limit = entry["memory_limit"]
+        working_set = entry["working_set"]
+        memory_percent = None
+        if memory_limit and working_set is not None:
+            memory_percent = round(100.0 * working_set / memory_limit, 2)
+            statuses.append(self.evaluate("memory_limit", memory_percent))
+
+        def rate(key):
+            return round(deltas[key] / elapsed, 2) if deltas is not None else None
+
+        metrics = [
+            Metric("Cgroup", entry["name"]),
+            Metric("CPU Cores Used", cores_used),
+            Metric("CPU Limit", round(cpu_limit, 3) if cpu_limit else None),
+            Metric("CPU Limit Percent", cpu_percent, UNIT_PERCENT),
+            Metric("Throttled Percent", throttled_percent, UNIT_PERCENT),
+            Metric("Throttled Periods", deltas["nr_throttled"] if deltas is not None else None, UNIT_COUNT),
+            Metric("Memory Current", entry["memory_current"], UNIT_BYTES),
+            Metric("Memory Working Set", working_set, UNIT_BYTES),
+            Metric("Memory Limit", memory_limit, UNIT_BYTES),
+            Metric("Memory Limit Percent", memory_percent, UNIT_PERCENT),
+            Metric("Memory High Events", deltas["high"] if deltas is not None else None, UNIT_COUNT),
+            Metric("OOM Kills", oom_kills, UNIT_COUNT),
+            Metric("IO Read Bytes Rate", rate("rbytes"), UNIT_BYTES_PER_SECOND),
+            Metric("IO Write Bytes Rate", rate("wbytes"), UNIT_BYTES_PER_SECOND),
+            Metric("IO Read Ops Rate", rate("rios"), UNIT_PER_SECOND),
+            Metric("IO Write Ops Rate", rate("wios"), UNIT_PER_SECOND),
+        ]
+        for resource_name, pressure in entry["pressure"].items():
+            metrics.append(Metric(f"{_PRESSURE_LABELS[resource_name]} Pressure Some Avg10", pressure.get("some", {}).get("avg10", 0.0), UNIT_PERCENT))
+
+        status = worst_status(*statuses)
+        logger.debug(f"Retrieved Cgroup Information | Cgroup: {entry['name']} | CPU: {cores_used} of {cpu_limit} | Memory: {working_set} of {memory_limit} | Throttled: {throttled_percent}% | OOM Kills: {oom_kills}")
+
+        memory_text = f"{working_set / 1048576:.1f} MiB" if working_set is not None else "unknown"
+        memory_limit_text = f"{memory_limit / 1048576:.1f} MiB" if memory_limit else "unlimited"
+        if deltas is None:
+            return CheckResult(
+                self.name, status, metrics,
+                "Cgroup {} is using {} of {} memory; CPU and I/O rates start with the next sample.",
+                (entry["name"], memory_text, memory_limit_text),
+            )
+        return CheckResult(
+            self.name, status, metrics,
+            "Cgroup {} is using {} of {} CPUs and {} of {} memory, throttled {}% of the time with {} OOM kills.",
+            (entry["name"], cores_used, round(cpu_limit, 3) if cpu_limit else "unlimited", memory_text, memory_limit_text,
+             throttled_percent, oom_kills),
+        )
+
+    def _get_linux_cgroup_info(self, snapshot=None):
+
+        results = []
+
+        try:
+            sampler = self._tree_sampler(snapshot)
+            if sampler is None:
+                return [CheckResult(self.name, "OK", (), "cgroup v2 is not mounted on this host.")]
+
+            for entry in sampler.sample(sample_time(snapshot)):
+                results.append(self._cgroup_result(entry))
+
+            logger.info(f"Retrieved Cgroup Information | Root: {sampler.root} | Cgroups: {len(results)} | Not OK: {sum(1 for result in results if result.status != 'OK')}")
+
+            if not results:
+                results.append(CheckResult(self.name, "OK", (), "No cgroups found under {}.", (sampler.root,)))
+
+        except Exception as e:
+            logger.error(f"Error retrieving cgroup information on Linux: {e}")
+            results.append(CheckResult.unknown(self.name, "Error: {}", e))
+
+        return results
@@ -1,117 +1,180 @@
 from .base import Check
 from ..logging_setup import configure_daily_logging
-from .os_detector import detect_operating_system
+from .snapshot import host_facts, read_source
+from .cgroup_check import own_cgroup_sampler
+from .result import CheckResult, Metric, UNIT_PERCENT, UNIT_COUNT
+from ..utils.procfs import PROC_STAT, CPU_TIME_FIELDS, parse_cpu_times
 from tools.write_to_json_file import write_to_check_results
 
 import psutil
-import subprocess
-import os
+import threading
+import logging
+
+configure_daily_logging()
+logger = logging.getLogger(__name__)
+
+_USER = (CPU_TIME_FIELDS.index("user"), CPU_TIME_FIELDS.index("nice"))
+_SYSTEM = (CPU_TIME_FIELDS.index("system"), CPU_TIME_FIELDS.index("irq"), CPU_TIME_FIELDS.index("softirq"))
+_IOWAIT = CPU_TIME_FIELDS.index("iowait")
+_STEAL = CPU_TIME_FIELDS.index("steal")
+_IDLE = CPU_TIME_FIELDS.index("idle")
+
+
+class CPUTimesSampler:
+    """
+    Persistent /proc/stat sampler. Each call to sample() reads /proc/stat once
+    and returns utilization percentages for the interval since the previous
+    call. The first call has no previous sample and reports the averages since
+    boot, so it never has to sleep to produce a value.
+    """
+
+    def __init__(self, stat_path: str = PROC_STAT):
+        self.stat_path = stat_path
+        self._previous = {}
+        self._lock = threading.Lock()
+
+    def sample(self, snapshot=None):
+        current = parse_cpu_times(read_source(snapshot, self.stat_path))
+
+        with self._lock:
+            previous = self._previous
+            self._previous = current
+
+        return {cpu: self._percentages(times, previous.get(cpu)) for cpu, times in current.items()}
+
+    @staticmethod
+    def _percentages(times, previous):
+        if previous is None:
+            deltas = times
+        else:
+            # Counters can step backwards on CPU hotplug; treat that as a fresh start.
+            deltas = [max(now - before, 0) for now, before in zip(times, previous)]
+
+        total = sum(deltas)
+        if total <= 0:
+            return {"user": 0.0, "system": 0.0, "iowait": 0.0, "steal": 0.0, "idle": 100.0, "usage": 0.0}
+
+        def percent(*indexes):
+            return round(100.0 * sum(deltas[i] for i in indexes) / total, 2)
+
+        idle = percent(_IDLE)
+        iowait = percent(_IOWAIT)
+        return {
+            "user": percent(*_USER),
+            "system": percent(*_SYSTEM),
+            "iowait": iowait,
+            "steal": percent(_STEAL),
+            "idle": idle,
+            "usage": round(max(100.0 - idle - iowait, 0.0), 2),
+        }
+
+
+# Shared across CPUCheck instances so every cycle measures the delta since the last one.
+cpu_sampler = CPUTimesSampler()
+
 
 class CPUCheck(Check):
 
     name = "cpu"
+    process_ranking = "cpu"
+    platform_collectors = {
+        "Linux": "_get_linux_cpu_info",
+        "Windows": "_get_windows_cpu_info",
+    }
 
-    def run(self):
+    def run(self, snapshot=None):
 
-        os_information = detect_operating_system()
-        os_type = os_information[0]
-        results = []
+        results = self.collect(snapshot)
+        if self._collector is None:
+            logger.error(f"Unsupported OS for CPU check: {self.os_type}")
 
-        if os_type == "Windows":
-            results = self._get_windows_cpu_info()
-        elif os_type == "Linux":
-            self.install_mpstat()
-            results = self._get_linux_cpu_info()
-        else:
-            logger.error(f"Unsupported OS for CPU check: {os_type}")
-            return[{"name": elf.name, "status": "UNKNOWN", "details": f"Unsupported OS: {os_type}"}]
-        
         for result in results:
             write_to_check_results({"CPU Information": result})
-        
-        return result
 
-    def install_mpstat(self):
+        return results
 
-    try:
-        subprocess.run('sudo apt-get install sysstat')
-    except Exception as e:
-        logger.info(f"Encountered error while attempting to install sysstat on Linux system. Issue may be related to permissions or it is already installed on RHEL based systems.")
-        
+    def _get_windows_cpu_info(self, snapshot=None):
 
-    def get_cpu_usage_linux(self):
-        
-        cpu_usage = subprocess.run(['mpstat', 1, 1], capture_output = True, text = True, check = True)
-
-        lines = cpu_usage.stdout.strip().splitlines()
+        results = []
 
         try:
-            for line in lines:
-                cols = line.split()
-                if len(cols) >= 12 and cols[1] == "all":
+            # interval=None compares against the previous call instead of blocking for a second.
+            times = psutil.cpu_times_percent(interval=None)
+            per_core = psutil.cpu_percent(interval=None, percpu=True)
+            usage = round(100.0 - times.idle, 2)
+            status = self.evaluate("usage", usage)
+
+            metrics = [
+                Metric("Architecture", host_facts(snapshot).architecture[0]),
+                Metric("CPU Count", psutil.cpu_count(logical=True), UNIT_COUNT),
+                Metric("Physical Cores", psutil.cpu_count(logical=False), UNIT_COUNT),
+                Metric("Usage Percent", usage, UNIT_PERCENT),
+                Metric("User Percent", times.user, UNIT_PERCENT),
+                Metric("System Percent", times.system, UNIT_PERCENT),
+                Metric("Idle Percent", times.idle, UNIT_PERCENT),
+            ]
+            metrics.extend(Metric(f"Per Core Usage.cpu{index}", value, UNIT_PERCENT) for index, value in enumerate(per_core))
+
+            logger.info(f"Retrieved CPU Information | Usage: {usage}% | User: {times.user}% | System: {times.system}%")
+
+            results.append(CheckResult(self.name, status, metrics, "CPU utilization at {}%.", (usage,)))
 
-                    idle = float(cols[-1])
-                    return 100.0 - idle
-        
         except Exception as e:
-            raise RuntimeError("Error encountered attempting to parse mpstat output.")
-            logger.error(f"Error encountered attempting to parse mpstat output: {e}")
+            logger.error(f"Error retrieving CPU information on Windows: {e}")
+            results.append(CheckResult.unknown(self.name, "Error: {}", e))
 
-    
-    def get_cpu_usage_windows():
-        try:
-            powershell_command = ["powershell", "-NoProfile", "-Command", "Get-Counter '\\Processor(_Total)\\% Processor Time' -SampleInterval 1 -MaxSamples 1 " "| Select -ExpandProperty CounterSamples " "| Select -ExpandProperty CookedValue"]
-            cpu_usage = subprocess.run(powershell_command, capture_output = True, text = True)
-
-
-            if cpu_usage.returncode != 0:
-                print("Error running Get-Counter", cpu_usage.stderr.strip())
-                return
-            
-            complete_cpu_usage = cpu_usage.stdout.strip()
-            
-            try:
-                usage = float(complete_cpu_usage)
-                return usage
-                
-            except ValueError:
-                print("Unexpected output from Get-Counter", complete_cpu_usage)
-        
-        except Exception as e:
-            print(f"Encountered error: {e}")
+        return results
 
-    
-    def _get_linux_cpu_info(self):
+    def _get_linux_cpu_info(self, snapshot=None):
 
         results = []
 
         try:
-            cpu_lscpu_linux = subprocess.check_output('lscpu', shell=True).decode("utf-8")
-            logger.info("Successfully retrieved CPU information on Linux")
-
-            try: 
-                for line in cpu_lscpu_linux.splitlines():
-                    if line.startswith("Model name:"):
-                        cpu_model_name = line.split(":")[1].strip()
-                        logger.info(f"CPU Model Name: {cpu_model_name}")
-                    elif line.startswith("Architecture:"):
-                        architecture = line.split(":")[1].strip()
-                        logger.info(f"CPU Architecture: {architecture}")
-                    elif line.startswith("CPU(s):"):
-                        cpu_count = line.split(":")[1].strip()
-                        logger.info(f"CPU Count: {cpu_count}")
-                    elif line.startswith("Thread(s) per core:"):
-                        cpu_threads_per_core = line.split(":")[1].strip()
-                        logger.info(f"Threads per Core: {cpu_threads_per_core}")
-                    
-                    cpu_linux_usage = subprocess.check_output('')
-
-                metrics = {
-                    "Model Name": cpu_model_name,
-                    "Architecture": architecture,
-                    "CPU Count": cpu_count,
-                    "CPU Threads": cpu_threads_per_core
-                }
-
-                logger.info(f"Successfully retrieved all system CPU information.")
+            topology = host_facts(snapshot).cpu
+            usage_by_cpu = cpu_sampler.sample(snapshot)
+            aggregate = usage_by_cpu.pop("cpu")
+
+            # Inside a container /proc/stat shows every host CPU; judge usage against the cgroup's limit instead.
+            cpu_limit, cores_used = own_cgroup_sampler.cpu(snapshot)
+            limited = cpu_limit is not None and cpu_limit < topology["CPU Count"] and cores_used is not None
+            limit_usage = round(100.0 * cores_used / cpu_limit, 2) if limited else None
+            status = self.evaluate("usage", limit_usage if limited else aggregate["usage"])
+
+            metrics = [
+                Metric(key, value, UNIT_COUNT if isinstance(value, int) else None) for key, value in topology.items()
+            ]
+            metrics.extend([
+                Metric("Usage Percent", aggregate["usage"], UNIT_PERCENT),
+                Metric("User Percent", aggregate["user"], UNIT_PERCENT),
+                Metric("System Percent", aggregate["system"], UNIT_PERCENT),
+                Metric("IOWait Percent", aggregate["iowait"], UNIT_PERCENT),
+                Metric("Steal Percent", aggregate["steal"], UNIT_PERCENT),
+                Metric("Idle Percent", aggregate["idle"], UNIT_PERCENT),
+            ])
+            metrics.extend(Metric(f"Per Core Usage.{cpu}", values["usage"], UNIT_PERCENT) for cpu, values in usage_by_cpu.items())
+            if limited:
+                metrics.extend([
+                    Metric("Cgroup CPU Limit", round(cpu_limit, 3)),
+                    Metric("Cgroup CPU Cores Used", cores_used),
+                    Metric("Cgroup Usage Percent", limit_usage, UNIT_PERCENT),
+                ])
+
+            logger.info(f"Retrieved CPU Information | Usage: {aggregate['usage']}% | User: {aggregate['user']}% | System: {aggregate['system']}% | IOWait: {aggregate['iowait']}% | Steal: {aggregate['steal']}% | Cgroup Usage: {limit_usage}%")
+
+            if limited:
+                results.append(CheckResult(
+                    self.name, status, metrics,
+                    "CPU utilization at {}% of the {}-CPU cgroup limit ({}% across the host's {} CPUs).",
+                    (limit_usage, round(cpu_limit, 3), aggregate["usage"], topology["CPU Count"]),
+                ))
+            else:
+                results.append(CheckResult(
+                    self.name, status, metrics,
+                    "CPU utilization at {}% across {} CPUs.", (aggregate["usage"], topology["CPU Count"]),
+                ))
+
+        except Exception as e:
+            logger.error(f"Error retrieving CPU information on Linux: {e}")
+            results.append(CheckResult.unknown(self.name, "Error: {}", e))
 
+        return results
@@ -1,40 +1,142 @@
-from .base import Check
+from .base import Check, worst_status
 from ..logging_setup import configure_daily_logging
-from .os_detector import detect_operating_system
+from .snapshot import read_source, sample_time
+from .result import (
+    CheckResult, Metric, UNIT_BYTES, UNIT_BYTES_PER_SECOND, UNIT_COUNT, UNIT_MILLISECONDS, UNIT_PERCENT, UNIT_PER_SECOND,
+)
+from .mount_probe import MountProber, PROBE_OK, PROBE_ERROR, PROBE_TIMEOUT, PROBE_QUARANTINED
+from ..utils.procfs import (
+    PROC_MOUNTINFO, PROC_DISKSTATS, SYS_CLASS_BLOCK, DISKSTATS_FIELDS, DISKSTATS_SECTOR_SIZE,
+    parse_mountinfo, parse_diskstats, block_device_parent, device_mapper_name,
+)
 from tools.write_to_json_file import write_to_check_results
 
 import psutil
-import subprocess
-import os
+import fnmatch
+import threading
 import logging
 
 configure_daily_logging()
 logger = logging.getLogger(__name__)
 
+# Pseudo and in-memory filesystems that never back a real disk. Override with
+# config['disk']['exclude_fstypes'], or list the only types to report in
+# config['disk']['include_fstypes'].
+DEFAULT_EXCLUDE_FSTYPES = (
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs",
+    "devpts", "devtmpfs", "efivarfs", "fusectl", "fuse.lxcfs", "hugetlbfs",
+    "mqueue", "nsfs", "overlay", "proc", "pstore", "ramfs", "rpc_pipefs",
+    "securityfs", "selinuxfs", "squashfs", "sysfs", "tmpfs", "tracefs",
+)
+
+# Block devices with no persistent storage behind them. Override with
+# config['disk']['exclude_devices'].
+DEFAULT_EXCLUDE_DEVICES = ("loop*", "ram*", "zram*", "fd*", "sr*")
+
+_IO_FIELD = {name: position for position, name in enumerate(DISKSTATS_FIELDS)}
+
+
+class DiskStatsSampler:
+    """
+    Persistent /proc/diskstats sampler. Each call to sample() reads
+    /proc/diskstats once and returns the counter deltas of every device for
+    the interval since the previous call; a device seen for the first time
+    (including on the first call) has no deltas until its next sample. The
+    partition -> parent and dm name lookups in sysfs are only redone when
+    the set of devices changes.
+    """
+
+    def __init__(self, diskstats_path: str = PROC_DISKSTATS, sys_class_block: str = SYS_CLASS_BLOCK):
+        self.diskstats_path = diskstats_path
+        self.sys_class_block = sys_class_block
+        self._previous = {}
+        self._previous_time = None
+        self._topology_key = None
+        self._topology = {}
+        self._lock = threading.Lock()
+
+    def _refresh_topology(self, devices):
+        key = frozenset((name, numbers) for name, (numbers, _) in devices.items())
+        if key != self._topology_key:
+            self._topology = {
+                name: (block_device_parent(name, self.sys_class_block),
+                       device_mapper_name(name, self.sys_class_block) if name.startswith("dm-") else None)
+                for name in devices
+            }
+            self._topology_key = key
+        return self._topology
+
+    def sample(self, snapshot=None):
+        """Return {name: {"device": (major, minor), "parent", "dm_name", "in_flight", "deltas", "elapsed"}}."""
+        devices = parse_diskstats(read_source(snapshot, self.diskstats_path))
+        now = sample_time(snapshot)
+
+        with self._lock:
+            topology = self._refresh_topology(devices)
+            previous, previous_time = self._previous, self._previous_time
+            self._previous = {name: counters for name, (_, counters) in devices.items()}
+            self._previous_time = now
+
+        stats = {}
+        for name, (numbers, counters) in devices.items():
+            before = previous.get(name)
+            if before is None:
+                # First sample of this device: its counters cover an unknown
+                # span, so there are no rates until the next sample.
+                deltas = elapsed = None
+            else:
+                elapsed = now - previous_time
+                # in_flight is a gauge, not a counter; the rest reset if the device is re-added.
+                deltas = tuple(
+                    new if position == _IO_FIELD["in_flight"] or new < old else new - old
+                    for position, (old, new) in enumerate(zip(before, counters))
+                )
+            parent, dm_name = topology[name]
+            stats[name] = {
+                "device": numbers, "parent": parent, "dm_name": dm_name,
+                "in_flight": counters[_IO_FIELD["in_flight"]], "deltas": deltas, "elapsed": elapsed,
+            }
+        return stats
+
+
+# Shared across DiskCheck instances so every cycle measures the delta since the last one.
+disk_stats_sampler = DiskStatsSampler()
+
+# statvfs on a stale network mount blocks forever, so Linux probes go through a
+# process pool shared by every DiskCheck instance, created on first use.
+_mount_prober = None
+_mount_prober_lock = threading.Lock()
+
+
+def get_mount_prober(probe_config=None):
+    global _mount_prober
+
+    with _mount_prober_lock:
+        if _mount_prober is None:
+            _mount_prober = MountProber(**(probe_config or {}))
+        return _mount_prober
+
+
 class DiskCheck(Check):
 
     name = "disk"
+    platform_collectors = {
+        "Linux": "_get_linux_disk_info",
+        "Windows": "_get_windows_disk_info",
+    }
 
-    def run(self):
+    def run(self, snapshot=None):
 
-        os_information = detect_operating_system()
-        os_type = os_information[0]
-        results = []
+        results = self.collect(snapshot)
+        if self._collector is None:
+            logger.error(f"Unsupported OS for disk check: {self.os_type}")
 
-        if os_type == "Windows":
-            results = self._get_windows_disk_info()
-        elif os_type == "Linux":
-            results = self._get_linux_disk_info()
-        else: 
-            logger.error(f"Unsupported OS for disk check: {os_type}")
-            return[{"name": self.name, "status": "UNKNOWN", "details": f"Unsupported OS: {os_type}"}]
-        
         for result in results:
             write_to_check_results({"Disk Information": result})
         
         return results
 
-    def _get_windows_disk_info(self):
+    def _get_windows_disk_info(self, snapshot=None):
 
         results = []
 
@@ -43,83 +145,249 @@ class DiskCheck(Check):
                 try:
                     usage = psutil.disk_usage(partition.mountpoint)
                     percent_used = usage.percent
-                    status = self.evaluate("percent used", percent_used)
+                    status = self.evaluate("percent_used", percent_used)
 
-                    metrics = {
-                        "File System": partition.device,
-                        "Disk Size": usage.total,
-                        "Total Used": usage.used,
-                        "Total Available": usage.free,
-                        "Percentage Used": percent_used
-                    }
+                    metrics = (
+                        Metric("File System", partition.device),
+                        Metric("File System Type", partition.fstype),
+                        Metric("Mount Point", partition.mountpoint),
+                        Metric("Disk Size", usage.total, UNIT_BYTES),
+                        Metric("Total Used", usage.used, UNIT_BYTES),
+                        Metric("Total Available", usage.free, UNIT_BYTES),
+                        Metric("Percentage Used", percent_used, UNIT_PERCENT),
+                    )
 
                     logger.info(f"Retrieved Disk Information | Partition: {partition.device} | Size: {usage.total} | Used: {usage.used} | Free: {usage.free} | Percentage Used: {percent_used}%")
-                    logger.info("Successfully wrote disk information to check_results.json")
 
-                    results.append({
-                        "name": self.name,
-                        "status": status,
-                        "metrics": metrics,
-                        "details": f"Disk {partition.device} is {percent_used}% full."
-                    })
+                    results.append(CheckResult(self.name, status, metrics, "Disk {} is {}% full.", (partition.device, percent_used)))
 
                 except Exception as e:
-                    logger.error(f"Failed to get disk usage for {partition.devicxe}: {e}")
-                    results.append({
-                        "name": self.name,
-                        "status": "UNKNOWN",
-                        "metrics": {"partition": partition.device},
-                        "details": f"Error: {e}"
-                    })
+                    logger.error(f"Failed to get disk usage for {partition.device}: {e}")
+                    results.append(CheckResult(
+                        self.name, "UNKNOWN", (Metric("File System", partition.device),), "Error: {}", (e,),
+                    ))
 
         except Exception as e:
             logger.error(f"Failed to retrieve disk partitions on Windows system: {e}")
         
         return results
 
-    def _get_linux_disk_info(self):  
+    def _selected_mounts(self, mounts):
+        """
+        Apply the fstype/mountpoint filters from `config['disk']` and collapse
+        bind mounts of the same device into a single entry.
+        """
+        disk_config = self.config.get("disk", {})
+        include_fstypes = set(disk_config.get("include_fstypes", ()))
+        exclude_fstypes = set(disk_config.get("exclude_fstypes", DEFAULT_EXCLUDE_FSTYPES))
+        exclude_mountpoints = disk_config.get("exclude_mountpoints", ())
+
+        selected = {}
+        for mount in mounts:
+            fstype = mount["fstype"]
+            if include_fstypes and fstype not in include_fstypes:
+                continue
+            if not include_fstypes and fstype in exclude_fstypes:
+                continue
+            if any(fnmatch.fnmatch(mount["mount_point"], pattern) for pattern in exclude_mountpoints):
+                continue
+
+            # Bind mounts share the device ID; report the mount of the filesystem
+            # root (or the shortest path) once.
+            current = selected.get(mount["device"])
+            if current is None or (mount["root"], len(mount["mount_point"])) < (current["root"], len(current["mount_point"])):
+                selected[mount["device"]] = mount
+
+        return sorted(selected.values(), key=lambda mount: mount["mount_point"])
+
+    def _get_linux_disk_info(self, snapshot=None):
 
         results = []
 
         try:
-            disk_df_output = subprocess.check_output('df -h', shell = True).decode('utf-8')
-            logger.info("Successfully retrieved disk information on Linux using df command")
-
-            for line in disk_df_output.splitlines()[1:]:
-                parts = line.split()
-                if len(parts) >= 6:
-                    filesystem = parts[0]
-                    size = parts[1]
-                    used = parts[2]
-                    available = parts[3]
-                    percent_used_str = parts[4]
-
-                    try:
-                        percent_used = float(percent_used_str.strip('%'))
-                        status = self.evaluate("percent_used", percent_used)
-                    except ValueError:
-                        percent_used = 0.0
-                        status = "UNKNOWN"
-
-                    metrics = {
-                        "File System": filesystem,
-                        "Disk Size": size,
-                        "Total Used": used, 
-                        "Total Available": available,
-                        "Percentage Used": percent_used
-                    }
-
-                    logger.info(f"Retrieved Disk Information | Filesystem: {filesystem} | Size: {size} | Used: {used} | Available: {available} | Percentage Used: {percent_used_str}")
-
-                    results.append({
-                        "name": self.name,
-                        "status": status,
-                        "metrics": metrics,
-                        "details": f"Disk {filesystem} is {percent_used_str} full."
-                    })
-        
+            mounts = self._selected_mounts(parse_mountinfo(read_source(snapshot, PROC_MOUNTINFO)))
+        except Exception as e:
+            logger.error(f"Error reading mount table on Linux: {e}")
+            return results
+
+        prober = get_mount_prober(self.config.get("disk", {}).get("probe"))
+        outcomes = prober.probe([mount["mount_point"] for mount in mounts])
+
+        for mount in mounts:
+            filesystem = mount["source"]
+            mount_point = mount["mount_point"]
+            outcome, payload = outcomes[mount_point]
+
+            if outcome == PROBE_OK:
+                results.append(self._statvfs_result(mount, payload))
+                continue
+
+            if outcome == PROBE_TIMEOUT:
+                details = f"Mount {mount_point} did not respond within {prober.timeout}s and is treated as stale."
+            elif outcome == PROBE_QUARANTINED:
+                details = f"Mount {mount_point} is stale; next probe in {payload}s."
+            elif outcome == PROBE_ERROR:
+                details = f"Error: {payload}"
+            else:
+                details = f"No probe worker available for {mount_point}."
+
+            logger.error(f"Failed to get disk usage for {mount_point}: {details}")
+            results.append(CheckResult(
+                self.name, "UNKNOWN",
+                (
+                    Metric("File System", filesystem),
+                    Metric("Mount Point", mount_point),
+                    Metric("Stale", outcome in (PROBE_TIMEOUT, PROBE_QUARANTINED)),
+                ),
+                details,
+            ))
+
+        logger.info(f"Retrieved disk information for {len(results)} mounts on Linux")
+
+        results.extend(self._io_results(mounts, snapshot))
+        results.append(self._probe_health_result(prober))
+
+        return results
+
+    def _io_results(self, mounts, snapshot=None):
+        """
+        One result per whole block device (disk, dm or md) with IOPS,
+        throughput, await, queue depth and utilization. Partitions are folded
+        into their parent; the parent lists the mount points on any of them.
+        """
+        results = []
+
+        try:
+            stats = disk_stats_sampler.sample(snapshot)
         except Exception as e:
-            logger.error(f"Error retrieving disk partition information on Linux: {e}")
+            logger.error(f"Error reading {PROC_DISKSTATS}: {e}")
+            return results
+
+        exclude_devices = self.config.get("disk", {}).get("exclude_devices", DEFAULT_EXCLUDE_DEVICES)
+        by_number = {entry["device"]: entry for entry in stats.values()}
+
+        mount_points = {}
+        for mount in mounts:
+            entry = by_number.get(mount["device"])
+            if entry is not None:
+                mount_points.setdefault(entry["parent"], []).append(mount["mount_point"])
+
+        for name, entry in sorted(stats.items()):
+            if entry["parent"] != name or any(fnmatch.fnmatch(name, pattern) for pattern in exclude_devices):
+                continue
+            results.append(self._io_result(name, entry, mount_points.get(name, [])))
 
         return results
 
+    def _io_result(self, name, entry, mount_points):
+        deltas = entry["deltas"]
+        if deltas is None:
+            return CheckResult(
+                self.name, "OK",
+                (
+                    Metric("Device", name),
+                    Metric("Device Mapper Name", entry["dm_name"]),
+                    Metric("Mount Points", tuple(mount_points)),
+                    Metric("In Flight", entry["in_flight"], UNIT_COUNT),
+                ),
+                "Device {} has {} requests in flight; rates start with its next sample.", (name, entry["in_flight"]),
+            )
+
+        elapsed = entry["elapsed"]
+        elapsed_ms = elapsed * 1000.0
+
+        def per_second(value):
+            return round(value / elapsed, 2) if elapsed > 0 else 0.0
+
+        reads = deltas[_IO_FIELD["reads"]]
+        writes = deltas[_IO_FIELD["writes"]]
+        read_ms = deltas[_IO_FIELD["read_ms"]]
+        write_ms = deltas[_IO_FIELD["write_ms"]]
+
+        average_wait = round((read_ms + write_ms) / (reads + writes), 2) if reads + writes else 0.0
+        utilization = round(min(100.0 * deltas[_IO_FIELD["io_ms"]] / elapsed_ms, 100.0), 2) if elapsed_ms > 0 else 0.0
+        queue_depth = round(deltas[_IO_FIELD["weighted_io_ms"]] / elapsed_ms, 2) if elapsed_ms > 0 else 0.0
+
+        status = worst_status(
+            self.evaluate("io_wait_time", average_wait),
+            self.evaluate("utilization", utilization),
+        )
+
+        read_iops = per_second(reads)
+        write_iops = per_second(writes)
+        metrics = (
+            Metric("Device", name),
+            Metric("Device Mapper Name", entry["dm_name"]),
+            Metric("Mount Points", tuple(mount_points)),
+            Metric("Read IOPS", read_iops, UNIT_PER_SECOND),
+            Metric("Write IOPS", write_iops, UNIT_PER_SECOND),
+            Metric("Read Bytes Rate", per_second(deltas[_IO_FIELD["sectors_read"]] * DISKSTATS_SECTOR_SIZE), UNIT_BYTES_PER_SECOND),
+            Metric("Write Bytes Rate", per_second(deltas[_IO_FIELD["sectors_written"]] * DISKSTATS_SECTOR_SIZE), UNIT_BYTES_PER_SECOND),
+            Metric("Average Wait Ms", average_wait, UNIT_MILLISECONDS),
+            Metric("Read Wait Ms", round(read_ms / reads, 2) if reads else 0.0, UNIT_MILLISECONDS),
+            Metric("Write Wait Ms", round(write_ms / writes, 2) if writes else 0.0, UNIT_MILLISECONDS),
+            Metric("Queue Depth", queue_depth, UNIT_COUNT),
+            Metric("Utilization Percent", utilization, UNIT_PERCENT),
+            Metric("In Flight", entry["in_flight"], UNIT_COUNT),
+        )
+
+        logger.info(f"Retrieved Disk I/O Information | Device: {name} | Read IOPS: {read_iops} | Write IOPS: {write_iops} | Await: {average_wait} ms | Queue Depth: {queue_depth} | Utilization: {utilization}%")
+
+        return CheckResult(
+            self.name, status, metrics,
+            "Device {} is {}% busy with an average wait of {} ms per request.", (name, utilization, average_wait),
+        )
+
+    def _probe_health_result(self, prober):
+        health = prober.health()
+        status = "WARN" if health["stuck_workers"] else "OK"
+
+        return CheckResult(
+            "agent", status,
+            (
+                Metric("Mount Probe Pool Size", health["pool_size"], UNIT_COUNT),
+                Metric("Mount Probe Idle Workers", health["idle_workers"], UNIT_COUNT),
+                Metric("Mount Probe Stuck Workers", health["stuck_workers"], UNIT_COUNT),
+                Metric("Quarantined Mounts", tuple(health["quarantined_mounts"])),
+            ),
+            "{} mount probe workers stuck, {} mounts quarantined.", (health["stuck_workers"], len(health["quarantined_mounts"])),
+        )
+
+    def _statvfs_result(self, mount, stats):
+        filesystem = mount["source"]
+        mount_point = mount["mount_point"]
+
+        size = stats.f_blocks * stats.f_frsize
+        used = (stats.f_blocks - stats.f_bfree) * stats.f_frsize
+        available = stats.f_bavail * stats.f_frsize
+        # Same definition as df: reserved blocks count as neither used nor available.
+        percent_used = round(100.0 * used / (used + available), 1) if used + available else 0.0
+
+        inodes_total = stats.f_files
+        inodes_used = stats.f_files - stats.f_ffree
+        inode_percent_used = round(100.0 * inodes_used / inodes_total, 1) if inodes_total else 0.0
+
+        status = worst_status(
+            self.evaluate("percent_used", percent_used),
+            self.evaluate("inode_percent_used", inode_percent_used),
+        )
+
+        metrics = (
+            Metric("File System", filesystem),
+            Metric("File System Type", mount["fstype"]),
+            Metric("Mount Point", mount_point),
+            Metric("Disk Size", size, UNIT_BYTES),
+            Metric("Total Used", used, UNIT_BYTES),
+            Metric("Total Available", available, UNIT_BYTES),
+            Metric("Percentage Used", percent_used, UNIT_PERCENT),
+            Metric("Inodes Total", inodes_total, UNIT_COUNT),
+            Metric("Inodes Used", inodes_used, UNIT_COUNT),
+            Metric("Inode Percentage Used", inode_percent_used, UNIT_PERCENT),
+        )
+
+        logger.info(f"Retrieved Disk Information | Filesystem: {filesystem} | Mount: {mount_point} | Size: {size} | Used: {used} | Available: {available} | Percentage Used: {percent_used}% | Inodes Used: {inode_percent_used}%")
+
+        return CheckResult(
+            self.name, status, metrics,
+            "Disk {} mounted at {} is {}% full ({}% of inodes used).", (filesystem, mount_point, percent_used, inode_percent_used),
+        )
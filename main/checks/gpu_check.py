@@ -0,0 +1,406 @@
+"""
+GPU check that reads the kernel's DRM and hwmon sysfs attributes instead of
+spawning nvidia-smi or another vendor CLI every cycle.
+
+The cards under /sys/class/drm and their hwmon directories are enumerated
+once. After that each cycle re-reads gpu_busy_percent, mem_info_vram_used,
+the temperature, fan and power inputs through descriptors kept open with
+pread() at offset 0, which costs microseconds per card. A read that fails
+(the card was removed or its driver reloaded) drops the descriptors and
+enumerates the cards again.
+
+NVIDIA's proprietary driver publishes none of this in sysfs. For those cards,
+and only when /proc/driver/nvidia shows the driver is loaded, the optional
+NVML bindings (nvidia-ml-py, imported as pynvml) are loaded on first use and
+queried in-process. Without them NVIDIA cards are reported with whatever
+sysfs has.
+
+Every path comes from the roots given to SysfsGPUSampler, so it can be
+pointed at a fake sysfs tree on a machine with no GPU.
+"""
+
+from .base import Check, worst_status
+from ..logging_setup import configure_daily_logging
+from .result import CheckResult, Metric, UNIT_BYTES, UNIT_PERCENT
+from ..utils.procfs import SYS_CLASS_DRM, PROC_DRIVER_NVIDIA, read_first_line
+from tools.write_to_json_file import write_to_check_results
+
+import errno
+import os
+import re
+import threading
+import logging
+
+configure_daily_logging()
+logger = logging.getLogger(__name__)
+
+VENDORS = {"0x1002": "AMD", "0x10de": "NVIDIA", "0x8086": "Intel"}
+
+# card0, card1, ...; connectors such as card0-DP-1 share the directory.
+_CARD_NAME = re.compile(r"^card\d+$")
+_HWMON_FILE = re.compile(r"^(temp\d+_input|fan\d+_input|fan\d+_fault|pwm\d+|power\d+_average|power\d+_input)$")
+
+
+def _pci_key(address):
+    """Normalize a PCI address ("0000:01:00.0" or NVML's "00000000:01:00.0") for matching."""
+    parts = (address or "").lower().split(":")
+    if len(parts) == 2:
+        parts.insert(0, "0")
+    try:
+        return int(parts[0], 16), int(parts[1], 16), parts[2]
+    except (ValueError, IndexError):
+        return None
+
+
+class _Card:
+
+    __slots__ = ("name", "device", "vendor", "driver", "pci_slot", "memory_total", "files", "temperature_labels", "fds")
+
+    def __init__(self, name, device, vendor, driver, pci_slot, memory_total, files, temperature_labels):
+        self.name = name
+        self.device = device
+        self.vendor = vendor
+        self.driver = driver
+        self.pci_slot = pci_slot
+        self.memory_total = memory_total
+        # {attribute name: path} of the per-cycle attributes this card has.
+        self.files = files
+        self.temperature_labels = temperature_labels
+        self.fds = {}
+
+
+class NVMLBackend:
+    """
+    In-process NVML queries for NVIDIA cards. pynvml is imported and NVML
+    initialised on the first sample(); if either fails the backend stays
+    unavailable and is not retried.
+    """
+
+    def __init__(self):
+        self._nvml = None
+        self._handles = None
+        self._failed = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._nvml is not None or self._failed:
+            return self._nvml
+        try:
+            import pynvml
+            pynvml.nvmlInit()
+        except Exception as e:
+            # ImportError without nvidia-ml-py, NVMLError without a usable driver.
+            logger.info(f"NVML is unavailable; NVIDIA GPUs are reported from sysfs only: {e}")
+            self._failed = True
+            return None
+
+        handles = {}
+        for index in range(pynvml.nvmlDeviceGetCount()):
+            handle = pynvml.nvmlDeviceGetHandleByIndex(index)
+            bus_id = pynvml.nvmlDeviceGetPciInfo(handle).busId
+            handles[_pci_key(bus_id.decode() if isinstance(bus_id, bytes) else bus_id)] = handle
+        self._nvml, self._handles = pynvml, handles
+        return pynvml
+
+    def sample(self, pci_slot):
+        """{metric: value} for the NVIDIA card at `pci_slot`, or {} when NVML cannot answer."""
+        with self._lock:
+            nvml = self._load()
+            handle = self._handles.get(_pci_key(pci_slot)) if nvml is not None else None
+        if handle is None:
+            return {}
+
+        values = {}
+        queries = (
+            ("temperature", lambda: nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU)),
+            ("utilization", lambda: nvml.nvmlDeviceGetUtilizationRates(handle).gpu),
+            ("memory", lambda: nvml.nvmlDeviceGetMemoryInfo(handle)),
+            ("fan_percent", lambda: nvml.nvmlDeviceGetFanSpeed(handle)),
+            ("power_watts", lambda: nvml.nvmlDeviceGetPowerUsage(handle) / 1000.0),
+        )
+        for key, query in queries:
+            try:
+                values[key] = query()
+            except Exception:
+                # Not every board supports every query (e.g. passively cooled cards have no fan).
+                continue
+        return values
+
+
+class SysfsGPUSampler:
+    """
+    Persistent sampler of the GPUs under /sys/class/drm. Each call to sample()
+    reads every card's attributes once and returns one dict per card.
+    """
+
+    def __init__(self, drm_root: str = SYS_CLASS_DRM, nvidia_driver_path: str = PROC_DRIVER_NVIDIA, nvml=None):
+        self.drm_root = drm_root
+        self.nvidia_driver_path = nvidia_driver_path
+        self.nvml = nvml
+        self.enumerations = 0
+        self._cards = None
+        self._lock = threading.Lock()
+
+    def _enumerate(self):
+        cards = []
+        try:
+            names = sorted(name for name in os.listdir(self.drm_root) if _CARD_NAME.match(name))
+        except OSError:
+            names = []
+
+        for name in names:
+            device = os.path.realpath(os.path.join(self.drm_root, name, "device"))
+            if not os.path.isdir(device):
+                continue
+            vendor = read_first_line(os.path.join(device, "vendor"), "")
+            driver_link = os.path.join(device, "driver")
+            driver = os.path.basename(os.path.realpath(driver_link)) if os.path.exists(driver_link) else None
+
+            files = {}
+            for attribute in ("gpu_busy_percent", "mem_info_vram_used"):
+                path = os.path.join(device, attribute)
+                if os.access(path, os.R_OK):
+                    files[attribute] = path
+            memory_total = read_first_line(os.path.join(device, "mem_info_vram_total"))
+
+            temperature_labels = {}
+            hwmon_root = os.path.join(device, "hwmon")
+            try:
+                hwmons = sorted(os.listdir(hwmon_root))
+            except OSError:
+                hwmons = []
+            for hwmon in hwmons:
+                hwmon_path = os.path.join(hwmon_root, hwmon)
+                try:
+                    attributes = sorted(os.listdir(hwmon_path))
+                except OSError:
+                    continue
+                for attribute in attributes:
+                    if _HWMON_FILE.match(attribute) and os.access(os.path.join(hwmon_path, attribute), os.R_OK):
+                        key = f"{hwmon}/{attribute}"
+                        files[key] = os.path.join(hwmon_path, attribute)
+                        if attribute.startswith("temp"):
+                            sensor = attribute[:-len("_input")]
+                            temperature_labels[key] = read_first_line(os.path.join(hwmon_path, f"{sensor}_label")) or sensor
+
+            cards.append(_Card(
+                name, device, VENDORS.get(vendor, vendor or "unknown"), driver, os.path.basename(device),
+                int(memory_total) if memory_total and memory_total.isdigit() else None,
+                files, temperature_labels,
+            ))
+
+        self._cards = cards
+        self.enumerations += 1
+        return cards
+
+    def _read(self, card, key):
+        """
+        Integer value of one of the card's attributes, None if the sensor has
+        no reading right now. Raises OSError if the card is gone.
+        """
+        try:
+            fd = card.fds.get(key)
+            if fd is None:
+                fd = card.fds[key] = os.open(card.files[key], os.O_RDONLY)
+            text = os.pread(fd, 64, 0).strip()
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.ENODEV, errno.ENXIO):
+                raise
+            # e.g. ENODATA from a powered-down sensor.
+            return None
+        return int(text) if text.lstrip(b"-").isdigit() else None
+
+    def _close(self):
+        for card in self._cards or ():
+            for fd in card.fds.values():
+                os.close(fd)
+            card.fds.clear()
+
+    def _nvidia_driver_loaded(self):
+        return os.path.exists(self.nvidia_driver_path)
+
+    def sample(self):
+        """
+        Return [stats] with card, vendor, driver, pci_slot, utilization,
+        memory_used, memory_total, temperatures {label: Celsius}, fan_rpm,
+        fan_failure and power_watts; a value is None when the card does not
+        report it.
+        """
+        with self._lock:
+            # A card that disappears mid-read gets one fresh enumeration in the same call.
+            for _ in range(2):
+                cards = self._cards if self._cards is not None else self._enumerate()
+                try:
+                    return [self._card_stats(card, {key: self._read(card, key) for key in card.files}) for card in cards]
+                except OSError as e:
+                    logger.warning(f"Lost a GPU under {self.drm_root} ({e}); enumerating again")
+                    self._close()
+                    self._cards = None
+            return []
+
+    def _card_stats(self, card, values):
+        temperatures = {
+            card.temperature_labels[key]: value / 1000.0
+            for key, value in values.items() if key in card.temperature_labels and value is not None
+        }
+        fans = [(key, value) for key, value in values.items() if "/fan" in key and key.endswith("_input") and value is not None]
+        # A fan is failed when its fault flag is set, or it is stopped while the driver drives it (pwm > 0).
+        commanded = any(value for key, value in values.items() if "/pwm" in key)
+        fan_failure = any(value for key, value in values.items() if key.endswith("_fault")) or (
+            commanded and bool(fans) and all(value == 0 for _, value in fans)
+        )
+        power = next((value for key, value in sorted(values.items()) if "/power" in key and value is not None), None)
+
+        entry = {
+            "card": card.name,
+            "vendor": card.vendor,
+            "driver": card.driver,
+            "pci_slot": card.pci_slot,
+            "utilization": values.get("gpu_busy_percent"),
+            "memory_used": values.get("mem_info_vram_used"),
+            "memory_total": card.memory_total,
+            "temperatures": temperatures,
+            "fan_rpm": max((value for _, value in fans), default=None),
+            "fan_percent": None,
+            "fan_failure": fan_failure,
+            # hwmon power is in microwatts.
+            "power_watts": round(power / 1e6, 2) if power is not None else None,
+        }
+
+        if card.vendor == "NVIDIA" and self.nvml is not None and self._nvidia_driver_loaded():
+            nvml_values = self.nvml.sample(card.pci_slot)
+            if "temperature" in nvml_values:
+                entry["temperatures"] = dict(entry["temperatures"], gpu=float(nvml_values["temperature"]))
+            if "utilization" in nvml_values:
+                entry["utilization"] = nvml_values["utilization"]
+            if "memory" in nvml_values:
+                entry["memory_used"], entry["memory_total"] = nvml_values["memory"].used, nvml_values["memory"].total
+            if "fan_percent" in nvml_values:
+                entry["fan_percent"] = nvml_values["fan_percent"]
+            if "power_watts" in nvml_values:
+                entry["power_watts"] = round(nvml_values["power_watts"], 2)
+        return entry
+
+    def close(self):
+        with self._lock:
+            self._close()
+            self._cards = None
+
+
+# Shared across GPUCheck instances so cards are enumerated once per process.
+gpu_sampler = SysfsGPUSampler(nvml=NVMLBackend())
+
+# A sampler for a configured drm_root, kept for the same reason; replaced (and
+# its descriptors closed) when the configuration changes.
+_configured_sampler = None
+_configured_settings = None
+_configured_lock = threading.Lock()
+
+
+def get_gpu_sampler(drm_root=None, nvidia_driver_path=PROC_DRIVER_NVIDIA, nvml=True):
+    """The shared sampler for `drm_root`, or `gpu_sampler` when none is configured."""
+    global _configured_sampler, _configured_settings
+
+    if not drm_root:
+        return gpu_sampler
+    settings = (drm_root, nvidia_driver_path, bool(nvml))
+    with _configured_lock:
+        if _configured_sampler is None or _configured_settings != settings:
+            if _configured_sampler is not None:
+                _configured_sampler.close()
+            _configured_sampler = SysfsGPUSampler(drm_root, nvidia_driver_path, NVMLBackend() if nvml else None)
+            _configured_settings = settings
+        return _configured_sampler
+
+
+class GPUCheck(Check):
+
+    name = "gpu"
+    platform_collectors = {
+        "Linux": "_get_linux_gpu_info",
+    }
+
+    def __init__(self, config):
+        super().__init__(config)
+        gpu_config = self.config.get("gpu", {})
+        self._sampler = get_gpu_sampler(
+            gpu_config.get("drm_root"), gpu_config.get("nvidia_driver_path", PROC_DRIVER_NVIDIA), gpu_config.get("nvml", True),
+        )
+
+    def run(self, snapshot=None):
+
+        results = self.collect(snapshot)
+        if self._collector is None:
+            logger.error(f"Unsupported OS for GPU check: {self.os_type}")
+
+        for result in results:
+            write_to_check_results({"GPU Information": result})
+
+        return results
+
+    def _card_result(self, entry):
+        statuses = []
+        temperature = max(entry["temperatures"].values(), default=None)
+        if temperature is not None:
+            statuses.append(self.evaluate("temperature", temperature))
+        if entry["utilization"] is not None:
+            statuses.append(self.evaluate("utilization", entry["utilization"]))
+
+        memory_percent = None
+        if entry["memory_used"] is not None and entry["memory_total"]:
+            memory_percent = round(100.0 * entry["memory_used"] / entry["memory_total"], 2)
+            statuses.append(self.evaluate("memory_usage", memory_percent))
+        if entry["fan_failure"]:
+            statuses.append("CRIT")
+
+        metrics = [
+            Metric("Card", entry["card"]),
+            Metric("Vendor", entry["vendor"]),
+            Metric("Driver", entry["driver"]),
+            Metric("PCI Slot", entry["pci_slot"]),
+            Metric("Utilization Percent", entry["utilization"], UNIT_PERCENT),
+            Metric("Memory Used", entry["memory_used"], UNIT_BYTES),
+            Metric("Memory Total", entry["memory_total"], UNIT_BYTES),
+            Metric("Memory Used Percent", memory_percent, UNIT_PERCENT),
+            Metric("Temperature Celsius", temperature),
+            Metric("Fan Speed RPM", entry["fan_rpm"]),
+            Metric("Fan Speed Percent", entry["fan_percent"], UNIT_PERCENT),
+            Metric("Fan Failure", entry["fan_failure"]),
+            Metric("Power Watts", entry["power_watts"]),
+        ]
+        metrics.extend(Metric(f"Temperatures.{label}", value) for label, value in entry["temperatures"].items())
+
+        status = worst_status(*statuses)
+        logger.info(f"Retrieved GPU Information | Card: {entry['card']} ({entry['vendor']} {entry['driver']}) | Utilization: {entry['utilization']}% | Memory: {memory_percent}% | Temperature: {temperature} C | Fan Failure: {entry['fan_failure']}")
+
+        readings = []
+        if entry["utilization"] is not None:
+            readings.append(f"{entry['utilization']}% utilization")
+        if memory_percent is not None:
+            readings.append(f"{memory_percent}% memory used")
+        if temperature is not None:
+            readings.append(f"{temperature} C")
+        if entry["fan_failure"]:
+            readings.append("a fan has failed")
+
+        return CheckResult(
+            self.name, status, metrics,
+            "GPU {} ({}): {}.", (entry["card"], entry["vendor"], ", ".join(readings) or "no sensor readings"),
+        )
+
+    def _get_linux_gpu_info(self, snapshot=None):
+
+        results = []
+
+        try:
+            for entry in self._sampler.sample():
+                results.append(self._card_result(entry))
+
+            if not results:
+                results.append(CheckResult(self.name, "OK", (), "No GPUs found under {}.", (self._sampler.drm_root,)))
+
+        except Exception as e:
+            logger.error(f"Error retrieving GPU information on Linux: {e}")
+            results.append(CheckResult.unknown(self.name, "Error: {}", e))
+
+        return results
@@ -0,0 +1,220 @@
+"""
+Hang-proof statvfs probing for DiskCheck.
+
+A stale NFS/CIFS mount blocks statvfs in uninterruptible sleep, and a thread
+stuck that way can never be reclaimed. Probes therefore run in a small pool of
+reusable worker processes. A probe that misses its deadline gets its worker
+killed and replaced, and the mount is quarantined with exponential backoff so
+later cycles skip it instead of piling up more stuck workers.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import wait
+
+logger = logging.getLogger(__name__)
+
+PROBE_OK = "ok"
+PROBE_ERROR = "error"
+PROBE_TIMEOUT = "timeout"
+PROBE_QUARANTINED = "quarantined"
+PROBE_UNAVAILABLE = "unavailable"
+
+WORKER_STARTUP_TIMEOUT = 10.0
+
+
+def _probe_worker(connection):
+    """Worker process loop: statvfs each path received until told to stop."""
+    connection.send("ready")
+    while True:
+        try:
+            path = connection.recv()
+        except (EOFError, OSError):
+            return
+        if path is None:
+            return
+        try:
+            connection.send((PROBE_OK, tuple(os.statvfs(path))))
+        except OSError as e:
+            connection.send((PROBE_ERROR, str(e)))
+
+
+class _Worker:
+
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_probe_worker, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+        # Probe deadlines must not include interpreter start-up time.
+        if not self.connection.poll(WORKER_STARTUP_TIMEOUT) or self.connection.recv() != "ready":
+            self.process.kill()
+            self.connection.close()
+            raise OSError("mount probe worker did not start")
+        self.mount_point = None
+        self.deadline = None
+
+
+class MountProber:
+    """
+    Pool of worker processes that run os.statvfs with a per-mount timeout.
+
+    `probe()` returns {mount_point: (outcome, payload)} where outcome is one of
+    PROBE_OK (payload is an os.statvfs_result), PROBE_ERROR (payload is the
+    error message), PROBE_TIMEOUT, PROBE_QUARANTINED (payload is the number of
+    seconds until the next attempt) or PROBE_UNAVAILABLE (no worker free).
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 2,
+        timeout: float = 2.0,
+        max_stuck_workers: int = 4,
+        base_backoff: float = 30.0,
+        max_backoff: float = 3600.0,
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_stuck_workers = max_stuck_workers
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = []
+        self._stuck = []
+        self._quarantine = {}
+        self._lock = threading.Lock()
+
+    def probe(self, mount_points):
+        with self._lock:
+            self._reap_stuck()
+            now = time.monotonic()
+            outcomes = {}
+            queue = []
+
+            for mount_point in mount_points:
+                entry = self._quarantine.get(mount_point)
+                if entry is not None and entry["until"] > now:
+                    outcomes[mount_point] = (PROBE_QUARANTINED, round(entry["until"] - now, 1))
+                else:
+                    queue.append(mount_point)
+
+            queue.reverse()
+            busy = {}
+            while queue or busy:
+                while queue and self._ensure_idle_worker(len(busy)):
+                    worker = self._idle.pop()
+                    worker.mount_point = queue.pop()
+                    worker.deadline = time.monotonic() + self.timeout
+                    try:
+                        worker.connection.send(worker.mount_point)
+                    except OSError:
+                        queue.append(worker.mount_point)
+                        self._discard(worker)
+                        continue
+                    busy[worker.connection] = worker
+
+                if not busy:
+                    # No worker could be started or the stuck-worker cap is reached.
+                    for mount_point in queue:
+                        outcomes[mount_point] = (PROBE_UNAVAILABLE, None)
+                    break
+
+                next_deadline = min(worker.deadline for worker in busy.values())
+                for connection in wait(list(busy), timeout=max(0.0, next_deadline - time.monotonic())):
+                    worker = busy.pop(connection)
+                    try:
+                        outcome, payload = connection.recv()
+                    except (EOFError, OSError) as e:
+                        outcomes[worker.mount_point] = (PROBE_ERROR, f"probe worker died: {e}")
+                        self._discard(worker)
+                        continue
+                    if outcome == PROBE_OK:
+                        payload = os.statvfs_result(payload)
+                        self._quarantine.pop(worker.mount_point, None)
+                    outcomes[worker.mount_point] = (outcome, payload)
+                    worker.mount_point = None
+                    self._idle.append(worker)
+
+                now = time.monotonic()
+                for connection, worker in list(busy.items()):
+                    if worker.deadline <= now:
+                        del busy[connection]
+                        outcomes[worker.mount_point] = (PROBE_TIMEOUT, None)
+                        self._quarantine_mount(worker.mount_point, now)
+                        self._mark_stuck(worker)
+
+            return outcomes
+
+    def health(self):
+        """Pool statistics reported as agent health metrics."""
+        with self._lock:
+            self._reap_stuck()
+            return {
+                "pool_size": self.pool_size,
+                "idle_workers": len(self._idle),
+                "stuck_workers": len(self._stuck),
+                "quarantined_mounts": sorted(self._quarantine),
+            }
+
+    def close(self):
+        with self._lock:
+            for worker in self._idle:
+                try:
+                    worker.connection.send(None)
+                except OSError:
+                    pass
+                worker.process.join(timeout=1.0)
+                self._discard(worker)
+            self._idle = []
+            for worker in self._stuck:
+                worker.process.kill()
+            self._reap_stuck()
+
+    def _ensure_idle_worker(self, busy_count) -> bool:
+        if self._idle:
+            return True
+        # Stuck workers are replaced, but only while they stay under the cap;
+        # past it no new processes are started until some of them exit.
+        if len(self._stuck) >= self.max_stuck_workers:
+            return False
+        if busy_count >= self.pool_size:
+            return False
+        try:
+            self._idle.append(_Worker(self._context))
+        except OSError as e:
+            logger.error(f"Failed to start mount probe worker: {e}")
+            return False
+        return True
+
+    def _quarantine_mount(self, mount_point, now):
+        entry = self._quarantine.get(mount_point, {"failures": 0})
+        failures = entry["failures"] + 1
+        backoff = min(self.base_backoff * 2 ** (failures - 1), self.max_backoff)
+        self._quarantine[mount_point] = {"failures": failures, "until": now + backoff}
+        logger.warning(f"Mount {mount_point} did not respond within {self.timeout}s; skipping it for {backoff}s")
+
+    def _mark_stuck(self, worker):
+        # SIGKILL is only delivered once the blocked syscall returns, so the
+        # process is kept in the stuck list until it has actually exited.
+        worker.process.kill()
+        worker.connection.close()
+        self._stuck.append(worker)
+
+    def _reap_stuck(self):
+        still_stuck = []
+        for worker in self._stuck:
+            if worker.process.is_alive():
+                still_stuck.append(worker)
+            else:
+                worker.process.join(timeout=0)
+        self._stuck = still_stuck
+
+    def _discard(self, worker):
+        worker.connection.close()
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=0)
@@ -0,0 +1,309 @@
+from .base import Check, worst_status
+from ..logging_setup import configure_daily_logging
+from .snapshot import read_source, sample_time
+from .result import CheckResult, Metric, UNIT_BYTES_PER_SECOND, UNIT_COUNT, UNIT_MBPS, UNIT_PERCENT, UNIT_PER_SECOND
+from ..utils.procfs import PROC_NET_DEV, SYS_CLASS_NET, NET_DEV_FIELDS, read_first_line, parse_net_dev
+from tools.write_to_json_file import write_to_check_results
+
+import psutil
+import fnmatch
+import os
+import re
+import sys
+import threading
+import logging
+
+configure_daily_logging()
+logger = logging.getLogger(__name__)
+
+# Loopback plus the virtual interfaces container runtimes, bridges and overlay
+# networks create, which can number in the thousands. Override with
+# config['network']['exclude_interfaces'], or list the only interfaces to
+# report in config['network']['include_interfaces'].
+DEFAULT_EXCLUDE_INTERFACES = (
+    "lo", "veth*", "docker*", "br-*", "virbr*", "cni*", "flannel*", "cali*",
+    "vxlan*", "genev_sys_*", "kube-*", "tap*", "ifb*", "dummy*",
+)
+
+# A link that has run below its fastest speed for this long (e.g. it was
+# deliberately set to 100 Mb/s, or the NIC was replaced) is taken to be at its
+# new normal speed. Override with config['network']['peak_speed_reset_sec'].
+DEFAULT_PEAK_SPEED_RESET_SECONDS = 3600.0
+
+_FIELD = {name: position for position, name in enumerate(NET_DEV_FIELDS)}
+
+_32_BIT = 2 ** 32
+_64_BIT = 2 ** 64
+
+# /proc/net/dev prints the kernel's unsigned longs, which are 32 bits wide on 32-bit kernels.
+PROC_NET_DEV_COUNTER_BITS = 64 if sys.maxsize > _32_BIT else 32
+
+
+def counter_delta(before, after, bits=64):
+    """
+    Difference between two readings of an unsigned `bits`-wide counter. A
+    decrease is a wrap for 32-bit counters, and for 64-bit ones only when
+    `before` was within 2^32 of the top; any other decrease means the counter
+    was reset (e.g. the interface was recreated) and only the new value counts.
+    """
+    if after >= before:
+        return after - before
+    if bits == 32:
+        return after + _32_BIT - before
+    if before > _64_BIT - _32_BIT:
+        return after + _64_BIT - before
+    return after
+
+
+def compile_interface_patterns(patterns):
+    """Combine fnmatch patterns into one regex so each name is matched in a single call."""
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+
+class NetDevSampler:
+    """
+    Persistent /proc/net/dev sampler. Each call to sample() reads
+    /proc/net/dev once and drops excluded interfaces by name before anything
+    else is done with them, so thousands of container veths cost no more than
+    their lines in that one read. Only the interfaces that remain are looked up
+    in /sys/class/net for link state, speed and carrier changes. Rates cover
+    the interval since the previous call; an interface seen for the first time
+    (including on the first call) has no deltas or flaps until its next sample.
+    The peak speed a slower link is compared with is forgotten once the link
+    has stayed slower for `peak_speed_reset` seconds, or is no longer selected.
+    """
+
+    counter_bits = PROC_NET_DEV_COUNTER_BITS
+
+    def __init__(self, net_dev_path: str = PROC_NET_DEV, sys_class_net: str = SYS_CLASS_NET):
+        self.net_dev_path = net_dev_path
+        self.sys_class_net = sys_class_net
+        self._previous = {}
+        self._previous_time = None
+        # {interface: (fastest link speed seen, when it first ran slower or None)},
+        # to notice a renegotiation to a slower speed.
+        self._peak_speed = {}
+        self._lock = threading.Lock()
+
+    def _link_state(self, interface):
+        base = os.path.join(self.sys_class_net, interface)
+        speed = read_first_line(os.path.join(base, "speed"))
+        carrier_changes = read_first_line(os.path.join(base, "carrier_changes"))
+        try:
+            speed = int(speed)
+        except (TypeError, ValueError):
+            speed = None
+        return {
+            "operstate": read_first_line(os.path.join(base, "operstate"), "unknown"),
+            # Virtual and link-down interfaces report -1 or fail the read.
+            "speed": speed if speed is not None and speed > 0 else None,
+            "carrier_changes": int(carrier_changes) if carrier_changes and carrier_changes.isdigit() else None,
+        }
+
+    def _read(self, include, exclude, snapshot):
+        """({interface: counters in NET_DEV_FIELDS order}, {interface: link state}) for the selected interfaces."""
+        selected = parse_net_dev(
+            read_source(snapshot, self.net_dev_path),
+            lambda interface: (include is None or include.match(interface)) and (exclude is None or not exclude.match(interface)),
+        )
+        return selected, {interface: self._link_state(interface) for interface in selected}
+
+    def sample(self, include=None, exclude=None, snapshot=None, peak_speed_reset=DEFAULT_PEAK_SPEED_RESET_SECONDS):
+        """
+        Return {interface: stats} for the interfaces matching the compiled
+        `include` regex (all when None) and not matching `exclude`.
+        """
+        selected, links = self._read(include, exclude, snapshot)
+        now = sample_time(snapshot)
+
+        with self._lock:
+            previous, previous_time = self._previous, self._previous_time
+            self._previous = {interface: (values, links[interface]["carrier_changes"]) for interface, values in selected.items()}
+            self._previous_time = now
+            # Rebuilt from the selected interfaces, so removed ones are dropped.
+            peaks = {}
+            for interface, link in links.items():
+                peak, slower_since = self._peak_speed.get(interface, (None, None))
+                speed = link["speed"]
+                if speed is not None:
+                    if peak is None or speed >= peak:
+                        peak, slower_since = speed, None
+                    elif slower_since is None:
+                        slower_since = now
+                    elif now - slower_since >= peak_speed_reset:
+                        peak, slower_since = speed, None
+                peaks[interface] = (peak, slower_since)
+            self._peak_speed = peaks
+            peak_speeds = {interface: peak for interface, (peak, _) in peaks.items()}
+
+        stats = {}
+        for interface, values in selected.items():
+            link = links[interface]
+            before = previous.get(interface)
+            if before is None:
+                # First sample of this interface: its counters cover an unknown
+                # span, so there are no rates until the next sample.
+                deltas = elapsed = flaps = None
+            else:
+                deltas = tuple(counter_delta(old, new, self.counter_bits) for old, new in zip(before[0], values))
+                elapsed = now - previous_time
+                flaps = (
+                    counter_delta(before[1], link["carrier_changes"], self.counter_bits)
+                    if before[1] is not None and link["carrier_changes"] is not None else None
+                )
+            stats[interface] = {"deltas": deltas, "elapsed": elapsed, "flaps": flaps, "peak_speed": peak_speeds[interface], **link}
+        return stats
+
+
+class PsutilNetSampler(NetDevSampler):
+    """
+    NetDevSampler over psutil's per-NIC counters, for platforms without
+    /proc/net/dev. The counters are 64-bit, so a decrease is a reset, and
+    there is no carrier-change count, so no link flaps.
+    """
+
+    counter_bits = 64
+
+    def __init__(self):
+        super().__init__(None, None)
+
+    def _read(self, include, exclude, snapshot):
+        counters = psutil.net_io_counters(pernic=True)
+        link_stats = psutil.net_if_stats()
+
+        selected = {}
+        links = {}
+        for interface, io in counters.items():
+            if (include is not None and not include.match(interface)) or (exclude is not None and exclude.match(interface)):
+                continue
+            values = [0] * len(NET_DEV_FIELDS)
+            values[_FIELD["rx_bytes"]], values[_FIELD["tx_bytes"]] = io.bytes_recv, io.bytes_sent
+            values[_FIELD["rx_packets"]], values[_FIELD["tx_packets"]] = io.packets_recv, io.packets_sent
+            values[_FIELD["rx_errors"]], values[_FIELD["tx_errors"]] = io.errin, io.errout
+            values[_FIELD["rx_drops"]], values[_FIELD["tx_drops"]] = io.dropin, io.dropout
+            selected[interface] = tuple(values)
+
+            link = link_stats.get(interface)
+            links[interface] = {
+                "operstate": ("up" if link.isup else "down") if link else "unknown",
+                "speed": link.speed if link and link.speed > 0 else None,
+                "carrier_changes": None,
+            }
+        return selected, links
+
+
+# Shared across NetworkCheck instances so every cycle measures the delta since the last one.
+net_dev_sampler = NetDevSampler()
+psutil_net_sampler = PsutilNetSampler()
+
+
+class NetworkCheck(Check):
+
+    name = "network"
+    platform_collectors = {
+        "Linux": "_get_linux_network_info",
+        "Windows": "_get_windows_network_info",
+    }
+
+    def __init__(self, config):
+        super().__init__(config)
+        network_config = self.config.get("network", {})
+        self._include = compile_interface_patterns(network_config.get("include_interfaces"))
+        self._exclude = compile_interface_patterns(network_config.get("exclude_interfaces", DEFAULT_EXCLUDE_INTERFACES))
+        self._peak_speed_reset = float(network_config.get("peak_speed_reset_sec", DEFAULT_PEAK_SPEED_RESET_SECONDS))
+
+    def run(self, snapshot=None):
+
+        results = self.collect(snapshot)
+        if self._collector is None:
+            logger.error(f"Unsupported OS for network check: {self.os_type}")
+
+        for result in results:
+            write_to_check_results({"Network Information": result})
+
+        return results
+
+    def _interface_result(self, interface, entry):
+        operstate, speed, deltas, elapsed, flaps = entry["operstate"], entry["speed"], entry["deltas"], entry["elapsed"], entry["flaps"]
+
+        # How far the link has renegotiated below the fastest speed it has had.
+        peak_speed = entry["peak_speed"]
+        speed_drop = round(100.0 * (peak_speed - speed) / peak_speed, 2) if peak_speed and speed else 0.0
+        statuses = [self.evaluate("link_speed_drop", speed_drop)]
+
+        def rate(field):
+            if deltas is None:
+                return None
+            return round(deltas[_FIELD[field]] / elapsed, 2) if elapsed > 0 else 0.0
+
+        if deltas is None:
+            packet_loss = error_rate = None
+        else:
+            packets = deltas[_FIELD["rx_packets"]] + deltas[_FIELD["tx_packets"]]
+            drops = deltas[_FIELD["rx_drops"]] + deltas[_FIELD["tx_drops"]]
+            errors = deltas[_FIELD["rx_errors"]] + deltas[_FIELD["tx_errors"]]
+            packet_loss = round(100.0 * drops / (packets + drops), 2) if packets + drops else 0.0
+            error_rate = round(errors / elapsed, 2) if elapsed > 0 else 0.0
+            statuses.append(self.evaluate("packet_loss", packet_loss))
+            statuses.append(self.evaluate("error_rate", error_rate))
+        if flaps is not None:
+            statuses.append(self.evaluate("disconnection_rate", flaps))
+
+        receive_bytes = rate("rx_bytes")
+        transmit_bytes = rate("tx_bytes")
+
+        metrics = (
+            Metric("Interface", interface),
+            Metric("Operational State", operstate),
+            Metric("Link Speed Mbps", speed, UNIT_MBPS),
+            Metric("Link Speed Drop Percent", speed_drop, UNIT_PERCENT),
+            Metric("Receive Bytes Rate", receive_bytes, UNIT_BYTES_PER_SECOND),
+            Metric("Transmit Bytes Rate", transmit_bytes, UNIT_BYTES_PER_SECOND),
+            Metric("Receive Packets Rate", rate("rx_packets"), UNIT_PER_SECOND),
+            Metric("Transmit Packets Rate", rate("tx_packets"), UNIT_PER_SECOND),
+            Metric("Receive Errors Rate", rate("rx_errors"), UNIT_PER_SECOND),
+            Metric("Transmit Errors Rate", rate("tx_errors"), UNIT_PER_SECOND),
+            Metric("Receive Drops Rate", rate("rx_drops"), UNIT_PER_SECOND),
+            Metric("Transmit Drops Rate", rate("tx_drops"), UNIT_PER_SECOND),
+            Metric("Error Rate", error_rate, UNIT_PER_SECOND),
+            Metric("Packet Loss Percent", packet_loss, UNIT_PERCENT),
+            Metric("Link Flaps", flaps, UNIT_COUNT),
+        )
+
+        logger.info(f"Retrieved Network Information | Interface: {interface} | State: {operstate} | RX: {receive_bytes} B/s | TX: {transmit_bytes} B/s | Loss: {packet_loss}% | Errors: {error_rate}/s | Flaps: {flaps}")
+
+        if deltas is None:
+            return CheckResult(
+                self.name, worst_status(*statuses), metrics,
+                "Interface {} is {}; rates start with its next sample.", (interface, operstate),
+            )
+        return CheckResult(
+            self.name, worst_status(*statuses), metrics,
+            "Interface {} is {} with {}% packet loss and {} link flaps.", (interface, operstate, packet_loss, flaps or 0),
+        )
+
+    def _collect(self, sampler, snapshot, platform_name):
+
+        results = []
+
+        try:
+            stats = sampler.sample(self._include, self._exclude, snapshot, self._peak_speed_reset)
+            for interface, entry in sorted(stats.items()):
+                results.append(self._interface_result(interface, entry))
+
+            if not results:
+                results.append(CheckResult(self.name, "OK", (), "No network interfaces matched the configured filters."))
+
+        except Exception as e:
+            logger.error(f"Error retrieving network information on {platform_name}: {e}")
+            results.append(CheckResult.unknown(self.name, "Error: {}", e))
+
+        return results
+
+    def _get_windows_network_info(self, snapshot=None):
+        return self._collect(psutil_net_sampler, snapshot, "Windows")
+
+    def _get_linux_network_info(self, snapshot=None):
+        return self._collect(net_dev_sampler, snapshot, "Linux")
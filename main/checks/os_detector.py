@@ -1,11 +1,23 @@
 """
 Detect the operating system and architecture of the current environment
+
+Host facts are computed once per process and cached. They are only recomputed
+when the kernel boot ID changes, which is checked at most every
+BOOT_ID_CHECK_INTERVAL seconds.
 """
 
 import os
 import platform
+import threading
+import time
+import types
+from typing import NamedTuple, Optional, Tuple
 
 from ..logging_setup import configure_daily_logging
+from ..utils.procfs import (
+    PROC_MOUNTINFO, PROC_SELF_CGROUP,
+    cpu_topology, read_first_line, read_text, parse_mountinfo, parse_proc_cgroup,
+)
 configure_daily_logging()
 
 import logging
@@ -13,29 +25,178 @@ logger = logging.getLogger(__name__)
 
 from tools.write_to_json_file import write_to_check_results
 
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+BOOT_ID_CHECK_INTERVAL = 60.0
+
+# DMI vendor/product substrings that identify common hypervisors.
+_HYPERVISOR_MARKERS = (
+    ("kvm", "kvm"), ("qemu", "qemu"), ("vmware", "vmware"), ("virtualbox", "virtualbox"),
+    ("xen", "xen"), ("microsoft corporation", "hyperv"), ("amazon ec2", "aws"),
+    ("google compute engine", "gce"), ("openstack", "openstack"),
+)
+
+
+class HostFacts(NamedTuple):
+    """Immutable description of the host the agent is running on."""
+    operating_system: str
+    version: str
+    kernel: str
+    architecture: Tuple[str, str]
+    machine: str
+    cpu: types.MappingProxyType
+    boot_id: Optional[str]
+    container: Optional[str]
+    virtualization: Optional[str]
+    # Where cgroup v2 is mounted, and the directory of the agent's own cgroup
+    # under it. Both are None on hosts without cgroup v2.
+    cgroup_root: Optional[str] = None
+    cgroup: Optional[str] = None
+
+
+def _detect_container() -> Optional[str]:
+    if os.environ.get("KUBERNETES_SERVICE_HOST"):
+        return "kubernetes"
+    if os.path.exists("/.dockerenv"):
+        return "docker"
+    if os.path.exists("/run/.containerenv"):
+        return "podman"
+
+    container = os.environ.get("container")
+    if container:
+        return container
+
+    try:
+        with open("/proc/1/cgroup", "r", encoding="utf-8") as file:
+            cgroups = file.read()
+    except OSError:
+        return None
+    for marker in ("kubepods", "docker", "containerd", "lxc", "libpod"):
+        if marker in cgroups:
+            return "kubernetes" if marker == "kubepods" else marker
+    return None
+
+
+def _detect_cgroup(mountinfo_path: str = PROC_MOUNTINFO, proc_cgroup_path: str = PROC_SELF_CGROUP):
+    """
+    (mount point, own cgroup directory) for cgroup v2. Inside a cgroup
+    namespace /proc/self/cgroup says "/" and the mount is already our own
+    cgroup; otherwise the path is relative to the root the mount exposes.
+    """
+    try:
+        mounts = [mount for mount in parse_mountinfo(read_text(mountinfo_path)) if mount["fstype"] == "cgroup2"]
+        path = parse_proc_cgroup(read_text(proc_cgroup_path))
+    except OSError:
+        return None, None
+    if not mounts or path is None:
+        return None, None
+
+    mount = mounts[0]
+    root = mount["root"].rstrip("/")
+    if root and (path == root or path.startswith(root + "/")):
+        path = path[len(root):]
+    own = os.path.normpath(os.path.join(mount["mount_point"], path.lstrip("/")))
+    return mount["mount_point"], own if os.path.isdir(own) else mount["mount_point"]
+
+
+def _detect_virtualization() -> Optional[str]:
+    dmi = " ".join(
+        (read_first_line(f"/sys/class/dmi/id/{name}", "") or "").lower()
+        for name in ("sys_vendor", "product_name")
+    )
+    for marker, name in _HYPERVISOR_MARKERS:
+        if marker in dmi:
+            return name
+
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as file:
+            for line in file:
+                if line.startswith("flags"):
+                    return "hypervisor" if " hypervisor" in line else None
+    except OSError:
+        pass
+    return None
+
+
+def _collect_host_facts(boot_id: Optional[str]) -> HostFacts:
+    operating_system = platform.system()
+    is_linux = operating_system == "Linux"
+
+    if is_linux:
+        cpu = cpu_topology()
+    else:
+        cpu = {"Architecture": platform.machine(), "CPU Count": os.cpu_count()}
+
+    cgroup_root, cgroup = _detect_cgroup() if is_linux else (None, None)
+
+    return HostFacts(
+        operating_system=operating_system,
+        version=platform.version(),
+        kernel=platform.release(),
+        architecture=platform.architecture(),
+        machine=platform.machine(),
+        cpu=types.MappingProxyType(dict(cpu)),
+        boot_id=boot_id,
+        container=_detect_container() if is_linux else None,
+        virtualization=_detect_virtualization() if is_linux else None,
+        cgroup_root=cgroup_root,
+        cgroup=cgroup,
+    )
+
+
+_host_facts = None
+_boot_id_checked_at = 0.0
+_host_facts_lock = threading.Lock()
+
+
+def get_host_facts() -> HostFacts:
+    """
+    Return the cached HostFacts, collecting them on first use and again only
+    after the boot ID has changed.
+    """
+    global _host_facts, _boot_id_checked_at
+
+    now = time.monotonic()
+    facts = _host_facts
+    if facts is not None and now - _boot_id_checked_at < BOOT_ID_CHECK_INTERVAL:
+        return facts
+
+    with _host_facts_lock:
+        boot_id = read_first_line(BOOT_ID_PATH)
+        if _host_facts is None or _host_facts.boot_id != boot_id:
+            if _host_facts is not None:
+                logger.info(f"Boot ID changed from {_host_facts.boot_id} to {boot_id}; refreshing host facts")
+                cpu_topology.cache_clear()
+            _host_facts = _collect_host_facts(boot_id)
+        _boot_id_checked_at = now
+        return _host_facts
+
+
 def detect_operating_system():
     """""
     Detects the operating system and architecture
     """
-    
-    operating_system_name = platform.system()
-    operating_system_version = platform.version()
-    system_architecture = platform.architecture()
+    facts = get_host_facts()
 
-    return operating_system_name, operating_system_version, system_architecture
+    return facts.operating_system, facts.version, facts.architecture
 
 
 def main():
-    os_info = detect_operating_system()
-    logger.info(f"Retrieved OS information: {os_info[0]} {os_info[1]} {os_info[2]}")
+    facts = get_host_facts()
+    logger.info(f"Retrieved OS information: {facts.operating_system} {facts.version} {facts.architecture}")
 
     try:
         json_title = "Operating System Information"
         operating_system_information ={
-            
-            "Operating System": os_info[0],
-            "Version": os_info[1],
-            "Architecture": os_info[2]
+
+            "Operating System": facts.operating_system,
+            "Version": facts.version,
+            "Kernel": facts.kernel,
+            "Architecture": facts.architecture,
+            "Boot ID": facts.boot_id,
+            "Container": facts.container,
+            "Virtualization": facts.virtualization,
+            "Cgroup": facts.cgroup,
+            "CPU": dict(facts.cpu)
         }
 
         data_to_write = {json_title: operating_system_information}
@@ -47,6 +208,6 @@ def main():
         logger.error(f"Error writing OS information to JSON file: {e}")
         return None
 
-    
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,220 @@
+from .base import Check, worst_status
+from ..logging_setup import configure_daily_logging
+from .snapshot import read_source, sample_time
+from .cgroup_check import own_cgroup_sampler
+from .result import CheckResult, Metric, UNIT_BYTES, UNIT_PERCENT, UNIT_PER_SECOND
+from ..utils.procfs import (
+    PROC_MEMINFO, PROC_VMSTAT, PROC_PRESSURE,
+    parse_meminfo, parse_vmstat, parse_pressure,
+)
+from tools.write_to_json_file import write_to_check_results
+
+import psutil
+import os
+import threading
+import logging
+
+configure_daily_logging()
+logger = logging.getLogger(__name__)
+
+# /proc/vmstat counters turned into per-second rates (pswpin/pswpout are pages).
+VMSTAT_RATE_COUNTERS = ("pswpin", "pswpout", "pgmajfault")
+
+
+class MemoryCounterSampler:
+    """
+    Persistent /proc/meminfo, /proc/vmstat and /proc/pressure/memory sampler.
+    Each call to sample() reads every file once and returns the current
+    memory figures plus swap and major-fault rates and the PSI stall share for
+    the interval since the previous call. The first call has no previous
+    sample and reports the averages since boot (CLOCK_MONOTONIC starts at
+    boot on Linux), so it never has to sleep to produce a value.
+    """
+
+    def __init__(self, meminfo_path: str = PROC_MEMINFO, vmstat_path: str = PROC_VMSTAT,
+                 pressure_path: str = os.path.join(PROC_PRESSURE, "memory")):
+        self.meminfo_path = meminfo_path
+        self.vmstat_path = vmstat_path
+        self.pressure_path = pressure_path
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def sample(self, snapshot=None):
+        meminfo = parse_meminfo(read_source(snapshot, self.meminfo_path))
+        counters = parse_vmstat(read_source(snapshot, self.vmstat_path), VMSTAT_RATE_COUNTERS)
+        try:
+            pressure = parse_pressure(read_source(snapshot, self.pressure_path))
+        except OSError:
+            # PSI needs Linux 4.20+ with CONFIG_PSI and may be disabled at boot.
+            pressure = {}
+        now = sample_time(snapshot)
+
+        stall_totals = {kind: values.get("total", 0) for kind, values in pressure.items()}
+        current = (now, counters, stall_totals)
+
+        with self._lock:
+            previous = self._previous
+            self._previous = current
+
+        if previous is None:
+            elapsed = now
+            previous_counters, previous_stalls = {}, {}
+        else:
+            elapsed = now - previous[0]
+            previous_counters, previous_stalls = previous[1], previous[2]
+
+        def rate(before, after):
+            # Counters reset on overflow or container restore; treat that as a fresh start.
+            delta = after - before if after >= before else after
+            return round(delta / elapsed, 2) if elapsed > 0 else 0.0
+
+        rates = {name: rate(previous_counters.get(name, 0), value) for name, value in counters.items()}
+        # Stall totals are microseconds, so delta / elapsed / 10^4 is a percentage of wall time.
+        stalls = {kind: round(min(rate(previous_stalls.get(kind, 0), total) / 10_000, 100.0), 2)
+                  for kind, total in stall_totals.items()}
+        return meminfo, rates, pressure, stalls
+
+
+# Shared across RAMCheck instances so every cycle measures the delta since the last one.
+memory_sampler = MemoryCounterSampler()
+
+
+class RAMCheck(Check):
+
+    name = "memory"
+    aliases = ("ram",)
+    process_ranking = "memory"
+    platform_collectors = {
+        "Linux": "_get_linux_ram_info",
+        "Windows": "_get_windows_ram_info",
+    }
+
+    def run(self, snapshot=None):
+
+        results = self.collect(snapshot)
+        if self._collector is None:
+            logger.error(f"Unsupported OS for RAM check: {self.os_type}")
+
+        for result in results:
+            write_to_check_results({"RAM Information": result})
+
+        return results
+
+    def _get_windows_ram_info(self, snapshot=None):
+
+        results = []
+
+        try:
+            memory = psutil.virtual_memory()
+            swap = psutil.swap_memory()
+            usage = round(memory.percent, 2)
+            status = self.evaluate("usage", usage)
+
+            metrics = [
+                Metric("Total Memory", memory.total, UNIT_BYTES),
+                Metric("Available Memory", memory.available, UNIT_BYTES),
+                Metric("Used Memory", memory.total - memory.available, UNIT_BYTES),
+                Metric("Percentage Used", usage, UNIT_PERCENT),
+                Metric("Available Percent", round(100.0 - usage, 2), UNIT_PERCENT),
+                Metric("Swap Total", swap.total, UNIT_BYTES),
+                Metric("Swap Used", swap.used, UNIT_BYTES),
+                Metric("Swap Percentage Used", round(swap.percent, 2), UNIT_PERCENT),
+            ]
+
+            logger.info(f"Retrieved RAM Information | Used: {usage}% | Swap Used: {swap.percent}%")
+
+            results.append(CheckResult(self.name, status, metrics, "Memory usage at {}%.", (usage,)))
+
+        except Exception as e:
+            logger.error(f"Error retrieving RAM information on Windows: {e}")
+            results.append(CheckResult.unknown(self.name, "Error: {}", e))
+
+        return results
+
+    def _get_linux_ram_info(self, snapshot=None):
+
+        results = []
+
+        try:
+            meminfo, rates, pressure, stalls = memory_sampler.sample(snapshot)
+
+            total = meminfo["MemTotal"]
+            available = meminfo.get("MemAvailable")
+            if available is None:
+                # Kernels before 3.14 have no MemAvailable; approximate it.
+                available = meminfo.get("MemFree", 0) + meminfo.get("Buffers", 0) + meminfo.get("Cached", 0)
+            available_percent = round(100.0 * available / total, 2) if total else 0.0
+            usage = round(100.0 - available_percent, 2)
+
+            swap_total = meminfo.get("SwapTotal", 0)
+            swap_used = swap_total - meminfo.get("SwapFree", 0)
+
+            # Inside a container /proc/meminfo is the host's; judge usage against the cgroup's limit instead.
+            memory_limit, working_set = own_cgroup_sampler.memory(snapshot)
+            limited = memory_limit is not None and memory_limit < total and working_set is not None
+            limit_usage = round(100.0 * working_set / memory_limit, 2) if limited else None
+            swap_percent = round(100.0 * swap_used / swap_total, 2) if swap_total else 0.0
+            swap_in = rates.get("pswpin", 0.0)
+            swap_out = rates.get("pswpout", 0.0)
+            major_faults = rates.get("pgmajfault", 0.0)
+
+            statuses = [
+                self.evaluate("usage", limit_usage if limited else usage),
+                self.evaluate("swap_in_rate", swap_in),
+                self.evaluate("swap_out_rate", swap_out),
+                self.evaluate("major_fault_rate", major_faults),
+            ]
+            if pressure:
+                statuses.append(self.evaluate("stall_some", stalls.get("some", 0.0)))
+                statuses.append(self.evaluate("stall_full", stalls.get("full", 0.0)))
+            status = worst_status(*statuses)
+
+            metrics = [
+                Metric("Total Memory", total, UNIT_BYTES),
+                Metric("Available Memory", available, UNIT_BYTES),
+                Metric("Used Memory", total - available, UNIT_BYTES),
+                Metric("Free Memory", meminfo.get("MemFree", 0), UNIT_BYTES),
+                Metric("Buffers", meminfo.get("Buffers", 0), UNIT_BYTES),
+                Metric("Cached", meminfo.get("Cached", 0), UNIT_BYTES),
+                Metric("Percentage Used", usage, UNIT_PERCENT),
+                Metric("Available Percent", available_percent, UNIT_PERCENT),
+                Metric("Swap Total", swap_total, UNIT_BYTES),
+                Metric("Swap Used", swap_used, UNIT_BYTES),
+                Metric("Swap Percentage Used", swap_percent, UNIT_PERCENT),
+                Metric("Swap In Rate", swap_in, UNIT_PER_SECOND),
+                Metric("Swap Out Rate", swap_out, UNIT_PER_SECOND),
+                Metric("Major Fault Rate", major_faults, UNIT_PER_SECOND),
+            ]
+            if pressure:
+                metrics.extend([
+                    Metric("Pressure Some Avg10", pressure.get("some", {}).get("avg10", 0.0), UNIT_PERCENT),
+                    Metric("Pressure Full Avg10", pressure.get("full", {}).get("avg10", 0.0), UNIT_PERCENT),
+                    Metric("Stall Some Percent", stalls.get("some", 0.0), UNIT_PERCENT),
+                    Metric("Stall Full Percent", stalls.get("full", 0.0), UNIT_PERCENT),
+                ])
+            if limited:
+                metrics.extend([
+                    Metric("Cgroup Memory Limit", memory_limit, UNIT_BYTES),
+                    Metric("Cgroup Working Set", working_set, UNIT_BYTES),
+                    Metric("Cgroup Usage Percent", limit_usage, UNIT_PERCENT),
+                ])
+
+            logger.info(f"Retrieved RAM Information | Used: {usage}% | Swap In: {swap_in}/s | Swap Out: {swap_out}/s | Major Faults: {major_faults}/s")
+
+            if limited:
+                results.append(CheckResult(
+                    self.name, status, metrics,
+                    "Memory usage at {}% of the cgroup limit ({}% of host memory) with {}% of swap in use.",
+                    (limit_usage, usage, swap_percent),
+                ))
+            else:
+                results.append(CheckResult(
+                    self.name, status, metrics,
+                    "Memory usage at {}% with {}% of swap in use.", (usage, swap_percent),
+                ))
+
+        except Exception as e:
+            logger.error(f"Error retrieving RAM information on Linux: {e}")
+            results.append(CheckResult.unknown(self.name, "Error: {}", e))
+
+        return results
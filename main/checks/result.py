@@ -0,0 +1,200 @@
+"""
+Typed, compact check results.
+
+A CheckResult holds its metrics as a tuple of slotted Metric objects (name,
+value, unit) instead of a per-result dict, with metric names and units
+interned so the strings are shared by every result of every cycle. The
+human-readable details are kept as a format string plus arguments and only
+formatted when someone reads them, and nothing is serialized until a
+consumer asks for `to_dict()`.
+
+For code written against the original dict schema, CheckResult also answers
+`result["metrics"]`, `result.get("status")` and friends, and `as_dict()` /
+`CheckResult.from_dict()` convert between the two shapes.
+"""
+
+import enum
+import sys
+
+
+class Status(str, enum.Enum):
+    """Check status. Members compare equal to their strings, e.g. Status.OK == "OK"."""
+
+    OK = "OK"
+    UNKNOWN = "UNKNOWN"
+    WARN = "WARN"
+    CRIT = "CRIT"
+
+    def __str__(self):
+        return self.value
+
+    @property
+    def severity(self):
+        return _SEVERITY[self]
+
+    @classmethod
+    def coerce(cls, status):
+        """Map a status string (or None) to a Status; unrecognised values become UNKNOWN."""
+        if isinstance(status, cls):
+            return status
+        try:
+            return cls(status)
+        except ValueError:
+            return cls.UNKNOWN
+
+
+_SEVERITY = {Status.OK: 0, Status.UNKNOWN: 1, Status.WARN: 2, Status.CRIT: 3}
+
+# Units used by the checks. Metric names and units are interned on creation.
+UNIT_BYTES = "bytes"
+UNIT_PERCENT = "percent"
+UNIT_PER_SECOND = "per_second"
+UNIT_BYTES_PER_SECOND = "bytes_per_second"
+UNIT_MILLISECONDS = "milliseconds"
+UNIT_SECONDS = "seconds"
+UNIT_MBPS = "megabits_per_second"
+UNIT_COUNT = "count"
+
+
+class Metric:
+
+    __slots__ = ("name", "value", "unit")
+
+    def __init__(self, name, value, unit=None):
+        self.name = sys.intern(name)
+        self.value = value
+        self.unit = sys.intern(unit) if unit is not None else None
+
+    def __repr__(self):
+        return f"Metric({self.name!r}, {self.value!r}, {self.unit!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Metric):
+            return NotImplemented
+        return (self.name, self.value, self.unit) == (other.name, other.value, other.unit)
+
+    def is_numeric(self):
+        return isinstance(self.value, (int, float))
+
+
+class CheckResult:
+    """
+    One result of one check. Nested values (e.g. per-core usage) are flat
+    metrics named "Parent.key"; `metrics_dict()` folds them back into a
+    nested dict.
+    """
+
+    __slots__ = ("name", "status", "metrics", "_details", "_details_args", "wall_time_seconds", "severity_metrics")
+
+    _KEYS = ("name", "status", "metrics", "details", "wall_time_seconds", "severity_metrics")
+
+    def __init__(self, name, status, metrics=(), details=None, details_args=None, wall_time_seconds=None, severity_metrics=None):
+        self.name = sys.intern(name)
+        self.status = Status.coerce(status)
+        self.metrics = tuple(metrics)
+        self._details = details
+        self._details_args = details_args
+        self.wall_time_seconds = wall_time_seconds
+        self.severity_metrics = severity_metrics
+
+    @classmethod
+    def unknown(cls, name, details, *details_args):
+        return cls(name, Status.UNKNOWN, (), details, details_args or None)
+
+    @property
+    def details(self):
+        """The details text, formatted from its template on first read."""
+        if self._details_args is not None:
+            self._details = self._details.format(*self._details_args)
+            self._details_args = None
+        return self._details
+
+    def extend_details(self, text):
+        """Append a sentence to the details, e.g. context gathered after the check ran."""
+        details = self.details
+        self._details = f"{details} {text}" if details else text
+
+    def metric(self, name, default=None):
+        for metric in self.metrics:
+            if metric.name == name:
+                return metric.value
+        return default
+
+    def metrics_dict(self):
+        metrics = {}
+        for metric in self.metrics:
+            parent, dot, key = metric.name.partition(".")
+            if dot:
+                metrics.setdefault(parent, {})[key] = metric.value
+            else:
+                value = metric.value
+                metrics[metric.name] = list(value) if isinstance(value, tuple) else value
+        return metrics
+
+    def to_dict(self):
+        """The original result dict schema."""
+        result = {"name": self.name, "status": self.status.value}
+        if self.metrics:
+            result["metrics"] = self.metrics_dict()
+        result["details"] = self.details
+        if self.wall_time_seconds is not None:
+            result["wall_time_seconds"] = self.wall_time_seconds
+        if self.severity_metrics:
+            result["severity_metrics"] = self.severity_metrics
+        return result
+
+    @classmethod
+    def from_dict(cls, result):
+        """Build a CheckResult from a result dict in the original schema."""
+        metrics = []
+        for key, value in (result.get("metrics") or {}).items():
+            if isinstance(value, dict):
+                metrics.extend(Metric(f"{key}.{sub_key}", sub_value) for sub_key, sub_value in value.items())
+            else:
+                metrics.append(Metric(key, tuple(value) if isinstance(value, list) else value))
+        return cls(
+            result.get("name", "unknown"),
+            result.get("status"),
+            metrics,
+            result.get("details"),
+            wall_time_seconds=result.get("wall_time_seconds"),
+            severity_metrics=result.get("severity_metrics"),
+        )
+
+    # Read-only mapping access in the dict schema, for existing consumers.
+
+    def __getitem__(self, key):
+        if key == "metrics":
+            return self.metrics_dict()
+        if key == "status":
+            return self.status.value
+        if key in self._KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [key for key in self._KEYS if key in self]
+
+    def __repr__(self):
+        return f"CheckResult({self.to_dict()!r})"
+
+
+def as_dict(result):
+    """Return `result` in the dict schema, whichever shape it is in."""
+    return result.to_dict() if isinstance(result, CheckResult) else result
+
+
+def as_result(result):
+    """Return `result` as a CheckResult, whichever shape it is in."""
+    return result if isinstance(result, CheckResult) else CheckResult.from_dict(result)
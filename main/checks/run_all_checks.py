@@ -1,33 +1,182 @@
 from .disk_check import DiskCheck
-# from .cpu_check import CPUCheck  # Uncomment when implemented
+from .cpu_check import CPUCheck
+from .ram_check import RAMCheck
+from .network_check import NetworkCheck
+from .cgroup_check import CgroupCheck
+from .gpu_check import GPUCheck
 # from .os_check import OSCheck    # Uncomment when implemented
 
 from .thresholds import thresholds
 from .base import Check
+from .snapshot import next_snapshot
+from .result import CheckResult, as_result
+from tools.write_to_json_file import flush_check_results
+from ..reporters.pipeline import publish_results
+from tools.metric_history import metric_history
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import threading
+import time
 
 # Use imported thresholds from thresholds.py
 check_config = {
-    "thresholds": thresholds
+    "thresholds": thresholds,
+    "executor": {
+        "max_workers": None,       # defaults to one worker per check
+        "default_timeout": 30.0,   # seconds a check may run before it is reported UNKNOWN
+        "timeouts": {},            # per-check overrides, e.g. {"disk": 60.0}
+    },
 }
 
-def run_all_checks():
-    checks = [
-        DiskCheck(check_config),
-        # CPUCheck(check_config),
-        # OSCheck(check_config),
-    ]
+# Checks run on a persistent, bounded thread pool. A check that overruns its
+# deadline keeps its worker until it returns, so it is tracked here and not
+# resubmitted until it finishes; at most one worker per check can be stuck.
+# The pool is sized by the first batch and never resized afterwards: replacing
+# it would abandon the workers of checks still running on the old one. Callers
+# that run checks one at a time (the daemon) pass a pool of their own.
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = {}
+
+# How often a batch with queued checks looks again for ones that have started.
+_START_POLL_INTERVAL = 0.05
+
+
+def _get_executor(max_workers):
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="merlin-check")
+        return _executor
+
+
+def _timed_run(check, snapshot, started_at, index):
+    started = started_at[index] = time.monotonic()
+    try:
+        return check.run(snapshot.view(check.name)), None, time.monotonic() - started
+    except Exception as e:
+        return None, e, time.monotonic() - started
+
+
+def _with_wall_time(check_results, wall_time):
+    # Checks return a list of CheckResults; a bare result or legacy dicts are adapted.
+    if isinstance(check_results, (CheckResult, dict)):
+        check_results = [check_results]
+    check_results = [as_result(result) for result in check_results]
+    for result in check_results:
+        result.wall_time_seconds = round(wall_time, 6)
+    return check_results
+
+
+def run_checks_concurrently(checks, config=None, snapshot=None, executor=None):
+    """
+    Run `checks` in parallel on `executor` (the shared pool by default),
+    giving each its own deadline. A deadline starts when the check starts
+    running, not when it is queued; a check that misses it is reported UNKNOWN
+    while the rest of the batch completes, and one still queued after its
+    timeout is cancelled and reported UNKNOWN. Results come back in the order
+    of `checks`, each carrying the check's wall time.
+
+    Every check reads its kernel sources through `snapshot` (a new tick is
+    started when none is given), so a source shared by several checks is read
+    once per batch; afterwards `snapshot.sources_touched()` lists what each
+    check read.
+    """
+    snapshot = snapshot or next_snapshot()
+    executor_config = (config or check_config).get("executor", {})
+    default_timeout = executor_config.get("default_timeout", 30.0)
+    timeouts = executor_config.get("timeouts", {})
+
+    if executor is None:
+        executor = _get_executor(executor_config.get("max_workers") or max(len(checks), 1))
+    outcomes = [None] * len(checks)
+    pending = {}
+    # Filled in by each worker as its check starts.
+    started_at = {}
+
+    for index, check in enumerate(checks):
+        previous = _in_flight.get(check.name)
+        if previous is not None and not previous.done():
+            skipped = CheckResult.unknown(check.name, "Skipped: the previous run of this check has not finished")
+            skipped.wall_time_seconds = 0.0
+            outcomes[index] = [skipped]
+            continue
+
+        future = executor.submit(_timed_run, check, snapshot, started_at, index)
+        _in_flight[check.name] = future
+        pending[future] = (index, check, time.monotonic())
+
+    while pending:
+        # Until a check starts, its timeout bounds how long it may wait for a worker.
+        wait_for = min(
+            started_at.get(index, submitted) + timeouts.get(check.name, default_timeout)
+            for index, check, submitted in pending.values()
+        ) - time.monotonic()
+        if any(index not in started_at for index, _, _ in pending.values()):
+            wait_for = min(wait_for, _START_POLL_INTERVAL)
+        done, _ = wait(pending, timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            index, check, _ = pending.pop(future)
+            check_results, error, wall_time = future.result()
+            if error is not None:
+                check_results = CheckResult.unknown(check.name, "Error running check: {}", error)
+            outcomes[index] = _with_wall_time(check_results, wall_time)
+
+        now = time.monotonic()
+        for future, (index, check, submitted) in list(pending.items()):
+            timeout = timeouts.get(check.name, default_timeout)
+            if index in started_at:
+                if now >= started_at[index] + timeout:
+                    del pending[future]
+                    outcomes[index] = _with_wall_time(CheckResult.unknown(check.name, "Timed out after {}s", timeout), timeout)
+            elif now >= submitted + timeout and future.cancel():
+                del pending[future]
+                outcomes[index] = _with_wall_time(
+                    CheckResult.unknown(check.name, "Not started within {}s: every check worker is busy", timeout), 0.0,
+                )
 
     results = []
-    for check in checks:
-        try:
-            check_results = check.run()
-            results.extend(check_results if isinstance(check_results, list) else [check_results])
-        except Exception as e:
-            results.append({
-                "name": check.name,
-                "status": "UNKNOWN",
-                "details": f"Error running check: {e}"
-            })
+    for outcome in outcomes:
+        results.extend(outcome)
+
+    # Keep recent samples in memory so checks and scoring can look back cheaply.
+    metric_history.record(results, snapshot.wall_time)
+    return results
+
+
+# Every check run_all_checks knows about, in reporting order.
+CHECK_CLASSES = [
+    DiskCheck,
+    CPUCheck,
+    RAMCheck,
+    NetworkCheck,
+    GPUCheck,
+    CgroupCheck,
+    # OSCheck,
+]
+
+
+def build_checks(config=None, enabled=None):
+    """Instantiate the registered checks, optionally limited to the names in `enabled`."""
+    config = config or check_config
+    enabled = {name.lower() for name in enabled} if enabled else None
+    return [
+        check_class(config) for check_class in CHECK_CLASSES
+        if enabled is None or check_class.name in enabled or enabled.intersection(check_class.aliases)
+    ]
+
+
+def run_all_checks():
+    checks = build_checks(check_config)
+
+    results = run_checks_concurrently(checks, check_config)
+
+    # Results are buffered by write_to_check_results; persist them in one write per cycle.
+    flush_check_results()
+    # Hand them to the configured reporters (a no-op when none are configured).
+    publish_results(results)
 
     return results
 
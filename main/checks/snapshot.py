@@ -0,0 +1,149 @@
+"""
+Cycle-scoped snapshot of the kernel sources the checks read.
+
+run_all_checks creates one CycleSnapshot per tick and hands each check a view
+of it. The first check to ask for a source (e.g. /proc/stat) reads it; every
+other check in the same tick gets the memoized value, so adding checks does
+not add duplicate reads and all checks see the same point in time. The
+values the tick before read stay reachable through `previous()` for delta
+computation (only that one tick is kept, never the whole chain), and each
+view records which sources its check touched.
+"""
+
+import threading
+import time
+
+from ..utils.procfs import read_text
+from .os_detector import get_host_facts
+
+
+class _Entry:
+
+    __slots__ = ("ready", "value", "error")
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class CycleSnapshot:
+
+    def __init__(self, previous=None):
+        # One monotonic timestamp for the whole tick; samplers use it as "now".
+        self.timestamp = time.monotonic()
+        self.wall_time = time.time()
+        self.tick = previous.tick + 1 if previous is not None else 0
+        self.touched = {}
+        self._entries = {}
+        self._lock = threading.Lock()
+        # (timestamp, value) of every source the previous tick read; copied so
+        # the previous snapshot itself, and the ones before it, can be freed.
+        self._previous = previous._settled() if previous is not None else {}
+
+    def _settled(self):
+        with self._lock:
+            entries = list(self._entries.items())
+        return {
+            key: (self.timestamp, entry.value)
+            for key, entry in entries if entry.ready.is_set() and entry.error is None
+        }
+
+    def get(self, key, loader, touched=None):
+        """
+        Return the value of `key` for this tick, calling `loader()` only the
+        first time it is asked for. Concurrent callers wait for that first
+        load. A loader error is memoized and raised to every caller. `key` is
+        added to `touched`, a view's set, when one is given.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = _Entry()
+            if touched is not None:
+                touched.add(key)
+
+        if owner:
+            try:
+                entry.value = loader()
+            except Exception as e:
+                entry.error = e
+            finally:
+                entry.ready.set()
+        else:
+            entry.ready.wait()
+
+        if entry.error is not None:
+            raise entry.error
+        return entry.value
+
+    def read_text(self, path, touched=None):
+        """Contents of `path` as of this tick."""
+        return self.get(path, lambda: read_text(path), touched)
+
+    def previous(self, key):
+        """(timestamp, value) of `key` as the previous tick read it, or None."""
+        return self._previous.get(key)
+
+    def view(self, check_name):
+        """A handle that attributes every source it reads to `check_name`."""
+        with self._lock:
+            touched = self.touched.setdefault(check_name, set())
+        return SnapshotView(self, touched)
+
+    def sources_touched(self):
+        """{check name: sorted source keys} for every check that read through a view this tick."""
+        with self._lock:
+            return {check_name: sorted(keys) for check_name, keys in self.touched.items()}
+
+
+class SnapshotView:
+    """What a check receives in run(): the tick's snapshot, recording what the check reads."""
+
+    __slots__ = ("snapshot", "touched")
+
+    def __init__(self, snapshot, touched):
+        self.snapshot = snapshot
+        self.touched = touched
+
+    @property
+    def timestamp(self):
+        return self.snapshot.timestamp
+
+    def get(self, key, loader):
+        return self.snapshot.get(key, loader, self.touched)
+
+    def read_text(self, path):
+        return self.snapshot.read_text(path, self.touched)
+
+    def previous(self, key):
+        return self.snapshot.previous(key)
+
+
+def read_source(snapshot, path):
+    """Read `path` through `snapshot` when one is given, directly otherwise."""
+    return snapshot.read_text(path) if snapshot is not None else read_text(path)
+
+
+def host_facts(snapshot):
+    """get_host_facts(), memoized for the tick when sampling inside a snapshot."""
+    return snapshot.get("host_facts", get_host_facts) if snapshot is not None else get_host_facts()
+
+
+def sample_time(snapshot):
+    """The tick's timestamp when sampling inside a snapshot, the current monotonic time otherwise."""
+    return snapshot.timestamp if snapshot is not None else time.monotonic()
+
+
+_last_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def next_snapshot():
+    """Start a new tick that can look back at the previous one's values."""
+    global _last_snapshot
+
+    with _snapshot_lock:
+        _last_snapshot = CycleSnapshot(_last_snapshot)
+        return _last_snapshot
@@ -3,7 +3,15 @@
 thresholds = {
     "disk": {
         "warn": 75.0,  # % disk used at which to warn
-        "crit": 90.0   # % disk used at which to raise a critical alert
+        "crit": 90.0,  # % disk used at which to raise a critical alert
+        "io_wait_time": {
+            "warn": 10.0,  # average ms per I/O request to warn
+            "crit": 50.0   # average ms per I/O request to alert
+        },
+        "utilization": {
+            "warn": 90.0,  # % of time the device was busy to warn
+            "crit": 98.0   # % of time the device was busy to alert
+        }
     },
     "cpu": {
         "warn": 80.0,  # % CPU usage to warn
@@ -11,7 +19,74 @@ thresholds = {
     },
     "memory": {
         "warn": 70.0,  # % memory used to warn
-        "crit": 90.0   # % memory used to alert
+        "crit": 90.0,  # % memory used to alert
+        "swap_in_rate": {
+            "warn": 100.0,   # pages swapped in per second to warn
+            "crit": 1000.0   # pages swapped in per second to alert
+        },
+        "swap_out_rate": {
+            "warn": 100.0,   # pages swapped out per second to warn
+            "crit": 1000.0   # pages swapped out per second to alert
+        },
+        "major_fault_rate": {
+            "warn": 500.0,   # major page faults per second to warn
+            "crit": 5000.0   # major page faults per second to alert
+        },
+        "stall_some": {
+            "warn": 10.0,  # % of the interval some tasks stalled on memory (PSI) to warn
+            "crit": 25.0   # % of the interval some tasks stalled on memory (PSI) to alert
+        },
+        "stall_full": {
+            "warn": 5.0,   # % of the interval all tasks stalled on memory (PSI) to warn
+            "crit": 10.0   # % of the interval all tasks stalled on memory (PSI) to alert
+        }
+    },
+    "network": {
+        "warn": 1.0,   # % packets dropped to warn
+        "crit": 3.0,   # % packets dropped to alert
+        "error_rate": {
+            "warn": 1.0,   # interface errors per second to warn
+            "crit": 5.0    # interface errors per second to alert
+        },
+        "link_speed_drop": {
+            "warn": 50.0,  # % below the fastest speed the link has had to warn
+            "crit": 90.0   # % below the fastest speed the link has had to alert
+        },
+        "disconnection_rate": {
+            "warn": 1,     # link flaps (carrier changes) in the interval to warn
+            "crit": 3      # link flaps (carrier changes) in the interval to alert
+        }
+    },
+    "cgroup": {
+        "cpu_limit": {
+            "warn": 80.0,  # % of the cgroup's CPU limit used to warn
+            "crit": 95.0   # % of the cgroup's CPU limit used to alert
+        },
+        "memory_limit": {
+            "warn": 85.0,  # % of the cgroup's memory limit in the working set to warn
+            "crit": 95.0   # % of the cgroup's memory limit in the working set to alert
+        },
+        "throttled": {
+            "warn": 10.0,  # % of the interval the cgroup was CPU-throttled to warn
+            "crit": 25.0   # % of the interval the cgroup was CPU-throttled to alert
+        },
+        "oom_kills": {
+            "crit": 1      # any OOM kill in the interval is critical
+        }
+    },
+    "gpu": {
+        "temperature": {
+            "warn": 75.0,  # hottest GPU sensor in Celsius to warn
+            "crit": 85.0   # hottest GPU sensor in Celsius to alert
+        },
+        "memory_usage": {
+            "warn": 80.0,  # % of VRAM used to warn
+            "crit": 95.0   # % of VRAM used to alert
+        },
+        "utilization": {
+            "warn": 90.0,  # % GPU busy to warn
+            "crit": 98.0   # % GPU busy to alert
+        }
     }
     # Add more component thresholds as needed
 }
@@ -1,36 +1,210 @@
 # main/logging_setup.py
 
+import atexit
+import copy
+import gzip
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
+import queue
+import re
+import shutil
 import time
+from datetime import datetime, timedelta, timezone
+
+# Defaults mirror the "logging" section of config.json.
+DEFAULT_MAX_LOG_SIZE_MB = 5
+DEFAULT_LOG_RETENTION_DAYS = 30
+
+_LOG_NAME = re.compile(r"^(\d{4}-\d{2}-\d{2})(?:\.(\d+))?\.log(?:\.gz)?$")
+
+_listener = None
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Render each record as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class RecordQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that merges the message arguments but leaves formatting to
+    the file handler. The stock prepare() formats the whole record in the
+    caller's thread and clears exc_info, so the JSON formatter never saw the
+    exception.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        return record
+
+
+class DailyRotatingFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    Write to `<log_directory>/YYYY-MM-DD.log` (UTC) and roll over at UTC midnight
+    or once the file exceeds `max_bytes`. Size rollovers move the current file
+    to `YYYY-MM-DD.N.log`. Finished files are gzip-compressed, and at each
+    rollover files older than `retention_days` are deleted.
+    """
+
+    def __init__(self, log_directory, max_bytes=0, retention_days=0, compress=True):
+        self.log_directory = log_directory
+        self.max_bytes = max_bytes
+        self.retention_days = retention_days
+        self.compress = compress
+        self.current_date = self._utc_date(time.time())
+        super().__init__(self._path_for(self.current_date), mode="a", encoding="utf-8", delay=True)
+
+    @staticmethod
+    def _utc_date(timestamp):
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime("%Y-%m-%d")
+
+    def _path_for(self, date):
+        return os.path.abspath(os.path.join(self.log_directory, f"{date}.log"))
+
+    def shouldRollover(self, record):
+        if self._utc_date(record.created) != self.current_date:
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() >= self.max_bytes
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        finished = None
+        today = self._utc_date(time.time())
+        if today != self.current_date:
+            finished = self.baseFilename
+            self.current_date = today
+            self.baseFilename = self._path_for(today)
+        elif os.path.exists(self.baseFilename):
+            index = 1
+            while any(os.path.exists(self._numbered_path(index) + suffix) for suffix in ("", ".gz")):
+                index += 1
+            finished = self._numbered_path(index)
+            os.replace(self.baseFilename, finished)
+
+        if finished and self.compress and os.path.exists(finished):
+            self._compress(finished)
+        self.prune()
+
+    def _numbered_path(self, index):
+        return os.path.join(self.log_directory, f"{self.current_date}.{index}.log")
+
+    @staticmethod
+    def _compress(path):
+        try:
+            with open(path, "rb") as source, gzip.open(path + ".gz", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.remove(path)
+        except OSError:
+            pass
+
+    def prune(self):
+        """Delete log files dated more than `retention_days` ago."""
+        if self.retention_days <= 0:
+            return
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        try:
+            names = os.listdir(self.log_directory)
+        except OSError:
+            return
+        for name in names:
+            match = _LOG_NAME.match(name)
+            if match and match.group(1) < cutoff:
+                try:
+                    os.remove(os.path.join(self.log_directory, name))
+                except OSError:
+                    pass
+
 
 def configure_daily_logging(
     log_directory: str = "logs",
     fmt: str = "{asctime} - {levelname} - {name} - {message}",
-    datefmt: str = "%Y-%m-%d %H:%M:%S"
+    datefmt: str = "%Y-%m-%d %H:%M:%S",
+    level: int = logging.INFO,
+    max_log_size_mb: float = DEFAULT_MAX_LOG_SIZE_MB,
+    log_retention_days: int = DEFAULT_LOG_RETENTION_DAYS,
+    rotate_logs: bool = True,
+    json_lines: bool = False,
+    prune_logs: bool = False,
 ):
     """
     Ensure the folder `log_directory` exists, then route all root‐logger
     output into a file named YYYY-MM-DD.log (appending if it exists).
     Safe to call multiple times.
-    """
-    # 1) Ensure the logs folder exists
-    os.makedirs(log_directory, exist_ok=True)
 
-    # 2) Build today's filename
-    todays_date = datetime.utcnow().strftime("%Y-%m-%d")
-    log_file = os.path.join(log_directory, f"{todays_date}.log")
+    Callers only enqueue records; a listener thread formats and writes them, so
+    logging never blocks check execution on disk I/O. With `rotate_logs` the
+    file rolls over at UTC midnight and at `max_log_size_mb`, and old files are
+    compressed and deleted after `log_retention_days`. `json_lines` writes one
+    JSON object per record instead of the text format. Old files are only
+    deleted at rollover, or straight away with `prune_logs` (the daemon sets
+    it; the defaults used when a module is imported never delete anything).
+    """
+    global _listener
 
-    # 3) Only configure once
+    # 1) Only configure once
     root = logging.getLogger()
-    if not root.handlers:
-        logging.Formatter.converter = time.gmtime
-        logging.basicConfig(
-            level=logging.INFO,
-            filename=log_file,
-            filemode="a",         
-            format=fmt,
-            datefmt=datefmt,
-            style='{',            
+    if root.handlers:
+        return
+
+    # 2) Ensure the logs folder exists
+    os.makedirs(log_directory, exist_ok=True)
+
+    # 3) Build the file handler that the listener thread writes through
+    logging.Formatter.converter = time.gmtime
+    if rotate_logs:
+        file_handler = DailyRotatingFileHandler(
+            log_directory,
+            max_bytes=int(max_log_size_mb * 1024 * 1024),
+            retention_days=log_retention_days,
         )
+        if prune_logs:
+            file_handler.prune()
+    else:
+        todays_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        file_handler = logging.FileHandler(os.path.join(log_directory, f"{todays_date}.log"), mode="a", encoding="utf-8")
+
+    if json_lines:
+        file_handler.setFormatter(JsonLinesFormatter(datefmt=datefmt))
+    else:
+        file_handler.setFormatter(logging.Formatter(fmt, datefmt=datefmt, style="{"))
+
+    # 4) Route the root logger through an unbounded queue
+    log_queue = queue.SimpleQueue()
+    root.addHandler(RecordQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Drain queued records to disk and stop the listener thread."""
+    global _listener
+
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
@@ -0,0 +1,108 @@
+"""
+Reporter contract and the shared HTTP transport.
+
+A reporter turns a batch of result records into one request to an outside
+system. It does not queue, batch, retry or spill; the pipeline
+(pipeline.py) does that around it. send() raises ReporterError on failure,
+with `retryable` saying whether trying again later can help (a 503 can, a
+400 cannot).
+"""
+
+import http.client
+import logging
+import socket
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+
+class ReporterError(Exception):
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class Reporter(ABC):
+    """
+    Abstract base for all reporters. Subclasses set `type` (the name used in
+    the config's "reporters" list) and implement send().
+    """
+    type: str = "base"
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.name = config.get("name", self.type)
+
+    @abstractmethod
+    def send(self, records: List[dict]) -> None:
+        """Deliver `records` (result dicts) in one go, or raise ReporterError."""
+
+    def close(self) -> None:
+        pass
+
+
+class HTTPReporter(Reporter):
+    """
+    POSTs each batch over one reused keep-alive connection. A connection that
+    fails is dropped and reopened on the next send.
+    """
+
+    content_type = "application/json"
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.url = self._url(config)
+        parts = urlsplit(self.url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"{self.name}: unsupported URL {self.url!r}")
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        self.timeout = float(config.get("timeout_sec", 10.0))
+        self.headers = dict(config.get("headers", {}))
+        self._connection = None
+
+    def _url(self, config):
+        return config["url"]
+
+    @abstractmethod
+    def body(self, records: List[dict]) -> bytes:
+        """The request body for `records`."""
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(self._host, self._port, timeout=self.timeout)
+        connection.connect()
+        connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def send(self, records):
+        body = self.body(records)
+        if not body:
+            return
+        headers = {"Content-Type": self.content_type, "Content-Length": str(len(body)), **self.headers}
+        try:
+            if self._connection is None:
+                self._connection = self._connect()
+            self._connection.request("POST", self._path, body, headers)
+            response = self._connection.getresponse()
+            detail = response.read(512)
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            raise ReporterError(f"{self.name}: {type(e).__name__}: {e}") from e
+
+        if response.will_close:
+            self.close()
+        if response.status >= 300:
+            # Throttling and server errors are worth retrying; other client errors are not.
+            retryable = response.status == 429 or response.status >= 500
+            raise ReporterError(f"{self.name}: HTTP {response.status} {detail[:200]!r}", retryable)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
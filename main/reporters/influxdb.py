@@ -0,0 +1,52 @@
+import json
+import math
+
+from .base import HTTPReporter
+from tools.history_store import flatten_result
+
+
+def _escape(value, characters):
+    for character in characters:
+        value = value.replace(character, "\\" + character)
+    return value
+
+
+class InfluxDBReporter(HTTPReporter):
+    """
+    Writes batches to an InfluxDB /write (1.x) or /api/v2/write endpoint in
+    line protocol: one point per result, measurement merlin_<check>, the
+    host and label metrics as tags and every finite numeric metric as a
+    field.
+    """
+
+    type = "influxdb"
+    content_type = "text/plain; charset=utf-8"
+
+    def __init__(self, config):
+        super().__init__(config)
+        if config.get("token"):
+            self.headers.setdefault("Authorization", f"Token {config['token']}")
+
+    def body(self, records):
+        lines = []
+        for record in records:
+            fields = {}
+            tags = None
+            for component, metric, labels, value in flatten_result(record):
+                tags = labels
+                # Line protocol has no NaN or infinity; one would fail the whole batch.
+                if math.isfinite(value):
+                    fields[metric] = value
+            if not fields:
+                continue
+
+            tag_values = json.loads(tags)
+            if record.get("host"):
+                tag_values["host"] = record["host"]
+            tag_text = "".join(
+                f",{_escape(key, ', =')}={_escape(str(value), ', =')}" for key, value in sorted(tag_values.items())
+            )
+            field_text = ",".join(f"{_escape(key, ', =')}={value!r}" for key, value in fields.items())
+            timestamp = f" {int(record['timestamp'] * 1e9)}" if record.get("timestamp") else ""
+            lines.append(f"merlin_{_escape(str(record.get('name', 'unknown')), ', ')}{tag_text} {field_text}{timestamp}")
+        return "\n".join(lines).encode("utf-8")
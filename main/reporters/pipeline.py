@@ -0,0 +1,458 @@
+"""
+Outbound reporter pipeline.
+
+Every configured sink (config "reporters" list) gets its own SinkWorker: a
+bounded queue and a thread that batches records by count, bytes and age,
+sends each batch through the sink's Reporter over a reused connection, and
+retries failures with jittered exponential backoff. publish() only enqueues,
+so a slow or dead sink never delays collection or any other sink.
+
+A sink that keeps failing for `spill_after_sec` has its batches written to a
+capped on-disk spill log (spill.py) instead of held in memory. Records that
+overflow the queue are set aside in memory (up to another queue's worth,
+counted as dropped beyond that) and spilled by the worker in one write, so
+publishing never touches the disk. Once the sink accepts a batch again the
+spill log is replayed oldest first. Delivery is at least once: a segment
+that fails partway through replay is replayed again from its start.
+
+In delta emission mode (config "emission", see tools.delta_emission) the
+pipeline keeps its own emitter, separate from the results file's, and sinks
+get the same heartbeats and changed-only records the file does.
+
+    python -m main.reporters.pipeline     # demo against local HTTP stand-ins
+"""
+
+import importlib
+import json
+import logging
+import os
+import queue
+import random
+import socket
+import threading
+import time
+
+from .influxdb import InfluxDBReporter
+from .slack import SlackReporter
+from .spill import DEFAULT_MAX_BYTES, SpillLog
+from .webhook import WebhookReporter
+
+logger = logging.getLogger(__name__)
+
+script_directory = os.path.dirname(__file__)
+merlin_root_directory = os.path.dirname(os.path.dirname(script_directory))
+
+DEFAULT_SPILL_DIRECTORY = os.path.join(merlin_root_directory, "spill")
+
+# Built-in reporter types; any other "type" is imported as "package.module:ClassName".
+REPORTER_TYPES = {reporter.type: reporter for reporter in (WebhookReporter, SlackReporter, InfluxDBReporter)}
+
+
+def load_reporter_class(type_name):
+    if type_name in REPORTER_TYPES:
+        return REPORTER_TYPES[type_name]
+    module_name, _, class_name = type_name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown reporter type {type_name!r}")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class SinkWorker:
+
+    def __init__(
+        self,
+        reporter,
+        spill: SpillLog,
+        max_queue_records: int = 10000,
+        batch_max_records: int = 500,
+        batch_max_bytes: int = 1024 * 1024,
+        batch_max_age: float = 5.0,
+        retry_initial: float = 1.0,
+        retry_max: float = 60.0,
+        spill_after: float = 30.0,
+    ):
+        self.reporter = reporter
+        self.name = reporter.name
+        self.spill = spill
+        self.batch_max_records = batch_max_records
+        self.batch_max_bytes = batch_max_bytes
+        self.batch_max_age = batch_max_age
+        self.retry_initial = retry_initial
+        self.retry_max = retry_max
+        self.spill_after = spill_after
+
+        self.sent = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        # Written by the publishing thread only.
+        self.overflow_dropped = 0
+
+        self._queue = queue.Queue(max_queue_records)
+        self._max_overflow = max_queue_records
+        self._overflow = []
+        self._overflow_lock = threading.Lock()
+        self._pending = None
+        self._failing_since = None
+        self._retry_at = 0.0
+        self._backoff = retry_initial
+        self._stopping = threading.Event()
+        self._stop_deadline = None
+        self._thread = threading.Thread(target=self._run, name=f"merlin-sink-{self.name}", daemon=True)
+
+    @classmethod
+    def from_config(cls, sink_config, spill_directory=DEFAULT_SPILL_DIRECTORY):
+        reporter = load_reporter_class(sink_config["type"])(sink_config)
+        spill = SpillLog(
+            os.path.join(spill_directory, reporter.name),
+            max_bytes=int(sink_config.get("spill_max_mb", DEFAULT_MAX_BYTES / 1024 / 1024) * 1024 * 1024),
+        )
+        return cls(
+            reporter,
+            spill,
+            max_queue_records=int(sink_config.get("queue_records", 10000)),
+            batch_max_records=int(sink_config.get("batch_records", 500)),
+            batch_max_bytes=int(sink_config.get("batch_bytes", 1024 * 1024)),
+            batch_max_age=float(sink_config.get("batch_age_sec", 5.0)),
+            retry_initial=float(sink_config.get("retry_initial_sec", 1.0)),
+            retry_max=float(sink_config.get("retry_max_sec", 60.0)),
+            spill_after=float(sink_config.get("spill_after_sec", 30.0)),
+        )
+
+    @property
+    def healthy(self):
+        return self._failing_since is None
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def offer(self, record, size):
+        """Queue one record without blocking or touching the disk; a full queue sets it aside for the worker to spill."""
+        try:
+            self._queue.put_nowait((record, size, time.monotonic()))
+        except queue.Full:
+            with self._overflow_lock:
+                if len(self._overflow) < self._max_overflow:
+                    self._overflow.append(record)
+                else:
+                    self.overflow_dropped += 1
+
+    def idle(self):
+        """Nothing queued, set aside or in hand, and nothing spilled that could be replayed now."""
+        return (self._pending is None and self._queue.unfinished_tasks == 0 and not self._overflow
+                and not (self.healthy and self.spill))
+
+    def _take_overflow(self):
+        with self._overflow_lock:
+            overflow, self._overflow = self._overflow, []
+        return overflow
+
+    def _spill_overflow(self):
+        overflow = self._take_overflow()
+        if overflow:
+            self.spill.append(overflow)
+            self.spilled += len(overflow)
+
+    def _collect_batch(self):
+        """
+        Gather up to batch_max_records / batch_max_bytes records into
+        `_pending`, waiting at most batch_max_age past the first. Records join
+        `_pending` before they are marked done in the queue, so idle() never
+        sees them in neither place.
+        """
+        try:
+            record, size, enqueued_at = self._queue.get(timeout=0 if self._stopping.is_set() else self.batch_max_age)
+        except queue.Empty:
+            return
+        self._pending = batch = [record]
+        self._queue.task_done()
+        total = size
+        deadline = enqueued_at + self.batch_max_age
+        while len(batch) < self.batch_max_records and total < self.batch_max_bytes:
+            remaining = 0 if self._stopping.is_set() else deadline - time.monotonic()
+            try:
+                record, size, _ = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(record)
+            total += size
+            self._queue.task_done()
+
+    def _attempt(self, batch):
+        """Send `batch` once. True when it is done with (sent or rejected for good), False to retry later."""
+        try:
+            self.reporter.send(batch)
+        except Exception as e:
+            retryable = getattr(e, "retryable", True)
+            if not retryable:
+                self.dropped += len(batch)
+                logger.error(f"Sink {self.name} rejected {len(batch)} records; dropping them: {e}")
+                return True
+
+            now = time.monotonic()
+            if self._failing_since is None:
+                self._failing_since = now
+                logger.warning(f"Sink {self.name} unavailable, retrying with backoff: {e}")
+            self._retry_at = now + self._backoff * random.uniform(0.5, 1.0)
+            self._backoff = min(self._backoff * 2, self.retry_max)
+            return False
+
+        if self._failing_since is not None:
+            logger.info(f"Sink {self.name} recovered after {time.monotonic() - self._failing_since:.1f}s")
+        self._failing_since = None
+        self._backoff = self.retry_initial
+        self._retry_at = 0.0
+        self.sent += len(batch)
+        return True
+
+    def _replay_segment(self):
+        segment = self.spill.oldest_segment()
+        if segment is None:
+            return
+        path, records = segment
+        for start in range(0, len(records), self.batch_max_records):
+            if self._out_of_time():
+                return
+            if not self._attempt(records[start:start + self.batch_max_records]):
+                return
+        self.spill.remove(path)
+        self.replayed += len(records)
+        logger.info(f"Sink {self.name} replayed {len(records)} spilled records")
+
+    def _spill_pending(self):
+        self.spill.append(self._pending)
+        self.spilled += len(self._pending)
+        self._pending = None
+
+    def _out_of_time(self):
+        return self._stop_deadline is not None and time.monotonic() >= self._stop_deadline
+
+    def _spill_remaining(self):
+        """Past the close() deadline: put the batch in hand and everything still queued in the spill log."""
+        leftovers = (self._pending or []) + self._take_overflow()
+        self._pending = None
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait()[0])
+            except queue.Empty:
+                break
+            self._queue.task_done()
+        if leftovers:
+            self.spill.append(leftovers)
+            self.spilled += len(leftovers)
+            logger.warning(f"Sink {self.name} still busy at shutdown; spilled {len(leftovers)} undelivered records")
+
+    def _run(self):
+        try:
+            self._deliver()
+        finally:
+            self.reporter.close()
+
+    def _deliver(self):
+        while True:
+            if self._stopping.is_set() and self._out_of_time():
+                self._spill_remaining()
+                return
+            self._spill_overflow()
+            if not self._pending:
+                self._collect_batch()
+            if (self._stopping.is_set() and self._pending is None and self._queue.empty() and not self._overflow
+                    and not (self.healthy and self.spill)):
+                return
+
+            if self._pending is not None:
+                now = time.monotonic()
+                if now < self._retry_at:
+                    if self._stopping.is_set() or now - self._failing_since >= self.spill_after:
+                        # Down for a while: keep memory flat and let new batches through to disk.
+                        self._spill_pending()
+                    else:
+                        self._stopping.wait(min(self._retry_at - now, self.batch_max_age))
+                    continue
+                if self._attempt(self._pending):
+                    self._pending = None
+                continue
+
+            # While the sink is down, replaying is also what probes it once the backoff is up.
+            if self.spill and (self.healthy or time.monotonic() >= self._retry_at):
+                self._replay_segment()
+
+    def close(self, timeout=5.0):
+        """
+        Stop after delivering (or spilling) what is queued. The worker spills
+        whatever it still holds (the batch in hand and the queue) once
+        `timeout` has passed, so the caller never races it for either. A send
+        already in flight at the deadline is waited out, for at most the
+        reporter's own timeout.
+        """
+        self._stop_deadline = time.monotonic() + timeout
+        self._stopping.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Sink {self.name} still sending at shutdown; waiting for it to spill what it holds")
+            self._thread.join(getattr(self.reporter, "timeout", timeout))
+        if self._thread.ident is None:
+            self.reporter.close()
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "dropped": self.dropped + self.overflow_dropped + self.spill.dropped_records,
+            "queued": self._queue.qsize(),
+            "spill_bytes": self.spill.nbytes,
+            "healthy": self.healthy,
+        }
+
+
+class ReporterPipeline:
+
+    def __init__(self, workers, host=None, emitter=None):
+        self.workers = workers
+        self.host = host or socket.gethostname()
+        self.emitter = emitter
+
+    @classmethod
+    def from_config(cls, reporters_config, spill_directory=DEFAULT_SPILL_DIRECTORY, emission_config=None):
+        from tools.delta_emission import MODE_DELTA, DeltaEmitter
+
+        workers = []
+        for sink_config in reporters_config:
+            if not sink_config.get("enabled", True):
+                continue
+            try:
+                workers.append(SinkWorker.from_config(sink_config, spill_directory).start())
+            except (KeyError, ValueError, ImportError, AttributeError) as e:
+                logger.error(f"Skipping reporter {sink_config.get('name', sink_config.get('type'))}: {e}")
+        emission_config = emission_config or {}
+        emitter = DeltaEmitter.from_config(emission_config) if emission_config.get("mode") == MODE_DELTA else None
+        return cls(workers, emitter=emitter)
+
+    def publish(self, results, timestamp=None):
+        """Hand one cycle's results to every sink. Never blocks on a sink."""
+        if not self.workers:
+            return
+        timestamp = timestamp if timestamp is not None else time.time()
+        for result in results:
+            if self.emitter is not None:
+                result = self.emitter.filter("", result)
+                if result is None:
+                    continue
+            record = result.to_dict() if hasattr(result, "to_dict") else dict(result)
+            record["host"] = self.host
+            record["timestamp"] = timestamp
+            # Sized once for every sink's byte-based batching.
+            size = len(json.dumps(record, separators=(",", ":")))
+            for worker in self.workers:
+                worker.offer(record, size)
+
+    def flush(self, timeout=10.0):
+        """Wait until every sink has nothing queued or in hand. Returns False on timeout."""
+        deadline = time.monotonic() + timeout
+        while not all(worker.idle() for worker in self.workers):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=5.0):
+        for worker in self.workers:
+            worker.close(timeout)
+
+    def stats(self):
+        return {worker.name: worker.stats() for worker in self.workers}
+
+
+_pipeline = None
+
+
+def configure_reporters(reporters_config=None, spill_directory=DEFAULT_SPILL_DIRECTORY, emission_config=None):
+    """
+    (Re)build the shared pipeline from the config's "reporters" list, closing
+    the old one. `emission_config` is the config's "emission" section.
+    """
+    global _pipeline
+
+    if _pipeline is not None:
+        _pipeline.close()
+    _pipeline = ReporterPipeline.from_config(reporters_config, spill_directory, emission_config) if reporters_config else None
+    return _pipeline
+
+
+def publish_results(results, timestamp=None):
+    if _pipeline is not None:
+        _pipeline.publish(results, timestamp)
+
+
+def close_reporters(timeout=5.0):
+    global _pipeline
+
+    if _pipeline is not None:
+        _pipeline.close(timeout)
+        _pipeline = None
+
+
+def _stand_in_server(delay=0.0, fail_until=0.0):
+    """A local HTTP endpoint that answers every POST after `delay` seconds, with 503 until `fail_until`."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        received = []
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+            status = 503 if time.monotonic() < fail_until else 204
+            if status == 204:
+                Handler.received.append(len(json.loads(body)))
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, Handler.received
+
+
+def main():
+    import tempfile
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    healthy, healthy_received = _stand_in_server()
+    slow, slow_received = _stand_in_server(delay=2.0)
+    flaky, flaky_received = _stand_in_server(fail_until=time.monotonic() + 4.0)
+
+    def sink(name, server):
+        return {
+            "type": "webhook", "name": name, "url": f"http://127.0.0.1:{server.server_address[1]}/hook",
+            "batch_records": 50, "batch_age_sec": 0.2, "retry_initial_sec": 0.2, "retry_max_sec": 1.0,
+            "spill_after_sec": 1.0, "queue_records": 200,
+        }
+
+    with tempfile.TemporaryDirectory() as spill_directory:
+        pipeline = ReporterPipeline.from_config([sink("healthy", healthy), sink("slow", slow), sink("flaky", flaky)], spill_directory)
+        slowest_publish = 0.0
+        for cycle in range(80):
+            results = [{"name": "cpu", "status": "OK", "metrics": {"Usage Percent": float(cycle % 100)}}] * 10
+            started = time.perf_counter()
+            pipeline.publish(results)
+            slowest_publish = max(slowest_publish, time.perf_counter() - started)
+            time.sleep(0.1)
+
+        pipeline.flush(timeout=10.0)
+        print(f"Published 800 records; slowest publish() call {slowest_publish * 1000:.2f} ms")
+        for name, stats in pipeline.stats().items():
+            print(f"  {name}: {stats}")
+        print(f"  stand-ins received: healthy={sum(healthy_received)} slow={sum(slow_received)} flaky={sum(flaky_received)}")
+        pipeline.close(timeout=1.0)
+
+if __name__ == "__main__":
+    main()
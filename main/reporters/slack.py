@@ -0,0 +1,27 @@
+import json
+
+from .base import HTTPReporter
+
+DEFAULT_STATUSES = ("WARN", "CRIT")
+
+
+class SlackReporter(HTTPReporter):
+    """Posts one Slack incoming-webhook message listing the batch's WARN/CRIT results."""
+
+    type = "slack"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.statuses = set(config.get("statuses", DEFAULT_STATUSES))
+
+    def _url(self, config):
+        return config.get("webhook_url") or config["url"]
+
+    def body(self, records):
+        lines = [
+            f"*{record.get('status')}* {record.get('host', '')} {record.get('name')}: {record.get('details') or ''}".strip()
+            for record in records if record.get("status") in self.statuses
+        ]
+        if not lines:
+            return b""
+        return json.dumps({"text": "\n".join(lines)}).encode("utf-8")
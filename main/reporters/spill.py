@@ -0,0 +1,122 @@
+"""
+Capped on-disk spill log for records a sink could not deliver.
+
+Records are appended as JSON lines to numbered segment files in the sink's
+spill directory. The log is capped in bytes: once it would grow past the cap,
+whole segments are deleted oldest first, so a sink that stays down loses its
+oldest data rather than filling the disk. Replay reads closed segments
+oldest first and deletes each one only after all of it has been delivered.
+"""
+
+import json
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+
+_SEGMENT_SUFFIX = ".jsonl"
+
+
+class SpillLog:
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, segment_bytes: int = DEFAULT_SEGMENT_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = min(segment_bytes, max_bytes)
+        self.dropped_records = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        self._sizes = {}
+        for path in self._segments():
+            try:
+                self._sizes[path] = os.path.getsize(path)
+            except OSError:
+                pass
+        self._active = None
+        self._next_number = max((self._number(path) for path in self._sizes), default=0) + 1
+
+    def _number(self, path):
+        return int(os.path.basename(path)[:-len(_SEGMENT_SUFFIX)])
+
+    def _segments(self):
+        names = [name for name in os.listdir(self.directory) if name.endswith(_SEGMENT_SUFFIX) and name[:-len(_SEGMENT_SUFFIX)].isdigit()]
+        return [os.path.join(self.directory, name) for name in sorted(names)]
+
+    @property
+    def nbytes(self):
+        return sum(self._sizes.values())
+
+    def __bool__(self):
+        with self._lock:
+            return bool(self._sizes)
+
+    def append(self, records):
+        """Append `records`; deletes the oldest segments if this would exceed the cap."""
+        if not records:
+            return
+        payload = ("\n".join(json.dumps(record, separators=(",", ":")) for record in records) + "\n").encode("utf-8")
+
+        with self._lock:
+            if self._active is None or self._sizes.get(self._active, 0) + len(payload) > self.segment_bytes:
+                self._active = os.path.join(self.directory, f"{self._next_number:010d}{_SEGMENT_SUFFIX}")
+                self._next_number += 1
+                self._sizes[self._active] = 0
+
+            while sum(self._sizes.values()) + len(payload) > self.max_bytes and len(self._sizes) > 1:
+                oldest = min(self._sizes)
+                if oldest == self._active:
+                    break
+                self._delete(oldest, count_dropped=True)
+
+            with open(self._active, "ab") as file:
+                file.write(payload)
+            self._sizes[self._active] += len(payload)
+
+    def _delete(self, path, count_dropped=False):
+        if count_dropped:
+            try:
+                with open(path, "rb") as file:
+                    dropped = sum(1 for _ in file)
+            except OSError:
+                dropped = 0
+            self.dropped_records += dropped
+            logger.warning(f"Spill log {self.directory} is full; dropped {dropped} records from {os.path.basename(path)}")
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.error(f"Failed to remove spill segment {path}: {e}")
+        self._sizes.pop(path, None)
+
+    def oldest_segment(self):
+        """
+        (path, records) of the oldest segment, closing the active one first
+        so nothing is appended to a segment being replayed. None when empty.
+        """
+        with self._lock:
+            if not self._sizes:
+                return None
+            oldest = min(self._sizes)
+            if oldest == self._active:
+                self._active = None
+
+        records = []
+        with open(oldest, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final write from a crash; the rest of the segment is still good.
+                    logger.warning(f"Skipping unreadable record in spill segment {oldest}")
+        return oldest, records
+
+    def remove(self, path):
+        with self._lock:
+            self._delete(path)
@@ -0,0 +1,28 @@
+import json
+import os
+
+from .base import HTTPReporter
+
+
+class WebhookReporter(HTTPReporter):
+    """
+    POSTs batches as a JSON array of result records. ARGUS_WEBHOOK_URL
+    overrides the configured URL. With "statuses" set (e.g. ["WARN", "CRIT"])
+    only those results are sent.
+    """
+
+    type = "webhook"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.statuses = set(config["statuses"]) if config.get("statuses") else None
+
+    def _url(self, config):
+        return os.environ.get("ARGUS_WEBHOOK_URL") or config["url"]
+
+    def body(self, records):
+        if self.statuses is not None:
+            records = [record for record in records if record.get("status") in self.statuses]
+        if not records:
+            return b""
+        return json.dumps(records, separators=(",", ":")).encode("utf-8")
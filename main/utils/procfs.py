@@ -0,0 +1,322 @@
+"""
+Parsers for Linux /proc and /sys sources shared by the checks.
+
+Every reader takes the path it reads from so the checks can be pointed at a
+fake tree in tests.
+"""
+
+import functools
+import os
+import platform
+import re
+
+PROC_STAT = "/proc/stat"
+PROC_CPUINFO = "/proc/cpuinfo"
+PROC_MOUNTINFO = "/proc/self/mountinfo"
+SYS_CPU = "/sys/devices/system/cpu"
+PROC_MEMINFO = "/proc/meminfo"
+PROC_VMSTAT = "/proc/vmstat"
+PROC_PRESSURE = "/proc/pressure"
+PROC_NET_DEV = "/proc/net/dev"
+SYS_CLASS_NET = "/sys/class/net"
+PROC_DISKSTATS = "/proc/diskstats"
+SYS_CLASS_BLOCK = "/sys/class/block"
+PROC_SELF_CGROUP = "/proc/self/cgroup"
+SYS_CLASS_DRM = "/sys/class/drm"
+PROC_DRIVER_NVIDIA = "/proc/driver/nvidia/version"
+
+# The first eleven counters of each /proc/diskstats line (see the kernel's
+# Documentation/admin-guide/iostats.rst). Sectors are always 512 bytes.
+DISKSTATS_FIELDS = (
+    "reads", "reads_merged", "sectors_read", "read_ms",
+    "writes", "writes_merged", "sectors_written", "write_ms",
+    "in_flight", "io_ms", "weighted_io_ms",
+)
+DISKSTATS_SECTOR_SIZE = 512
+
+_PARTITION_NAME = re.compile(r"^((?:nvme\d+n\d+|mmcblk\d+|loop\d+)p|(?:[shv]|xv)d[a-z]+)\d+$")
+
+# Column order of the counters in /proc/net/dev.
+NET_DEV_FIELDS = (
+    "rx_bytes", "rx_packets", "rx_errors", "rx_drops", "rx_fifo", "rx_frame", "rx_compressed", "rx_multicast",
+    "tx_bytes", "tx_packets", "tx_errors", "tx_drops", "tx_fifo", "tx_collisions", "tx_carrier", "tx_compressed",
+)
+
+# Field order of the cpu lines in /proc/stat (see proc(5)). guest and
+# guest_nice are already included in user and nice, so they are not summed.
+CPU_TIME_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+
+def read_text(path: str) -> str:
+    # An unbuffered binary read skips the text layer; procfs files are small and read in one call.
+    with open(path, "rb", buffering=0) as file:
+        return file.read().decode("utf-8", errors="replace")
+
+
+def read_first_line(path: str, default=None):
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as file:
+            return file.readline().strip()
+    except OSError:
+        return default
+
+
+def parse_cpu_times(stat_text: str):
+    """
+    Parse the cpu lines of /proc/stat into {"cpu": (...), "cpu0": (...), ...}
+    where each tuple holds the jiffy counters named in CPU_TIME_FIELDS.
+    """
+    cpu_times = {}
+    width = len(CPU_TIME_FIELDS)
+    for line in stat_text.splitlines():
+        if not line.startswith("cpu"):
+            # The cpu lines are always first; stop at the first other line.
+            if cpu_times:
+                break
+            continue
+        parts = line.split()
+        values = [int(value) for value in parts[1:width + 1]]
+        values.extend([0] * (width - len(values)))
+        cpu_times[parts[0]] = tuple(values)
+    return cpu_times
+
+
+def parse_meminfo(meminfo_text: str):
+    """Parse /proc/meminfo into {"MemTotal": bytes, ...}. Fields without a kB unit (HugePages_*) are counts."""
+    meminfo = {}
+    for line in meminfo_text.splitlines():
+        key, _, value = line.partition(":")
+        parts = value.split()
+        if not parts:
+            continue
+        try:
+            amount = int(parts[0])
+        except ValueError:
+            continue
+        meminfo[key] = amount * 1024 if len(parts) > 1 and parts[1] == "kB" else amount
+    return meminfo
+
+
+@functools.lru_cache(maxsize=16)
+def _vmstat_pattern(keys):
+    names = "|".join(re.escape(key) for key in keys) if keys else r"\w+"
+    return re.compile(rf"^({names}) (\d+)$", re.MULTILINE)
+
+
+def parse_vmstat(vmstat_text: str, keys=None):
+    """
+    Parse /proc/vmstat "name value" lines into {name: int}, limited to `keys`
+    (a tuple) when given. /proc/vmstat has well over a hundred counters, so the
+    wanted ones are picked out with one regex scan instead of a split per line.
+    """
+    return {key: int(value) for key, value in _vmstat_pattern(keys).findall(vmstat_text)}
+
+
+def parse_pressure(pressure_text: str):
+    """
+    Parse a /proc/pressure/<resource> file into
+    {"some": {"avg10": float, "avg60": float, "avg300": float, "total": int}, "full": {...}}.
+    total is the cumulative stall time in microseconds.
+    """
+    pressure = {}
+    for line in pressure_text.splitlines():
+        kind, _, fields = line.partition(" ")
+        values = {}
+        for field in fields.split():
+            name, _, value = field.partition("=")
+            values[name] = int(value) if name == "total" else float(value)
+        pressure[kind] = values
+    return pressure
+
+
+def parse_io_stat(io_stat_text: str):
+    """
+    Parse a cgroup v2 io.stat file ("8:0 rbytes=1 wbytes=2 rios=3 ...") into
+    {"8:0": {"rbytes": int, ...}}.
+    """
+    devices = {}
+    for line in io_stat_text.splitlines():
+        device, _, fields = line.partition(" ")
+        values = {}
+        for field in fields.split():
+            name, _, value = field.partition("=")
+            if value.isdigit():
+                values[name] = int(value)
+        if device:
+            devices[device] = values
+    return devices
+
+
+def parse_cgroup_max(text: str):
+    """
+    Parse a cgroup v2 limit file. memory.max ("max" or bytes) gives an int or
+    None for no limit; cpu.max ("$QUOTA $PERIOD") gives (quota, period) with
+    quota None for no limit.
+    """
+    fields = text.split()
+    if not fields:
+        return None
+    quota = None if fields[0] == "max" else int(fields[0])
+    if len(fields) > 1:
+        return quota, int(fields[1])
+    return quota
+
+
+def parse_proc_cgroup(proc_cgroup_text: str):
+    """The cgroup v2 path in /proc/<pid>/cgroup (the "0::/path" line), or None on a v1-only host."""
+    for line in proc_cgroup_text.splitlines():
+        if line.startswith("0::"):
+            return line[3:].strip() or "/"
+    return None
+
+
+def parse_net_dev(net_dev_text: str, select=None):
+    """
+    Parse /proc/net/dev into {interface: (counter, ...)} with the counters in
+    NET_DEV_FIELDS order. The first two lines are headers. `select(name)`
+    filters interfaces before their counters are converted.
+    """
+    interfaces = {}
+    for line in net_dev_text.splitlines()[2:]:
+        name, _, counters = line.partition(":")
+        name = name.strip()
+        if select is not None and not select(name):
+            continue
+        values = counters.split()
+        if len(values) < len(NET_DEV_FIELDS):
+            continue
+        interfaces[name] = tuple(int(value) for value in values[:len(NET_DEV_FIELDS)])
+    return interfaces
+
+
+def parse_diskstats(diskstats_text: str):
+    """
+    Parse /proc/diskstats into {name: ((major, minor), (counter, ...))} with the
+    counters in DISKSTATS_FIELDS order.
+    """
+    devices = {}
+    width = len(DISKSTATS_FIELDS)
+    for line in diskstats_text.splitlines():
+        fields = line.split()
+        if len(fields) < 3 + width:
+            continue
+        devices[fields[2]] = ((int(fields[0]), int(fields[1])), tuple(int(value) for value in fields[3:3 + width]))
+    return devices
+
+
+def block_device_parent(name: str, sys_class_block: str = SYS_CLASS_BLOCK):
+    """
+    Return the whole-disk device a partition belongs to, or `name` itself for
+    whole disks, dm and md devices. Uses the sysfs hierarchy when available
+    and falls back to the kernel naming rules (sda1, nvme0n1p1, mmcblk0p1).
+    """
+    path = os.path.join(sys_class_block, name)
+    if os.path.exists(path):
+        if os.path.exists(os.path.join(path, "partition")):
+            return os.path.basename(os.path.dirname(os.path.realpath(path)))
+        return name
+    match = _PARTITION_NAME.match(name)
+    if match:
+        parent = match.group(1)
+        return parent[:-1] if parent.endswith("p") and parent[-2:-1].isdigit() else parent
+    return name
+
+
+def device_mapper_name(name: str, sys_class_block: str = SYS_CLASS_BLOCK):
+    """The /dev/mapper name of a dm-N device (e.g. "vg0-root"), or None."""
+    return read_first_line(os.path.join(sys_class_block, name, "dm", "name"))
+
+
+def _unescape_mount_field(field: str) -> str:
+    # mountinfo octal-escapes space, tab, newline and backslash (e.g. "\\040").
+    if "\\" not in field:
+        return field
+    return (field.replace("\\040", " ").replace("\\011", "\t")
+                 .replace("\\012", "\n").replace("\\134", "\\"))
+
+
+def parse_mountinfo(mountinfo_text: str):
+    """
+    Parse /proc/<pid>/mountinfo into a list of dicts with the keys
+    mount_id, parent_id, device (major, minor), root, mount_point, options,
+    fstype and source. See proc(5) for the line layout.
+    """
+    mounts = []
+    for line in mountinfo_text.splitlines():
+        fields = line.split()
+        try:
+            separator = fields.index("-", 6)
+            major, minor = fields[2].split(":")
+            mounts.append({
+                "mount_id": int(fields[0]),
+                "parent_id": int(fields[1]),
+                "device": (int(major), int(minor)),
+                "root": _unescape_mount_field(fields[3]),
+                "mount_point": _unescape_mount_field(fields[4]),
+                "options": fields[5],
+                "fstype": fields[separator + 1],
+                "source": _unescape_mount_field(fields[separator + 2]) if len(fields) > separator + 2 else "none",
+            })
+        except (ValueError, IndexError):
+            continue
+    return mounts
+
+
+def parse_cpu_list(text: str):
+    """Expand a kernel CPU list such as "0-3,8,10-11" into a list of ints."""
+    cpus = []
+    for part in (text or "").strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+@functools.lru_cache(maxsize=None)
+def cpu_topology(cpuinfo_path: str = PROC_CPUINFO, sys_cpu_path: str = SYS_CPU):
+    """
+    Read static CPU facts once per process from /proc/cpuinfo and
+    /sys/devices/system/cpu: model, architecture, logical/physical counts and
+    threads per core.
+    """
+    model_name = None
+    vendor = None
+    try:
+        for line in read_text(cpuinfo_path).splitlines():
+            key, _, value = line.partition(":")
+            key = key.strip()
+            if key in ("model name", "Model Name", "cpu model") and model_name is None:
+                model_name = value.strip()
+            elif key in ("vendor_id", "CPU implementer") and vendor is None:
+                vendor = value.strip()
+            if model_name and vendor:
+                break
+    except OSError:
+        pass
+
+    online = parse_cpu_list(read_first_line(os.path.join(sys_cpu_path, "online"), ""))
+    if not online:
+        online = list(range(os.cpu_count() or 1))
+
+    cores = set()
+    threads_per_core = 1
+    for cpu in online:
+        topology = os.path.join(sys_cpu_path, f"cpu{cpu}", "topology")
+        package_id = read_first_line(os.path.join(topology, "physical_package_id"), "0")
+        core_id = read_first_line(os.path.join(topology, "core_id"), str(cpu))
+        cores.add((package_id, core_id))
+        siblings = parse_cpu_list(read_first_line(os.path.join(topology, "thread_siblings_list"), ""))
+        threads_per_core = max(threads_per_core, len(siblings))
+
+    return {
+        "Model Name": model_name or platform.processor() or "unknown",
+        "Vendor": vendor or "unknown",
+        "Architecture": platform.machine(),
+        "CPU Count": len(online),
+        "Physical Cores": len(cores) or len(online),
+        "CPU Threads": threads_per_core,
+    }
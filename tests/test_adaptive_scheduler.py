@@ -0,0 +1,69 @@
+import pytest
+
+from tools.adaptive_scheduler import AdaptiveInterval
+
+
+def run(policy, value, now, warn=80.0, crit=90.0, statuses=("OK",)):
+    return policy.update([("Usage Percent", value, warn, crit)], statuses, now)
+
+
+@pytest.fixture
+def policy():
+    # Floor 7.5 s, ceiling 480 s.
+    return AdaptiveInterval(60.0)
+
+
+def test_status_change_drops_to_the_floor(policy):
+    run(policy, 10.0, 0.0)
+    assert run(policy, 10.0, 60.0, statuses=("UNKNOWN",)) == 7.5
+    assert policy.reason == "status changed"
+
+
+def test_warn_or_crit_holds_the_floor(policy):
+    run(policy, 85.0, 0.0, statuses=("WARN",))
+    assert run(policy, 85.0, 60.0, statuses=("WARN",)) == 7.5
+    assert policy.reason == "threshold exceeded"
+
+
+def test_trend_toward_warn_samples_at_half_the_projected_time(policy):
+    run(policy, 20.0, 0.0)
+    # 0.5 per second from 50: warn in 60 s.
+    assert run(policy, 50.0, 60.0) == 30.0
+    assert policy.reason == "trending toward threshold"
+
+
+def test_near_warn_halves_the_interval(policy):
+    assert run(policy, 75.0, 0.0) == 30.0
+    assert policy.reason == "near threshold"
+
+
+def test_deep_in_ok_backs_off_to_the_ceiling(policy):
+    intervals = [run(policy, 10.0, 60.0 * cycle) for cycle in range(6)]
+    assert intervals == [120.0, 240.0, 480.0, 480.0, 480.0, 480.0]
+    assert policy.reason == "healthy"
+
+
+def test_slow_creep_does_not_block_back_off(policy):
+    now = 0.0
+    for cycle in range(6):
+        run(policy, 10.0 + 0.001 * cycle, now)
+        now += policy.interval
+    assert policy.interval == 480.0
+    assert policy.reason == "healthy"
+
+
+def test_rise_within_the_horizon_holds_the_interval(policy):
+    assert run(policy, 5.8, 0.0) == 120.0
+    # 0.07 per second: warn in 1000 s, inside 4 ceilings but past two intervals.
+    assert run(policy, 10.0, 60.0) == 120.0
+    assert policy.reason == "steady"
+
+
+def test_between_near_and_deep_holds_the_interval(policy):
+    assert run(policy, 64.0, 0.0) == 60.0
+    assert policy.reason == "steady"
+
+
+def test_per_check_overrides():
+    policy = AdaptiveInterval.from_config(60.0, {"max_interval_sec": 120, "checks": {"disk": {"rising_horizon": 100}}}, "disk")
+    assert policy.max_interval == 120 and policy.rising_horizon == 100
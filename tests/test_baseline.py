@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from main.checks.result import CheckResult, Metric, Status
+from tools.baseline import DEFAULT_QUANTILES, DEFAULT_SKETCH_K, EWMA, BaselineStore, KLLSketch
+
+STREAM = 100_000
+# The documented KLL bound: about 1.65 / k normalized rank error.
+RANK_ERROR = 1.65 / DEFAULT_SKETCH_K
+QUANTILES = (DEFAULT_QUANTILES[0], 0.1, 0.5, 0.9, DEFAULT_QUANTILES[1])
+
+
+def shuffled(start, stop, seed):
+    values = list(range(start, stop))
+    random.Random(seed).shuffle(values)
+    return values
+
+
+def sketch_of(values, seed):
+    sketch = KLLSketch(seed=seed)
+    for value in values:
+        sketch.update(float(value))
+    return sketch
+
+
+def assert_rank_error_within_bound(sketch, total):
+    # With the values 0 .. total-1, a value's rank is the value itself.
+    for q, estimate in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        assert abs(estimate / total - q) <= RANK_ERROR, (q, estimate)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_rank_error_at_the_default_k(seed):
+    sketch = sketch_of(shuffled(0, STREAM, seed), seed)
+    assert sketch.n == STREAM
+    assert sum(len(level) for level in sketch.levels) < 4 * DEFAULT_SKETCH_K
+    assert_rank_error_within_bound(sketch, STREAM)
+
+
+def test_merged_sketches_match_one_sketch_of_the_combined_stream():
+    values = shuffled(0, STREAM, 7)
+    merged = sketch_of(values[:STREAM // 3], 8).merge(sketch_of(values[STREAM // 3:], 9))
+    single = sketch_of(values, 10)
+    assert merged.n == single.n == STREAM
+    assert_rank_error_within_bound(merged, STREAM)
+    for from_merged, from_single in zip(merged.quantiles(QUANTILES), single.quantiles(QUANTILES)):
+        assert abs(from_merged - from_single) / STREAM <= 2 * RANK_ERROR
+
+
+def test_sketch_round_trips_through_its_dict():
+    sketch = sketch_of(shuffled(0, 10_000, 11), 11)
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert restored.n == sketch.n and restored.k == sketch.k
+    assert [list(level) for level in restored.levels] == [list(level) for level in sketch.levels]
+    assert restored.quantiles(QUANTILES) == sketch.quantiles(QUANTILES)
+    # It keeps working as a sketch afterwards.
+    restored.update(1.0)
+    assert restored.n == sketch.n + 1
+
+
+def test_ewma_merge_pools_by_sample_count():
+    low, high = EWMA(0.5), EWMA(0.5)
+    for _ in range(10):
+        low.update(10.0)
+        high.update(20.0)
+    low.merge(high)
+    assert low.count == 20
+    assert low.mean == pytest.approx(15.0)
+    assert low.variance == pytest.approx(25.0)
+
+
+def cpu_result(usage):
+    return CheckResult("cpu", "OK", [Metric("Usage Percent", usage)])
+
+
+def trained(samples):
+    store = BaselineStore({"cpu": ["Usage Percent"]}, min_samples=30, min_deviation=1.0)
+    rng = random.Random(5)
+    for _ in range(samples):
+        store.observe("cpu", [cpu_result(5.0 + rng.random())])
+    return store
+
+
+@pytest.mark.parametrize("samples, anomalies, status", [(5, 0, Status.OK), (60, 1, Status.WARN)])
+def test_anomaly_raises_the_status_only_after_min_samples(samples, anomalies, status):
+    store = trained(samples)
+    usual, spike = cpu_result(5.5), cpu_result(60.0)
+    assert store.observe("cpu", [usual]) == 0 and usual.status == Status.OK
+    assert store.observe("cpu", [spike]) == anomalies
+    assert spike.status == status
+    assert (spike.metric("Anomalies") == ("Usage Percent",)) == bool(anomalies)
+
+
+def test_unwatched_checks_pass_through():
+    assert trained(60).observe("memory", [cpu_result(1000.0)]) == 0
+
+
+def test_store_round_trips_through_a_file(tmp_path):
+    store = BaselineStore({"cpu": ["Usage Percent"]})
+    for usage in range(50):
+        store.observe("cpu", [cpu_result(float(usage))])
+    path = str(tmp_path / "baselines.json")
+    store.save(path)
+
+    restored = BaselineStore({"cpu": ["Usage Percent"]})
+    assert restored.load(path) == 1
+    ((key, baseline),) = store._series.items()
+    loaded = restored._series[key]
+    assert (loaded.ewma.count, loaded.ewma.mean) == (baseline.ewma.count, pytest.approx(baseline.ewma.mean))
+    assert loaded.sketch.quantiles(QUANTILES) == baseline.sketch.quantiles(QUANTILES)
@@ -0,0 +1,209 @@
+import copy
+
+import pytest
+
+from main.checks import cgroup_check
+from main.checks.cgroup_check import CgroupCheck, CgroupLimitSampler, CgroupTreeSampler, get_tree_sampler
+from main.checks.run_all_checks import check_config
+
+
+def write_cgroup(path, usage_usec=0, throttled_usec=0, oom_kill=0, memory_current=None, memory_max="max",
+                 inactive_file=0, cpu_max=None, rbytes=0, wbytes=0):
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "cpu.stat").write_text(
+        f"usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\nnr_periods 10\nnr_throttled 1\nthrottled_usec {throttled_usec}\n"
+    )
+    (path / "io.stat").write_text(f"8:0 rbytes={rbytes} wbytes={wbytes} rios=0 wios=0 dbytes=0 dios=0\n")
+    if memory_current is not None:
+        (path / "memory.current").write_text(f"{memory_current}\n")
+        (path / "memory.max").write_text(f"{memory_max}\n")
+        (path / "memory.stat").write_text(f"anon 0\nfile 0\ninactive_file {inactive_file}\n")
+        (path / "memory.events").write_text(f"low 0\nhigh 0\nmax 0\noom {oom_kill}\noom_kill {oom_kill}\n")
+    if cpu_max is not None:
+        (path / "cpu.max").write_text(f"{cpu_max}\n")
+
+
+def write_descendants(root, count):
+    (root / "cgroup.stat").write_text(f"nr_descendants {count}\nnr_dying_descendants 0\n")
+
+
+@pytest.fixture
+def cgroupfs(tmp_path):
+    """A host-like tree: the real root (no limit files), a pod with limits and a container in it."""
+    root = tmp_path / "cgroup"
+    root.mkdir()
+    (root / "cgroup.controllers").write_text("cpuset cpu io memory\n")
+    (root / "cpu.stat").write_text("usage_usec 1000000\n")
+    write_descendants(root, 3)
+    write_cgroup(root / "kubepods", memory_current=0, memory_max=2 ** 30, cpu_max="200000 100000")
+    write_cgroup(root / "kubepods" / "pod1", memory_current=0)
+    write_cgroup(root / "kubepods" / "pod1" / "ctr", memory_current=50 * 2 ** 20, memory_max=100 * 2 ** 20,
+                 inactive_file=10 * 2 ** 20, cpu_max="50000 100000")
+    return root
+
+
+@pytest.fixture(autouse=True)
+def shared_tree_sampler():
+    yield
+    if cgroup_check._tree_sampler is not None:
+        cgroup_check._tree_sampler.close()
+    cgroup_check._tree_sampler = cgroup_check._tree_sampler_settings = None
+
+
+def by_name(stats):
+    return {entry["name"]: entry for entry in stats}
+
+
+def test_discovery_skips_the_real_root(cgroupfs):
+    sampler = CgroupTreeSampler(str(cgroupfs))
+    stats = by_name(sampler.sample(now=100.0))
+    assert list(stats) == ["/kubepods", "/kubepods/pod1", "/kubepods/pod1/ctr"]
+    assert sampler.scans == 1
+    sampler.close()
+
+
+def test_namespaced_root_with_limits_is_reported(tmp_path):
+    root = tmp_path / "container"
+    write_cgroup(root, memory_current=10, memory_max=100, cpu_max="100000 100000")
+    stats = CgroupTreeSampler(str(root)).sample(now=1.0)
+    assert [entry["name"] for entry in stats] == ["/"]
+    assert stats[0]["memory_limit"] == 100 and stats[0]["cpu_limit"] == 1.0
+
+
+def test_depth_cap(cgroupfs):
+    stats = CgroupTreeSampler(str(cgroupfs), max_depth=2).sample(now=1.0)
+    assert [entry["name"] for entry in stats] == ["/kubepods", "/kubepods/pod1"]
+
+
+def test_count_cap(cgroupfs):
+    # The root counts towards the cap even though it is not reported.
+    stats = CgroupTreeSampler(str(cgroupfs), max_cgroups=2).sample(now=1.0)
+    assert [entry["name"] for entry in stats] == ["/kubepods"]
+
+
+def test_exclude_prunes_the_subtree(cgroupfs):
+    stats = CgroupTreeSampler(str(cgroupfs), exclude=("/kubepods/pod1",)).sample(now=1.0)
+    assert [entry["name"] for entry in stats] == ["/kubepods"]
+
+
+def test_limits_are_inherited(cgroupfs):
+    stats = by_name(CgroupTreeSampler(str(cgroupfs)).sample(now=1.0))
+    # pod1 sets no limits of its own, so the pod-level ones apply.
+    assert stats["/kubepods/pod1"]["memory_limit"] == 2 ** 30
+    assert stats["/kubepods/pod1"]["cpu_limit"] == 2.0
+    # ctr is tighter than its ancestors.
+    assert stats["/kubepods/pod1/ctr"]["memory_limit"] == 100 * 2 ** 20
+    assert stats["/kubepods/pod1/ctr"]["cpu_limit"] == 0.5
+    assert stats["/kubepods/pod1/ctr"]["working_set"] == 40 * 2 ** 20
+
+
+def test_cpuset_caps_the_cpu_limit(cgroupfs):
+    (cgroupfs / "kubepods" / "cpuset.cpus.effective").write_text("0\n")
+    stats = by_name(CgroupTreeSampler(str(cgroupfs)).sample(now=1.0))
+    assert stats["/kubepods"]["cpu_limit"] == 1.0
+
+
+def test_deltas_start_with_the_second_sample(cgroupfs):
+    sampler = CgroupTreeSampler(str(cgroupfs))
+    first = by_name(sampler.sample(now=100.0))
+    assert first["/kubepods/pod1/ctr"]["deltas"] is None
+
+    write_cgroup(cgroupfs / "kubepods" / "pod1" / "ctr", usage_usec=2_000_000, throttled_usec=500_000, oom_kill=1,
+                 memory_current=50 * 2 ** 20, memory_max=100 * 2 ** 20, cpu_max="50000 100000", rbytes=4096)
+    second = by_name(sampler.sample(now=104.0))
+    entry = second["/kubepods/pod1/ctr"]
+    assert entry["elapsed"] == 4.0
+    assert entry["deltas"]["usage_usec"] == 2_000_000
+    assert entry["deltas"]["throttled_usec"] == 500_000
+    assert entry["deltas"]["oom_kill"] == 1
+    assert entry["deltas"]["rbytes"] == 4096
+    assert sampler.scans == 1
+    sampler.close()
+
+
+def test_rescans_only_when_descendants_change(cgroupfs):
+    sampler = CgroupTreeSampler(str(cgroupfs), rescan_interval=3600)
+    sampler.sample(now=1.0)
+    sampler.sample(now=2.0)
+    assert sampler.scans == 1
+
+    write_cgroup(cgroupfs / "kubepods" / "pod2", memory_current=0)
+    write_descendants(cgroupfs, 4)
+    stats = by_name(sampler.sample(now=3.0))
+    assert sampler.scans == 2
+    assert "/kubepods/pod2" in stats
+    # Cgroups that were already known keep their previous counters across the rescan.
+    assert stats["/kubepods/pod1"]["deltas"] is not None
+    sampler.close()
+
+
+def test_rescans_after_the_interval(cgroupfs):
+    sampler = CgroupTreeSampler(str(cgroupfs), rescan_interval=10)
+    sampler.sample(now=1.0)
+    sampler.sample(now=5.0)
+    sampler.sample(now=12.0)
+    assert sampler.scans == 2
+    sampler.close()
+
+
+def test_descriptors_are_reused_and_released(cgroupfs):
+    sampler = CgroupTreeSampler(str(cgroupfs))
+    sampler.sample(now=1.0)
+    cached = sampler._cached_fds
+    assert cached > 0
+    sampler.sample(now=2.0)
+    assert sampler._cached_fds == cached
+    sampler.close()
+    assert sampler._cached_fds == 0
+
+
+def test_shared_sampler_is_reused_and_replaced(cgroupfs):
+    first = get_tree_sampler(str(cgroupfs))
+    first.sample(now=1.0)
+    assert get_tree_sampler(str(cgroupfs)) is first
+
+    second = get_tree_sampler(str(cgroupfs), max_depth=1)
+    assert second is not first
+    assert first._cached_fds == 0
+
+
+def test_check_evaluates_each_cgroup_across_cycles(cgroupfs):
+    config = copy.deepcopy(check_config)
+    config["cgroup"] = {"root": str(cgroupfs)}
+
+    results = CgroupCheck(config).collect(None)
+    assert [result.metric("Cgroup") for result in results] == ["/kubepods", "/kubepods/pod1", "/kubepods/pod1/ctr"]
+    assert all(result.metric("CPU Cores Used") is None for result in results)
+
+    write_cgroup(cgroupfs / "kubepods" / "pod1" / "ctr", usage_usec=10 ** 9, oom_kill=1,
+                 memory_current=99 * 2 ** 20, memory_max=100 * 2 ** 20, cpu_max="50000 100000")
+    # A new check instance, as run_all_checks builds every cycle, still sees the previous counters.
+    results = {result.metric("Cgroup"): result for result in CgroupCheck(config).collect(None)}
+    container = results["/kubepods/pod1/ctr"]
+    assert container.metric("CPU Cores Used") is not None
+    assert container.metric("OOM Kills") == 1
+    assert container.status == "CRIT"
+    assert results["/kubepods"].status == "OK"
+
+
+def test_check_without_cgroup_v2(tmp_path):
+    config = copy.deepcopy(check_config)
+    config["cgroup"] = {"root": str(tmp_path / "missing")}
+    results = CgroupCheck(config).collect(None)
+    assert len(results) == 1 and results[0].status == "OK"
+
+
+def test_limit_sampler_walks_up_to_the_root(cgroupfs):
+    sampler = CgroupLimitSampler()
+    directory = str(cgroupfs / "kubepods" / "pod1")
+    assert sampler.limits(None, directory, str(cgroupfs)) == (2 ** 30, 2.0)
+    memory_limit, working_set = sampler.memory(None, str(cgroupfs / "kubepods" / "pod1" / "ctr"), str(cgroupfs))
+    assert working_set == 40 * 2 ** 20
+
+
+def test_limit_sampler_cpu_needs_two_calls(cgroupfs):
+    sampler = CgroupLimitSampler()
+    directory = str(cgroupfs / "kubepods" / "pod1" / "ctr")
+    assert sampler.cpu(None, directory, str(cgroupfs)) == (0.5, None)
+    cpu_limit, cores_used = sampler.cpu(None, directory, str(cgroupfs))
+    assert cpu_limit == 0.5 and cores_used == 0.0
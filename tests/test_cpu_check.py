@@ -0,0 +1,84 @@
+import copy
+
+import pytest
+
+from main.checks import cpu_check
+from main.checks.cpu_check import CPUCheck, CPUTimesSampler
+from main.checks.run_all_checks import check_config
+
+
+def stat_line(cpu, user=0, nice=0, system=0, idle=0, iowait=0, irq=0, softirq=0, steal=0):
+    return f"{cpu} {user} {nice} {system} {idle} {iowait} {irq} {softirq} {steal} 0 0\n"
+
+
+def write_stat(path, *lines):
+    path.write_text("".join(lines) + "intr 12345 0 0\nctxt 67890\n")
+
+
+@pytest.fixture
+def proc_stat(tmp_path):
+    path = tmp_path / "stat"
+    write_stat(
+        path,
+        stat_line("cpu", user=600, system=200, idle=1000, iowait=200),
+        stat_line("cpu0", user=300, system=100, idle=500, iowait=100),
+        stat_line("cpu1", user=300, system=100, idle=500, iowait=100),
+    )
+    return path
+
+
+def test_first_sample_reports_averages_since_boot(proc_stat):
+    usage = CPUTimesSampler(str(proc_stat)).sample()
+    assert set(usage) == {"cpu", "cpu0", "cpu1"}
+    assert usage["cpu"] == {"user": 30.0, "system": 10.0, "iowait": 10.0, "steal": 0.0, "idle": 50.0, "usage": 40.0}
+
+
+def test_later_samples_use_per_core_deltas(proc_stat):
+    sampler = CPUTimesSampler(str(proc_stat))
+    sampler.sample()
+    write_stat(
+        proc_stat,
+        stat_line("cpu", user=700, system=200, idle=1100, iowait=200, steal=0),
+        # cpu0 was fully busy and cpu1 fully idle for the interval.
+        stat_line("cpu0", user=400, system=100, idle=500, iowait=100),
+        stat_line("cpu1", user=300, system=100, idle=600, iowait=100),
+    )
+    usage = sampler.sample()
+    assert usage["cpu0"]["usage"] == 100.0 and usage["cpu0"]["user"] == 100.0
+    assert usage["cpu1"]["usage"] == 0.0 and usage["cpu1"]["idle"] == 100.0
+    assert usage["cpu"]["usage"] == 50.0
+
+
+def test_counters_that_step_backwards_do_not_go_negative(proc_stat):
+    sampler = CPUTimesSampler(str(proc_stat))
+    sampler.sample()
+    # cpu1 went offline and back: its counters restarted near zero.
+    write_stat(
+        proc_stat,
+        stat_line("cpu", user=700, system=200, idle=1100, iowait=200),
+        stat_line("cpu0", user=400, system=100, idle=600, iowait=100),
+        stat_line("cpu1", user=10, system=5, idle=20, iowait=1),
+        stat_line("cpu2", user=5, idle=15),
+    )
+    usage = sampler.sample()
+    assert usage["cpu1"] == {"user": 0.0, "system": 0.0, "iowait": 0.0, "steal": 0.0, "idle": 100.0, "usage": 0.0}
+    assert usage["cpu0"]["usage"] == 50.0
+    # A newly onlined CPU has no previous sample and reports since boot.
+    assert usage["cpu2"]["usage"] == 25.0
+
+
+def test_check_evaluates_aggregate_usage(proc_stat, monkeypatch):
+    monkeypatch.setattr(cpu_check, "cpu_sampler", CPUTimesSampler(str(proc_stat)))
+    monkeypatch.setattr(cpu_check.own_cgroup_sampler, "cpu", lambda snapshot=None: (None, None))
+    check = CPUCheck(copy.deepcopy(check_config))
+    check._get_linux_cpu_info()
+    write_stat(
+        proc_stat,
+        stat_line("cpu", user=1500, system=200, idle=1100, iowait=200),
+        stat_line("cpu0", user=750, system=100, idle=550, iowait=100),
+        stat_line("cpu1", user=750, system=100, idle=550, iowait=100),
+    )
+    (result,) = check._get_linux_cpu_info()
+    assert result.metric("Usage Percent") == 90.0
+    assert result.metric("Per Core Usage.cpu0") == 90.0
+    assert result.status == "WARN"
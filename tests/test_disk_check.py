@@ -0,0 +1,45 @@
+import copy
+
+import pytest
+
+from main.checks.disk_check import DiskCheck, DiskStatsSampler
+from main.checks.run_all_checks import check_config
+from main.utils.procfs import DISKSTATS_FIELDS
+
+
+def diskstats_line(major, minor, name, reads=0, read_ms=0, writes=0, write_ms=0, in_flight=0, io_ms=0):
+    values = dict.fromkeys(DISKSTATS_FIELDS, 0)
+    values.update(reads=reads, read_ms=read_ms, writes=writes, write_ms=write_ms, in_flight=in_flight, io_ms=io_ms)
+    return f"{major:4d} {minor:7d} {name} " + " ".join(str(values[field]) for field in DISKSTATS_FIELDS) + "\n"
+
+
+@pytest.fixture
+def procfs(tmp_path):
+    (tmp_path / "block" / "sda").mkdir(parents=True)
+    (tmp_path / "block" / "sdb").mkdir(parents=True)
+    diskstats = tmp_path / "diskstats"
+    diskstats.write_text(diskstats_line(8, 0, "sda", reads=10 ** 7, read_ms=10 ** 8, in_flight=3))
+    return diskstats, tmp_path / "block"
+
+
+def test_devices_report_no_rates_until_their_second_sample(procfs):
+    diskstats, sys_class_block = procfs
+    sampler = DiskStatsSampler(str(diskstats), str(sys_class_block))
+    first = sampler.sample()
+    assert first["sda"]["deltas"] is None and first["sda"]["in_flight"] == 3
+
+    diskstats.write_text(diskstats_line(8, 0, "sda", reads=10 ** 7 + 100, read_ms=10 ** 8 + 500)
+                         + diskstats_line(8, 16, "sdb", reads=5 * 10 ** 9, read_ms=10 ** 12))
+    second = sampler.sample()
+    assert second["sda"]["deltas"][DISKSTATS_FIELDS.index("reads")] == 100
+    assert second["sda"]["elapsed"] > 0
+    # sdb was hot-plugged; its lifetime counters are not a delta.
+    assert second["sdb"]["deltas"] is None
+
+
+def test_first_sample_is_gauges_only():
+    entry = {"device": (8, 0), "parent": "sda", "dm_name": None, "in_flight": 2, "deltas": None, "elapsed": None}
+    result = DiskCheck(copy.deepcopy(check_config))._io_result("sda", entry, ["/"])
+    assert result.status == "OK"
+    assert result.metric("In Flight") == 2
+    assert result.metric("Average Wait Ms") is None
@@ -0,0 +1,202 @@
+import asyncio
+import json
+import threading
+import zlib
+
+import pytest
+
+from tools.fleet_collector import (
+    FLAG_ZLIB, FRAME_ACK, FRAME_BATCH, FleetAgent, FleetCollector, ProtocolError, decode_payload,
+    encode_frame, parse_cycles, read_frame,
+)
+
+
+def cycle(usage, timestamp=1000.0):
+    return [timestamp, [{"name": "cpu", "status": "OK", "metrics": {"Usage Percent": usage}}]]
+
+
+class BlockingHistory:
+    """Stands in for the history store; holds the ingest worker until released."""
+
+    def __init__(self, blocked=False):
+        self.released = threading.Event()
+        if not blocked:
+            self.released.set()
+        self.cycles = []
+
+    def record_cycle(self, results, timestamp):
+        self.released.wait(5.0)
+        self.cycles.append((timestamp, [result["metrics"]["Usage Percent"] for result in results]))
+
+
+async def collector(**settings):
+    return await FleetCollector(host="127.0.0.1", port=0, **settings).start()
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def frame_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+@pytest.mark.parametrize("compress_level", [0, 1])
+def test_frames_round_trip(compress_level):
+    async def scenario():
+        frame = encode_frame(FRAME_BATCH, 42, [cycle(5.0)], compress_level)
+        frame_type, flags, sequence, body = await read_frame(frame_reader(frame))
+        assert (frame_type, sequence) == (FRAME_BATCH, 42)
+        assert bool(flags & FLAG_ZLIB) == bool(compress_level)
+        assert parse_cycles(decode_payload(flags, body)) == [(1000.0, cycle(5.0)[1])]
+
+        frame_type, _, sequence, body = await read_frame(frame_reader(encode_frame(FRAME_ACK, 7)))
+        assert (frame_type, sequence, body) == (FRAME_ACK, 7, b"")
+
+    asyncio.run(scenario())
+
+
+def test_oversized_frame_is_refused_before_it_is_read():
+    async def scenario():
+        frame = encode_frame(FRAME_BATCH, 1, [cycle(5.0)], 0)
+        with pytest.raises(ProtocolError):
+            await read_frame(frame_reader(frame), max_frame_bytes=10)
+
+    asyncio.run(scenario())
+
+
+def test_payload_may_not_inflate_past_the_limit():
+    bomb = zlib.compress(json.dumps([0] * 100_000).encode())
+    assert len(bomb) < 2000
+    with pytest.raises(ValueError):
+        decode_payload(FLAG_ZLIB, bomb, max_bytes=64 * 1024)
+    assert len(decode_payload(FLAG_ZLIB, bomb, max_bytes=1024 * 1024)) == 100_000
+
+
+@pytest.mark.parametrize("payload", [{"not": "a list"}, [[1000.0]], [["yesterday", []]], [[1000.0, ["not a dict"]]]])
+def test_malformed_cycles_are_rejected(payload):
+    with pytest.raises(ValueError):
+        parse_cycles(payload)
+
+
+def test_agents_push_and_malformed_batches_are_nacked():
+    async def scenario():
+        history = BlockingHistory()
+        server = await collector(history=history)
+        agents = [await FleetAgent(f"host-{index}", "127.0.0.1", server.bound_port).connect() for index in range(3)]
+        for index, agent in enumerate(agents):
+            await agent.send([cycle(float(index))])
+        # Valid JSON that is not a list of cycles: NACKed, and the connection stays usable.
+        await agents[0].send([["not", "a", "cycle"]])
+        await agents[0].send([cycle(9.0, 1001.0)])
+        assert all([await agent.flush(timeout=5.0) for agent in agents])
+        await server.drained()
+
+        assert agents[0].rejected == 1 and server.rejected_batches == 1
+        assert sorted(history.cycles) == [(1000.0, [0.0]), (1000.0, [1.0]), (1000.0, [2.0]), (1001.0, [9.0])]
+        assert server.fleet["host-0"].last_cycle == 1001.0
+        assert server.summary()["connected"] == 3
+        for agent in agents:
+            await agent.close()
+        await wait_until(lambda: server.summary()["connected"] == 0)
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_stops_acknowledging_until_ingest_catches_up():
+    async def scenario():
+        history = BlockingHistory(blocked=True)
+        server = await collector(history=history, queue_size=1, ingest_batch=1)
+        agent = await FleetAgent("host-0", "127.0.0.1", server.bound_port, window=2).connect()
+
+        # One batch is held by the ingest worker and one fills the queue; the
+        # connection then stops reading, so the agent's window fills.
+        sent = 0
+        with pytest.raises(asyncio.TimeoutError):
+            while True:
+                await agent.send([cycle(float(sent))], timeout=0.5)
+                sent += 1
+        assert agent.in_flight == 2
+        assert sent == 4
+
+        history.released.set()
+        assert await agent.flush(timeout=5.0)
+        await server.drained()
+        assert len(history.cycles) == sent
+        await agent.close()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unacknowledged_batches_are_resent_after_a_reconnect():
+    async def scenario():
+        received = []
+
+        async def drop_after_two(reader, writer):
+            # Reads HELLO and two batches, acknowledges nothing, then hangs up.
+            await read_frame(reader)
+            for _ in range(2):
+                received.append((await read_frame(reader))[2])
+            writer.close()
+
+        black_hole = await asyncio.start_server(drop_after_two, "127.0.0.1", 0)
+        agent = await FleetAgent("host-0", "127.0.0.1", black_hole.sockets[0].getsockname()[1], window=4).connect()
+        await agent.send([cycle(1.0)])
+        await agent.send([cycle(2.0, 1001.0)])
+        await wait_until(lambda: agent._ack_task.done())
+        assert received == [1, 2] and agent.in_flight == 2
+        with pytest.raises(ConnectionError):
+            await agent.send([cycle(3.0)])
+        black_hole.close()
+
+        history = BlockingHistory()
+        server = await collector(history=history)
+        agent.collector_port = server.bound_port
+        await agent.close()
+        await agent.connect()
+        assert await agent.flush(timeout=5.0)
+        await server.drained()
+        assert history.cycles == [(1000.0, [1.0]), (1001.0, [2.0])]
+        await agent.close()
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_host_stays_connected_while_any_of_its_connections_is_open():
+    async def scenario():
+        server = await collector()
+        old = await FleetAgent("host-0", "127.0.0.1", server.bound_port).connect()
+        new = await FleetAgent("host-0", "127.0.0.1", server.bound_port).connect()
+        await wait_until(lambda: server.fleet.get("host-0") is not None and server.fleet["host-0"].connections == 2)
+        await old.close()
+        await wait_until(lambda: server.fleet["host-0"].connections == 1)
+        assert server.summary()["connected"] == 1
+        await new.close()
+        await wait_until(lambda: not server.fleet["host-0"].connected)
+        await server.stop()
+
+    asyncio.run(scenario())
+
+
+def test_hello_is_required():
+    async def scenario():
+        server = await collector()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.bound_port)
+        writer.write(encode_frame(FRAME_BATCH, 1, [cycle(1.0)]))
+        await writer.drain()
+        # The collector hangs up without acknowledging.
+        assert await reader.read() == b""
+        writer.close()
+        assert not server.fleet
+        await server.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,195 @@
+import copy
+import sys
+import types
+
+import pytest
+
+from main.checks import gpu_check
+from main.checks.gpu_check import GPUCheck, NVMLBackend, SysfsGPUSampler, get_gpu_sampler
+from main.checks.run_all_checks import check_config
+
+
+def add_card(sysfs, index, pci_slot, vendor, driver, attributes=None, hwmon=None):
+    """Create /sys/class/drm/card<index> linked to a PCI device directory, as the kernel lays it out."""
+    device = sysfs / "devices" / "pci0000:00" / pci_slot
+    device.mkdir(parents=True)
+    (device / "vendor").write_text(f"{vendor}\n")
+    driver_directory = sysfs / "bus" / "pci" / "drivers" / driver
+    driver_directory.mkdir(parents=True, exist_ok=True)
+    (device / "driver").symlink_to(driver_directory)
+    for name, value in (attributes or {}).items():
+        (device / name).write_text(f"{value}\n")
+    if hwmon is not None:
+        hwmon_directory = device / "hwmon" / "hwmon0"
+        hwmon_directory.mkdir(parents=True)
+        for name, value in hwmon.items():
+            (hwmon_directory / name).write_text(f"{value}\n")
+
+    card = sysfs / "class" / "drm" / f"card{index}"
+    card.mkdir(parents=True)
+    (card / "device").symlink_to(device)
+    # Connectors share the directory and must not be taken for cards.
+    (sysfs / "class" / "drm" / f"card{index}-DP-1").mkdir()
+    return device
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    root = tmp_path / "sys"
+    add_card(
+        root, 0, "0000:03:00.0", "0x1002", "amdgpu",
+        attributes={"gpu_busy_percent": 42, "mem_info_vram_used": 6 * 2 ** 30, "mem_info_vram_total": 8 * 2 ** 30},
+        hwmon={
+            "name": "amdgpu",
+            "temp1_input": 61000, "temp1_label": "edge",
+            "temp2_input": 78000, "temp2_label": "junction",
+            "fan1_input": 1200, "pwm1": 90,
+            "power1_average": 95000000,
+        },
+    )
+    return root
+
+
+@pytest.fixture(autouse=True)
+def configured_sampler():
+    yield
+    if gpu_check._configured_sampler is not None:
+        gpu_check._configured_sampler.close()
+    gpu_check._configured_sampler = gpu_check._configured_settings = None
+
+
+class StubNVML:
+
+    def __init__(self, values):
+        self.values = values
+        self.calls = []
+
+    def sample(self, pci_slot):
+        self.calls.append(pci_slot)
+        return self.values
+
+
+def drm(sysfs):
+    return str(sysfs / "class" / "drm")
+
+
+def test_reads_amdgpu_attributes(sysfs):
+    sampler = SysfsGPUSampler(drm(sysfs))
+    (entry,) = sampler.sample()
+    assert entry["card"] == "card0"
+    assert entry["vendor"] == "AMD" and entry["driver"] == "amdgpu" and entry["pci_slot"] == "0000:03:00.0"
+    assert entry["utilization"] == 42
+    assert entry["memory_used"] == 6 * 2 ** 30 and entry["memory_total"] == 8 * 2 ** 30
+    assert entry["temperatures"] == {"edge": 61.0, "junction": 78.0}
+    assert entry["fan_rpm"] == 1200 and entry["fan_failure"] is False
+    assert entry["power_watts"] == 95.0
+    sampler.close()
+
+
+def test_enumerates_once_and_rereads_through_cached_descriptors(sysfs):
+    sampler = SysfsGPUSampler(drm(sysfs))
+    sampler.sample()
+    busy = sysfs / "devices" / "pci0000:00" / "0000:03:00.0" / "gpu_busy_percent"
+    busy.write_text("77\n")
+    (entry,) = sampler.sample()
+    assert entry["utilization"] == 77
+    assert sampler.enumerations == 1
+    sampler.close()
+
+
+def test_stopped_fan_under_pwm_is_a_failure(sysfs):
+    fan = sysfs / "devices" / "pci0000:00" / "0000:03:00.0" / "hwmon" / "hwmon0" / "fan1_input"
+    fan.write_text("0\n")
+    (entry,) = SysfsGPUSampler(drm(sysfs)).sample()
+    assert entry["fan_failure"] is True
+
+
+def test_lost_card_is_enumerated_again(sysfs):
+    sampler = SysfsGPUSampler(drm(sysfs))
+    sampler.sample()
+    # A real sysfs read fails once the device is gone; here the cached
+    # descriptors are dropped so the reopen hits the missing file.
+    for card in sampler._cards:
+        for fd in card.fds.values():
+            gpu_check.os.close(fd)
+        card.fds.clear()
+    (sysfs / "devices" / "pci0000:00" / "0000:03:00.0" / "gpu_busy_percent").unlink()
+    (entry,) = sampler.sample()
+    assert sampler.enumerations == 2
+    assert entry["utilization"] is None
+
+
+def test_nvidia_card_uses_nvml_only_when_the_driver_is_loaded(sysfs, tmp_path):
+    add_card(sysfs, 1, "0000:01:00.0", "0x10de", "nvidia")
+    memory = types.SimpleNamespace(used=15 * 2 ** 30, total=16 * 2 ** 30)
+    nvml = StubNVML({"temperature": 70, "utilization": 99, "memory": memory, "power_watts": 250.0})
+    driver_version = tmp_path / "nvidia-version"
+
+    stats = {entry["card"]: entry for entry in SysfsGPUSampler(drm(sysfs), str(driver_version), nvml).sample()}
+    assert nvml.calls == []
+    assert stats["card1"]["utilization"] is None
+
+    driver_version.write_text("NVRM version: 550.54\n")
+    stats = {entry["card"]: entry for entry in SysfsGPUSampler(drm(sysfs), str(driver_version), nvml).sample()}
+    assert nvml.calls == ["0000:01:00.0"]
+    assert stats["card1"]["utilization"] == 99
+    assert stats["card1"]["temperatures"] == {"gpu": 70.0}
+    assert stats["card1"]["memory_used"] == 15 * 2 ** 30
+    # The AMD card never goes through NVML.
+    assert stats["card0"]["utilization"] == 42
+
+
+def test_nvml_backend_without_bindings(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pynvml", None)
+    backend = NVMLBackend()
+    assert backend.sample("0000:01:00.0") == {}
+    assert backend._failed
+
+
+def test_nvml_backend_matches_cards_by_pci_address(monkeypatch):
+    handle = object()
+    pynvml = types.SimpleNamespace(
+        NVML_TEMPERATURE_GPU=0,
+        nvmlInit=lambda: None,
+        nvmlDeviceGetCount=lambda: 1,
+        nvmlDeviceGetHandleByIndex=lambda index: handle,
+        nvmlDeviceGetPciInfo=lambda h: types.SimpleNamespace(busId=b"00000000:01:00.0"),
+        nvmlDeviceGetTemperature=lambda h, sensor: 65,
+        nvmlDeviceGetUtilizationRates=lambda h: types.SimpleNamespace(gpu=30),
+        nvmlDeviceGetMemoryInfo=lambda h: types.SimpleNamespace(used=1, total=2),
+        nvmlDeviceGetPowerUsage=lambda h: 120000,
+    )
+    monkeypatch.setitem(sys.modules, "pynvml", pynvml)
+    backend = NVMLBackend()
+    values = backend.sample("0000:01:00.0")
+    # nvmlDeviceGetFanSpeed is missing, as on a passively cooled board.
+    assert values["temperature"] == 65 and values["utilization"] == 30 and values["power_watts"] == 120.0
+    assert "fan_percent" not in values
+    assert backend.sample("0000:02:00.0") == {}
+
+
+def test_check_evaluates_against_gpu_thresholds(sysfs):
+    config = copy.deepcopy(check_config)
+    config["gpu"] = {"drm_root": drm(sysfs), "nvml": False}
+    (result,) = GPUCheck(config).collect(None)
+    # 78 C on the junction sensor is past the 75 C warning.
+    assert result.status == "WARN"
+    assert result.metric("Temperature Celsius") == 78.0
+    assert result.metric("Memory Used Percent") == 75.0
+    assert result.metric("Temperatures.edge") == 61.0
+
+
+def test_check_shares_its_sampler_across_instances(sysfs):
+    config = copy.deepcopy(check_config)
+    config["gpu"] = {"drm_root": drm(sysfs), "nvml": False}
+    first = GPUCheck(config)
+    first.collect(None)
+    assert GPUCheck(config)._sampler is first._sampler
+    assert get_gpu_sampler() is gpu_check.gpu_sampler
+
+
+def test_check_without_gpus(tmp_path):
+    config = copy.deepcopy(check_config)
+    config["gpu"] = {"drm_root": str(tmp_path / "missing")}
+    (result,) = GPUCheck(config).collect(None)
+    assert result.status == "OK"
@@ -0,0 +1,32 @@
+from tools.history_store import TIER_HOUR, TIER_MINUTE, TIER_RAW, HistoryStore
+
+
+def cycle(usage):
+    return [{"name": "cpu", "status": "OK", "metrics": {"Usage Percent": usage}}]
+
+
+def test_repeated_timestamp_is_stored_and_rolled_up_once(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    assert store.record_cycle(cycle(50.0), 1000.0) == 2
+    # Same whole second, e.g. a batch resent after a reconnect.
+    assert store.record_cycle(cycle(50.0), 1000.4) == 0
+
+    for tier in (TIER_RAW, TIER_MINUTE, TIER_HOUR):
+        (points,) = store.query("cpu", "Usage Percent", 0, 4000, tier=tier).values()
+        assert [point[1:] for point in points] == [(50.0, 50.0, 50.0)]
+
+    for table in ("rollup_1m", "rollup_1h"):
+        rows = store._connection.execute(
+            f"SELECT d.count, d.sum FROM {table} d JOIN series s ON s.id = d.series_id WHERE s.metric = 'Usage Percent'"
+        ).fetchall()
+        assert rows == [(1, 50.0)]
+    store.close()
+
+
+def test_new_seconds_still_fold_into_the_rollups(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    store.record_cycle(cycle(40.0), 1000.0)
+    store.record_cycle(cycle(60.0), 1001.0)
+    (points,) = store.query("cpu", "Usage Percent", 960, 1019, tier=TIER_MINUTE).values()
+    assert points == [(960, 40.0, 60.0, 50.0)]
+    store.close()
@@ -0,0 +1,14 @@
+from main.reporters.influxdb import InfluxDBReporter
+
+
+def test_non_finite_fields_are_left_out():
+    reporter = InfluxDBReporter({"url": "http://127.0.0.1:8086/api/v2/write"})
+    body = reporter.body([
+        {"name": "disk", "status": "OK", "host": "web-1", "timestamp": 1.5,
+         "metrics": {"Mount Point": "/", "Average Wait Ms": float("nan"), "Queue Depth": float("inf"), "Percentage Used": 42.0}},
+        {"name": "gpu", "status": "OK", "metrics": {"Temperature Celsius": float("-inf")}},
+    ]).decode()
+    assert body.splitlines() == [
+        "merlin_disk,Mount\\ Point=/,host=web-1 status=0.0,Percentage\\ Used=42.0 1500000000",
+        "merlin_gpu status=0.0",
+    ]
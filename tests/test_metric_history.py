@@ -0,0 +1,86 @@
+import pytest
+
+from tools import metric_history
+from tools.metric_history import SERIES_OVERHEAD_BYTES, MetricHistory, SeriesRing, percentile
+
+SERIES_BYTES = 16 * 4 + SERIES_OVERHEAD_BYTES
+
+
+def test_ring_wraps_and_keeps_the_newest_samples():
+    ring = SeriesRing(4)
+    for second in range(6):
+        ring.append(float(second), second * 10.0)
+    assert ring.count == 4
+    assert ring.window() == [20.0, 30.0, 40.0, 50.0]
+    assert ring.window(start=4.0) == [40.0, 50.0]
+    assert ring.last() == (5.0, 50.0)
+    assert ring.first_in_window(3.0) == (3.0, 30.0)
+
+
+def test_window_rate_and_summary():
+    history = MetricHistory(samples_per_series=100)
+    for second in range(60):
+        history.append("disk", "Percentage Used", "{}", 10.0 + second * 0.5, 1000.0 + second)
+
+    assert history.window("disk", "Percentage Used", seconds=2, now=1059.0) == [38.5, 39.0, 39.5]
+    assert history.rate("disk", "Percentage Used", seconds=10, now=1059.0) == pytest.approx(0.5)
+    assert history.rate("disk", "Percentage Used", seconds=0, now=1059.0) is None
+    summary = history.summary("disk", "Percentage Used", seconds=9, now=1059.0)
+    assert summary["count"] == 10 and summary["min"] == 35.0 and summary["max"] == 39.5
+    assert summary["mean"] == pytest.approx(37.25) and summary["p50"] == pytest.approx(37.25)
+    assert history.summary("disk", "Missing") is None
+
+
+def test_percentile_fallback_matches_numpy_definition(monkeypatch):
+    monkeypatch.setattr(metric_history, "numpy", None)
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 95) == pytest.approx(4.8)
+    assert percentile([], 50) is None
+
+
+def test_cap_refuses_new_series_while_every_series_is_live():
+    history = MetricHistory(samples_per_series=4, max_bytes=3 * SERIES_BYTES, max_idle_seconds=100.0)
+    for second in range(10):
+        for disk in ("sda", "sdb", "sdc", "sdd"):
+            history.append("disk", "Average Wait Ms", disk, 1.0, float(second))
+    # The first three keep a full window; the fourth never displaces them.
+    assert history.series("disk", "Average Wait Ms") == ["sda", "sdb", "sdc"]
+    assert history.window("disk", "Average Wait Ms", "sda") == [1.0] * 4
+    assert history.refused_samples == 10 and history.evicted_series == 0
+    assert history.nbytes == 3 * SERIES_BYTES
+
+
+def test_cap_evicts_idle_series_for_new_ones():
+    history = MetricHistory(samples_per_series=4, max_bytes=3 * SERIES_BYTES, max_idle_seconds=100.0)
+    for disk in ("sda", "sdb", "sdc"):
+        history.append("disk", "Average Wait Ms", disk, 1.0, 0.0)
+    # sda is unmounted; the others keep reporting.
+    history.append("disk", "Average Wait Ms", "sdb", 1.0, 200.0)
+    history.append("disk", "Average Wait Ms", "sdc", 1.0, 200.0)
+    history.append("disk", "Average Wait Ms", "sdd", 1.0, 200.0)
+    assert history.series("disk", "Average Wait Ms") == ["sdb", "sdc", "sdd"]
+    assert history.evicted_series == 1 and history.refused_samples == 0
+
+
+def test_record_flattens_results():
+    history = MetricHistory()
+    count = history.record([{"name": "cpu", "status": "WARN", "metrics": {"Usage Percent": 85.0, "Per Core Usage": {"cpu0": 90.0}}}], 5.0)
+    assert count == 3
+    assert history.last("cpu", "status") == (5.0, 2.0)
+    assert history.last("cpu", "Per Core Usage.cpu0") == (5.0, 90.0)
+
+
+def test_resize():
+    history = MetricHistory(samples_per_series=4, max_bytes=10 * SERIES_BYTES)
+    history.append("cpu", "Usage Percent", "{}", 1.0, 0.0)
+    history.resize(max_bytes=SERIES_BYTES)
+    # A lower cap keeps what is stored but limits new series.
+    assert history.last("cpu", "Usage Percent") == (0.0, 1.0)
+    history.append("memory", "Percentage Used", "{}", 1.0, 1.0)
+    assert history.refused_samples == 1
+
+    history.resize(samples_per_series=8)
+    # A new ring size starts over.
+    assert len(history) == 0 and history.nbytes == 0
+    history.append("memory", "Percentage Used", "{}", 1.0, 2.0)
+    assert history.refused_samples == 2
@@ -0,0 +1,79 @@
+import gzip
+import http.client
+
+import pytest
+
+from tools import metrics_exporter
+from tools.metrics_exporter import OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE, MetricsExporter, accepts
+
+
+@pytest.fixture
+def exporter():
+    exporter = MetricsExporter(host="127.0.0.1", port=0, max_series_per_family=2).start()
+    yield exporter
+    exporter.stop()
+
+
+def disk_results(count):
+    return [
+        {"name": "disk", "status": "OK", "metrics": {"Mount Point": f"/mnt/{index}", "Percentage Used": float(index)}}
+        for index in range(count)
+    ]
+
+
+def get(exporter, headers):
+    connection = http.client.HTTPConnection("127.0.0.1", exporter.port)
+    try:
+        connection.request("GET", "/metrics", headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        return response, gzip.decompress(body) if response.getheader("Content-Encoding") == "gzip" else body
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("headers, content_type, encoding", [
+    ({}, PROMETHEUS_CONTENT_TYPE, None),
+    ({"Accept-Encoding": "gzip"}, PROMETHEUS_CONTENT_TYPE, "gzip"),
+    ({"Accept": "application/openmetrics-text; version=1.0.0"}, OPENMETRICS_CONTENT_TYPE, None),
+    ({"Accept": "application/openmetrics-text; version=1.0.0", "Accept-Encoding": "deflate, gzip"}, OPENMETRICS_CONTENT_TYPE, "gzip"),
+    ({"Accept": "*/*", "Accept-Encoding": "gzip;q=0"}, PROMETHEUS_CONTENT_TYPE, None),
+])
+def test_scrape_serves_the_negotiated_format(exporter, monkeypatch, headers, content_type, encoding):
+    exporter.update(disk_results(3))
+    # A scrape only writes the pre-rendered buffers.
+    monkeypatch.setattr(metrics_exporter, "render_exposition", lambda *args, **kwargs: pytest.fail("rendered on scrape"))
+    monkeypatch.setattr(metrics_exporter, "flatten_result", lambda *args, **kwargs: pytest.fail("collected on scrape"))
+
+    response, body = get(exporter, headers)
+    text = body.decode()
+    assert response.status == 200
+    assert response.getheader("Content-Type") == content_type
+    assert response.getheader("Content-Encoding") == encoding
+    assert text.endswith("# EOF\n") == (content_type == OPENMETRICS_CONTENT_TYPE)
+    # Two of the three mount points fit under the cap, in both the usage and the status family.
+    assert text.count("merlin_disk_percentage_used{") == 2
+    assert text.count("merlin_disk_status{") == 2
+    assert "merlin_exporter_dropped_series 2\n" in text
+
+
+def test_unknown_path_is_not_found(exporter):
+    connection = http.client.HTTPConnection("127.0.0.1", exporter.port)
+    connection.request("GET", "/")
+    assert connection.getresponse().status == 404
+    connection.close()
+
+
+@pytest.mark.parametrize("header, value, expected", [
+    ("gzip", "gzip", True),
+    ("deflate, gzip;q=0.5", "gzip", True),
+    ("gzip;q=0", "gzip", False),
+    ("gzip; q=0.0, deflate", "gzip", False),
+    ("*", "gzip", True),
+    ("*;q=1, gzip;q=0", "gzip", False),
+    ("", "gzip", False),
+    ("application/openmetrics-text;version=1.0.0;q=0.5,text/plain;q=0.3", "application/openmetrics-text", True),
+    ("*/*", "application/openmetrics-text", False),
+])
+def test_accepts_reads_q_values(header, value, expected):
+    assert accepts(header, value) is expected
@@ -0,0 +1,151 @@
+import copy
+import types
+
+import pytest
+
+from main.checks import network_check
+from main.checks.network_check import NetDevSampler, NetworkCheck, PsutilNetSampler, counter_delta
+from main.checks.run_all_checks import check_config
+from main.utils.procfs import NET_DEV_FIELDS
+
+HEADER = "Inter-|   Receive |  Transmit\n face |bytes packets errs drop|bytes packets errs drop\n"
+
+
+def net_dev_line(interface, rx_bytes=0, rx_packets=0, rx_errors=0, rx_drops=0, tx_bytes=0, tx_packets=0):
+    counters = [rx_bytes, rx_packets, rx_errors, rx_drops, 0, 0, 0, 0, tx_bytes, tx_packets, 0, 0, 0, 0, 0, 0]
+    return f"{interface:>6}: " + " ".join(str(value) for value in counters) + "\n"
+
+
+def write_link(sys_class_net, interface, operstate="up", speed=1000, carrier_changes=2):
+    directory = sys_class_net / interface
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "operstate").write_text(f"{operstate}\n")
+    (directory / "speed").write_text(f"{speed}\n")
+    (directory / "carrier_changes").write_text(f"{carrier_changes}\n")
+
+
+@pytest.fixture
+def procfs(tmp_path):
+    sys_class_net = tmp_path / "net"
+    write_link(sys_class_net, "eth0")
+    net_dev = tmp_path / "dev"
+    net_dev.write_text(HEADER + net_dev_line("eth0", rx_bytes=10 ** 9, rx_packets=10 ** 6))
+    return net_dev, sys_class_net
+
+
+def entry(deltas=None, elapsed=None, flaps=None, speed=1000, peak_speed=1000, operstate="up"):
+    return {"deltas": deltas, "elapsed": elapsed, "flaps": flaps, "speed": speed, "peak_speed": peak_speed,
+            "operstate": operstate, "carrier_changes": None}
+
+
+def counters(**values):
+    return tuple(values.get(field, 0) for field in NET_DEV_FIELDS)
+
+
+def test_counter_delta_wraps_only_where_the_counter_can_wrap():
+    assert counter_delta(100, 150) == 50
+    assert counter_delta(2 ** 32 - 10, 5, bits=32) == 15
+    # A 64-bit counter that drops from a small value was reset, not wrapped.
+    assert counter_delta(2 ** 31, 5) == 5
+    assert counter_delta(2 ** 64 - 10, 5) == 15
+
+
+def test_interfaces_report_no_rates_until_their_second_sample(procfs):
+    net_dev, sys_class_net = procfs
+    sampler = NetDevSampler(str(net_dev), str(sys_class_net))
+    first = sampler.sample()
+    assert first["eth0"]["deltas"] is None and first["eth0"]["flaps"] is None
+
+    write_link(sys_class_net, "eth1")
+    net_dev.write_text(HEADER + net_dev_line("eth0", rx_bytes=10 ** 9 + 500, rx_packets=10 ** 6 + 5)
+                       + net_dev_line("eth1", rx_bytes=7 * 10 ** 12))
+    second = sampler.sample()
+    assert second["eth0"]["deltas"][NET_DEV_FIELDS.index("rx_bytes")] == 500
+    assert second["eth0"]["flaps"] == 0
+    # eth1 appeared mid-run; its lifetime counters are not a delta.
+    assert second["eth1"]["deltas"] is None
+
+
+def test_sampler_tracks_the_fastest_link_speed(procfs):
+    net_dev, sys_class_net = procfs
+    sampler = NetDevSampler(str(net_dev), str(sys_class_net))
+    sampler.sample()
+    write_link(sys_class_net, "eth0", speed=100)
+    stats = sampler.sample()
+    assert stats["eth0"]["speed"] == 100 and stats["eth0"]["peak_speed"] == 1000
+
+
+def test_peak_speed_resets_after_a_period_at_the_new_speed(procfs, monkeypatch):
+    net_dev, sys_class_net = procfs
+    clock = iter([0.0, 10.0, 100.0, 3700.0, 3710.0])
+    monkeypatch.setattr(network_check, "sample_time", lambda snapshot: next(clock))
+    sampler = NetDevSampler(str(net_dev), str(sys_class_net))
+    sampler.sample()
+    write_link(sys_class_net, "eth0", speed=100)
+    assert sampler.sample()["eth0"]["peak_speed"] == 1000
+    assert sampler.sample()["eth0"]["peak_speed"] == 1000
+    # An hour after it first ran at 100 Mb/s, that is the link's normal speed.
+    assert sampler.sample()["eth0"]["peak_speed"] == 100
+    write_link(sys_class_net, "eth0", speed=1000)
+    assert sampler.sample()["eth0"]["peak_speed"] == 1000
+
+
+def test_peak_speed_of_a_removed_interface_is_forgotten(procfs):
+    net_dev, sys_class_net = procfs
+    write_link(sys_class_net, "eth1", speed=10000)
+    net_dev.write_text(HEADER + net_dev_line("eth0") + net_dev_line("eth1"))
+    sampler = NetDevSampler(str(net_dev), str(sys_class_net))
+    sampler.sample()
+    net_dev.write_text(HEADER + net_dev_line("eth0"))
+    sampler.sample()
+    assert set(sampler._peak_speed) == {"eth0"}
+
+    # A replacement NIC under the old name starts from its own speed.
+    write_link(sys_class_net, "eth1", speed=1000)
+    net_dev.write_text(HEADER + net_dev_line("eth0") + net_dev_line("eth1"))
+    assert sampler.sample()["eth1"]["peak_speed"] == 1000
+
+
+def test_first_sample_is_gauges_only():
+    result = NetworkCheck(copy.deepcopy(check_config))._interface_result("eth0", entry())
+    assert result.status == "OK"
+    assert result.metric("Receive Bytes Rate") is None
+    assert result.metric("Packet Loss Percent") is None
+    assert result.metric("Link Flaps") is None
+
+
+@pytest.mark.parametrize("sample, status", [
+    (entry(counters(rx_packets=1000), 10.0, 0), "OK"),
+    (entry(counters(rx_packets=1000, rx_errors=20), 10.0, 0), "WARN"),
+    (entry(counters(rx_packets=1000, rx_errors=60), 10.0, 0), "CRIT"),
+    (entry(counters(rx_packets=1000), 10.0, 1), "WARN"),
+    (entry(counters(rx_packets=1000), 10.0, 4), "CRIT"),
+    (entry(counters(rx_packets=1000), 10.0, 0, speed=100, peak_speed=1000), "CRIT"),
+    (entry(counters(rx_packets=1000), 10.0, 0, speed=400, peak_speed=1000), "WARN"),
+    (entry(counters(rx_packets=95, rx_drops=5), 10.0, 0), "CRIT"),
+])
+def test_each_network_metric_has_its_own_thresholds(sample, status):
+    result = NetworkCheck(copy.deepcopy(check_config))._interface_result("eth0", sample)
+    assert result.status == status
+
+
+def test_psutil_counters_keep_state_across_check_instances(monkeypatch):
+    readings = iter([
+        {"Ethernet": types.SimpleNamespace(bytes_recv=2 ** 31, bytes_sent=0, packets_recv=10, packets_sent=0,
+                                           errin=0, errout=0, dropin=0, dropout=0)},
+        {"Ethernet": types.SimpleNamespace(bytes_recv=4096, bytes_sent=0, packets_recv=20, packets_sent=0,
+                                           errin=0, errout=0, dropin=0, dropout=0)},
+    ])
+    monkeypatch.setattr(network_check.psutil, "net_io_counters", lambda pernic: next(readings))
+    monkeypatch.setattr(network_check.psutil, "net_if_stats",
+                        lambda: {"Ethernet": types.SimpleNamespace(isup=True, speed=1000)})
+    monkeypatch.setattr(network_check, "psutil_net_sampler", PsutilNetSampler())
+
+    config = copy.deepcopy(check_config)
+    (first,) = NetworkCheck(config)._get_windows_network_info()
+    assert first.metric("Receive Bytes Rate") is None
+    (second,) = NetworkCheck(config)._get_windows_network_info()
+    # The counter was reset: only the new value counts, not a 4 GiB wrap.
+    assert second.metric("Receive Bytes Rate") is not None
+    assert network_check.psutil_net_sampler._previous["Ethernet"][0][0] == 4096
+    assert second.metric("Link Flaps") is None
@@ -0,0 +1,60 @@
+import copy
+
+import pytest
+
+from main.checks import ram_check
+from main.checks.ram_check import MemoryCounterSampler, RAMCheck
+from main.checks.run_all_checks import check_config
+
+GIB_KB = 1024 * 1024
+
+
+def write_counters(directory, pswpin=0, pswpout=0, pgmajfault=0, some_total=0, full_total=0):
+    (directory / "vmstat").write_text(f"nr_free_pages 100\npswpin {pswpin}\npswpout {pswpout}\npgmajfault {pgmajfault}\n")
+    (directory / "memory").write_text(
+        f"some avg10=0.00 avg60=0.00 avg300=0.00 total={some_total}\n"
+        f"full avg10=0.00 avg60=0.00 avg300=0.00 total={full_total}\n"
+    )
+
+
+@pytest.fixture
+def procfs(tmp_path, monkeypatch):
+    (tmp_path / "meminfo").write_text(
+        f"MemTotal: {16 * GIB_KB} kB\nMemFree: {8 * GIB_KB} kB\nMemAvailable: {12 * GIB_KB} kB\n"
+        f"SwapTotal: {4 * GIB_KB} kB\nSwapFree: {4 * GIB_KB} kB\n"
+    )
+    write_counters(tmp_path)
+    sampler = MemoryCounterSampler(str(tmp_path / "meminfo"), str(tmp_path / "vmstat"), str(tmp_path / "memory"))
+    monkeypatch.setattr(ram_check, "memory_sampler", sampler)
+    monkeypatch.setattr(ram_check.own_cgroup_sampler, "memory", lambda snapshot=None: (None, None))
+    clock = iter([1000.0, 1010.0])
+    monkeypatch.setattr(ram_check, "sample_time", lambda snapshot: next(clock))
+    return tmp_path
+
+
+def sample_twice(directory, **counters):
+    check = RAMCheck(copy.deepcopy(check_config))
+    check._get_linux_ram_info()
+    write_counters(directory, **counters)
+    (result,) = check._get_linux_ram_info()
+    return result
+
+
+def test_quiet_host_is_ok(procfs):
+    result = sample_twice(procfs)
+    assert result.status == "OK"
+    assert result.metric("Percentage Used") == 25.0
+
+
+@pytest.mark.parametrize("counters, metric, value, status", [
+    ({"pswpin": 2000}, "Swap In Rate", 200.0, "WARN"),
+    ({"pswpout": 20000}, "Swap Out Rate", 2000.0, "CRIT"),
+    ({"pgmajfault": 10000}, "Major Fault Rate", 1000.0, "WARN"),
+    # PSI totals are microseconds: 1.5 s of 10 s is a 15% stall.
+    ({"some_total": 1_500_000}, "Stall Some Percent", 15.0, "WARN"),
+    ({"full_total": 1_200_000}, "Stall Full Percent", 12.0, "CRIT"),
+])
+def test_pressure_signals_fold_into_the_status(procfs, counters, metric, value, status):
+    result = sample_twice(procfs, **counters)
+    assert result.metric(metric) == value
+    assert result.status == status
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from main.reporters.pipeline import ReporterPipeline
+
+
+class StandIn:
+    """A local HTTP sink that records each batch it accepts and answers `status` otherwise."""
+
+    def __init__(self):
+        self.status = 204
+        self.delay = 0.0
+        self.batches = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                time.sleep(stand_in.delay)
+                status = stand_in.status
+                if status < 300:
+                    stand_in.batches.append(json.loads(body))
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def received(self):
+        return [record["metrics"]["Sequence"] for batch in self.batches for record in batch]
+
+    def sink(self, **settings):
+        return {
+            "type": "webhook", "name": "stand-in", "url": f"http://127.0.0.1:{self.server.server_address[1]}/hook",
+            "batch_age_sec": 0.05, "retry_initial_sec": 0.05, "retry_max_sec": 0.1, **settings,
+        }
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+def results(start, count):
+    return [{"name": "cpu", "status": "OK", "metrics": {"Sequence": sequence}} for sequence in range(start, start + count)]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_batches_by_record_count(stand_in, tmp_path):
+    pipeline = ReporterPipeline.from_config([stand_in.sink(batch_records=10, batch_age_sec=0.5)], str(tmp_path))
+    pipeline.publish(results(0, 25))
+    assert pipeline.flush(timeout=5.0)
+    assert sorted(stand_in.received) == list(range(25))
+    assert max(len(batch) for batch in stand_in.batches) == 10
+    assert all(record["host"] == pipeline.host for batch in stand_in.batches for record in batch)
+    pipeline.close()
+
+
+def test_retries_with_backoff_until_the_sink_recovers(stand_in, tmp_path):
+    stand_in.status = 503
+    pipeline = ReporterPipeline.from_config([stand_in.sink(spill_after_sec=60.0)], str(tmp_path))
+    (worker,) = pipeline.workers
+    pipeline.publish(results(0, 5))
+    # The delay doubles with each failed attempt, up to retry_max.
+    wait_for(lambda: worker._backoff == worker.retry_max)
+    assert not worker.healthy and not stand_in.batches
+    stand_in.status = 204
+    assert pipeline.flush(timeout=5.0)
+    assert sorted(stand_in.received) == list(range(5))
+    assert worker.healthy and worker.stats()["sent"] == 5
+    pipeline.close()
+
+
+def test_rejected_batch_is_dropped_not_retried(stand_in, tmp_path):
+    stand_in.status = 400
+    pipeline = ReporterPipeline.from_config([stand_in.sink()], str(tmp_path))
+    pipeline.publish(results(0, 3))
+    assert pipeline.flush(timeout=5.0)
+    assert pipeline.stats()["stand-in"]["dropped"] == 3
+    pipeline.close()
+
+
+def test_spills_while_down_and_replays_on_recovery(stand_in, tmp_path):
+    stand_in.status = 503
+    pipeline = ReporterPipeline.from_config([stand_in.sink(batch_records=5, spill_after_sec=0.0)], str(tmp_path))
+    (worker,) = pipeline.workers
+    pipeline.publish(results(0, 20))
+    wait_for(lambda: worker.spilled == 20)
+    assert worker.spill.nbytes > 0
+
+    # Nothing new arrives: the replay itself finds the sink is back.
+    stand_in.status = 204
+    wait_for(lambda: worker.replayed == 20)
+    assert sorted(stand_in.received) == list(range(20))
+    assert worker.healthy and not worker.spill
+    pipeline.close()
+
+
+def test_overflow_is_spilled_by_the_worker_not_the_publisher(stand_in, tmp_path):
+    stand_in.delay = 0.2
+    pipeline = ReporterPipeline.from_config([stand_in.sink(queue_records=5, batch_records=5)], str(tmp_path))
+    (worker,) = pipeline.workers
+    writers = set()
+    append = worker.spill.append
+    worker.spill.append = lambda records: (writers.add(threading.current_thread().name), append(records))
+
+    pipeline.publish(results(0, 5))
+    wait_for(lambda: worker._pending is not None)
+    # Five fill the queue and five are set aside; past that they are dropped.
+    pipeline.publish(results(5, 12))
+    assert worker.overflow_dropped == 2
+    assert pipeline.flush(timeout=10.0)
+    assert sorted(stand_in.received) == list(range(15))
+    assert writers == {"merlin-sink-stand-in"}
+    pipeline.close()
+
+
+def test_close_spills_what_the_sink_could_not_take(stand_in, tmp_path):
+    stand_in.delay = 0.5
+    pipeline = ReporterPipeline.from_config([stand_in.sink(batch_records=5)], str(tmp_path))
+    (worker,) = pipeline.workers
+    pipeline.publish(results(0, 20))
+    wait_for(lambda: worker._pending is not None)
+    pipeline.close(timeout=0.1)
+    assert len(stand_in.received) + worker.spilled == 20
+    assert not worker._thread.is_alive()
@@ -0,0 +1,38 @@
+from main.checks.snapshot import CycleSnapshot
+
+
+def test_sources_are_read_once_per_tick(tmp_path):
+    source = tmp_path / "stat"
+    source.write_text("1\n")
+    snapshot = CycleSnapshot()
+    assert snapshot.view("cpu").read_text(str(source)) == "1\n"
+    source.write_text("2\n")
+    assert snapshot.view("memory").read_text(str(source)) == "1\n"
+
+
+def test_each_check_records_the_sources_it_touched(tmp_path):
+    snapshot = CycleSnapshot()
+    cpu, memory = snapshot.view("cpu"), snapshot.view("memory")
+    cpu.get("/proc/stat", lambda: "stat")
+    cpu.get("host_facts", dict)
+    memory.get("/proc/meminfo", lambda: "meminfo")
+    memory.get("host_facts", dict)
+    assert snapshot.sources_touched() == {
+        "cpu": ["/proc/stat", "host_facts"],
+        "memory": ["/proc/meminfo", "host_facts"],
+    }
+
+
+def test_previous_reaches_back_one_tick_only():
+    first = CycleSnapshot()
+    first.get("/proc/stat", lambda: "first")
+    first.get("/proc/vmstat", lambda: "vmstat")
+    second = CycleSnapshot(first)
+    second.get("/proc/stat", lambda: "second")
+    third = CycleSnapshot(second)
+
+    assert third.tick == 2
+    assert third.view("cpu").previous("/proc/stat") == (second.timestamp, "second")
+    # Read two ticks ago but not by the tick before: not kept.
+    assert third.previous("/proc/vmstat") is None
+    assert CycleSnapshot().previous("/proc/stat") is None
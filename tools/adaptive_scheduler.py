@@ -0,0 +1,136 @@
+"""
+Adaptive per-check sampling intervals.
+
+After every run the policy looks at the check's evaluate() calls (metric,
+value, warn, crit) and its result statuses and picks the next interval:
+
+  * a status changed since the previous run        -> the floor
+  * any result is WARN/CRIT                         -> the floor
+  * a metric is projected to reach `warn` within
+    two intervals at its current trend              -> half that time (>= floor)
+  * a metric is within `near_fraction` of `warn`    -> half the current interval
+  * every metric is deep in OK (more than
+    `deep_fraction` below `warn`) and none is
+    projected to reach `warn` within
+    `rising_horizon` ceilings                       -> current * `backoff` (<= ceiling)
+  * otherwise                                       -> unchanged
+
+so a disk filling toward `crit` is sampled quickly while idle hosts back off
+exponentially to the ceiling. A metric that only creeps upward (disk usage
+almost always does) does not hold an idle host at its current interval.
+"""
+
+from main.checks.base import STATUS_SEVERITY
+
+DEFAULT_BACKOFF = 2.0
+DEFAULT_NEAR_FRACTION = 0.10
+DEFAULT_DEEP_FRACTION = 0.25
+DEFAULT_RISING_HORIZON = 4.0
+
+
+class AdaptiveInterval:
+
+    def __init__(
+        self,
+        base_interval: float,
+        min_interval: float = None,
+        max_interval: float = None,
+        backoff: float = DEFAULT_BACKOFF,
+        near_fraction: float = DEFAULT_NEAR_FRACTION,
+        deep_fraction: float = DEFAULT_DEEP_FRACTION,
+        rising_horizon: float = DEFAULT_RISING_HORIZON,
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval if min_interval is not None else base_interval / 8
+        self.max_interval = max_interval if max_interval is not None else base_interval * 8
+        self.backoff = backoff
+        self.near_fraction = near_fraction
+        self.deep_fraction = deep_fraction
+        # A rise only blocks back-off if it reaches `warn` within this many ceilings.
+        self.rising_horizon = rising_horizon
+
+        self.interval = base_interval
+        self.reason = "initial"
+        self._previous_statuses = None
+        self._previous_values = {}
+        self._previous_time = None
+
+    @classmethod
+    def from_config(cls, base_interval, adaptive_config, check_name):
+        """Build from the "adaptive" config section; per-check overrides live under adaptive.checks.<name>."""
+        settings = dict(adaptive_config)
+        settings.update(adaptive_config.get("checks", {}).get(check_name, {}))
+        return cls(
+            base_interval,
+            min_interval=settings.get("min_interval_sec"),
+            max_interval=settings.get("max_interval_sec"),
+            backoff=settings.get("backoff", DEFAULT_BACKOFF),
+            near_fraction=settings.get("near_fraction", DEFAULT_NEAR_FRACTION),
+            deep_fraction=settings.get("deep_fraction", DEFAULT_DEEP_FRACTION),
+            rising_horizon=settings.get("rising_horizon", DEFAULT_RISING_HORIZON),
+        )
+
+    def clamp(self, interval):
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def update(self, evaluations, statuses, now):
+        """
+        Choose the next interval from one run's evaluate() calls
+        [(metric, value, warn, crit), ...] and its result statuses, observed
+        at `now` (monotonic seconds). Returns the new interval.
+        """
+        statuses = list(statuses)
+        previous_statuses, self._previous_statuses = self._previous_statuses, statuses
+        elapsed = now - self._previous_time if self._previous_time is not None else None
+        self._previous_time = now
+
+        # Evaluations are matched to the previous run's by metric name and position.
+        values = {}
+        seen = {}
+        for metric_name, value, warn, crit in evaluations:
+            position = seen.get(metric_name, 0)
+            seen[metric_name] = position + 1
+            values[(metric_name, position)] = (value, warn, crit)
+        previous_values, self._previous_values = self._previous_values, values
+
+        if previous_statuses is not None and previous_statuses != statuses:
+            return self._set(self.min_interval, "status changed")
+        if any(STATUS_SEVERITY.get(status, 1) >= STATUS_SEVERITY["WARN"] for status in statuses):
+            return self._set(self.min_interval, "threshold exceeded")
+
+        all_deep = bool(values)
+        soonest = None
+        near = False
+        for key, (value, warn, crit) in values.items():
+            if warn is None:
+                warn = crit
+            if warn is None or warn <= 0:
+                all_deep = False
+                continue
+
+            headroom = (warn - value) / warn
+            previous = previous_values.get(key)
+            slope = (value - previous[0]) / elapsed if previous is not None and elapsed else 0.0
+
+            if slope > 0:
+                seconds_to_warn = (warn - value) / slope
+                soonest = seconds_to_warn if soonest is None else min(soonest, seconds_to_warn)
+                if seconds_to_warn < self.rising_horizon * self.max_interval:
+                    all_deep = False
+            if headroom < self.near_fraction:
+                near = True
+            if headroom <= self.deep_fraction:
+                all_deep = False
+
+        if soonest is not None and soonest < 2 * self.interval:
+            return self._set(soonest / 2, "trending toward threshold")
+        if near:
+            return self._set(self.interval / 2, "near threshold")
+        if all_deep:
+            return self._set(self.interval * self.backoff, "healthy")
+        return self._set(self.interval, "steady")
+
+    def _set(self, interval, reason):
+        self.interval = self.clamp(interval)
+        self.reason = reason
+        return self.interval
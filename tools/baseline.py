@@ -0,0 +1,442 @@
+"""
+Learned per-series baselines for anomaly detection.
+
+Static warn/crit thresholds cannot tell that a CPU which normally idles at 5%
+is unusual at 60%. For each watched series (the same component, metric,
+labels key as the history stores) this module keeps, in constant memory:
+
+  * an exponentially weighted mean and variance (EWMA), which tracks the
+    recent level and spread, and
+  * a KLL quantile sketch, which keeps the longer-run distribution within a
+    fixed number of retained samples.
+
+A value is anomalous once the series has `min_samples` observations, lies
+more than `z_threshold` EWMA standard deviations from the mean, and also
+falls outside the sketch's [lower, upper] quantile band. Requiring both keeps
+a noisy series from alerting on every spike while still catching level
+shifts. Anomalies raise the result's status (WARN by default) alongside the
+static thresholds and are listed in its "Anomalies" metric.
+
+Baselines are saved as compact JSON (sketch levels as base64 float arrays) so
+they survive restarts, and stores from several hosts can be merged into a
+fleet-wide baseline:
+
+    python -m tools.baseline merge fleet.json host-a.json host-b.json
+"""
+
+import argparse
+import base64
+import json
+import logging
+import math
+import os
+import random
+import threading
+from array import array
+from collections import OrderedDict
+
+from main.checks.result import Metric, Status
+from tools.history_store import flatten_result
+
+logger = logging.getLogger(__name__)
+
+script_directory = os.path.dirname(__file__)
+merlin_root_directory = os.path.dirname(script_directory)
+
+DEFAULT_STATE_PATH = os.path.join(merlin_root_directory, "baselines.json")
+DEFAULT_ALPHA = 0.05
+DEFAULT_Z_THRESHOLD = 4.0
+DEFAULT_MIN_SAMPLES = 30
+# A KLL sketch answers a quantile to within about 1.65 / k of its true rank
+# (99% confidence), ~0.8% at k=200. Band edges closer to 0 or 1 than that
+# are indistinguishable from the sketch's min and max, so the defaults stay
+# at 1% / 99%; tighter bands need a proportionally larger sketch_k.
+DEFAULT_QUANTILES = (0.01, 0.99)
+DEFAULT_SKETCH_K = 200
+DEFAULT_MAX_SERIES = 10000
+
+STATE_VERSION = 1
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang and Liberty, 2016). Level h holds
+    samples of weight 2**h; a full level is sorted and every other sample
+    (from a random offset) is promoted, so the sketch retains O(k) samples
+    however long the stream. Two sketches merge by concatenating levels.
+    """
+
+    __slots__ = ("k", "n", "levels", "_random", "_size", "_capacities", "_max_size")
+
+    _C = 2.0 / 3.0
+
+    def __init__(self, k: int = DEFAULT_SKETCH_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.levels = [array("d")]
+        self._random = random.Random(seed)
+        self._size = 0
+        self._update_capacities()
+
+    def _update_capacities(self):
+        # Lower levels get geometrically smaller buffers; the top level holds k.
+        height = len(self.levels)
+        self._capacities = [max(2, int(math.ceil(self.k * self._C ** (height - level - 1)))) for level in range(height)]
+        self._max_size = sum(self._capacities)
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.n += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for height, level in enumerate(self.levels):
+                if len(level) >= self._capacities[height]:
+                    if height + 1 == len(self.levels):
+                        self.levels.append(array("d"))
+                        self._update_capacities()
+                    ordered = sorted(level)
+                    # An odd sample out stays behind so the total weight is preserved.
+                    keep = array("d", ordered[-1:]) if len(ordered) % 2 else array("d")
+                    if keep:
+                        ordered.pop()
+                    promoted = ordered[self._random.getrandbits(1)::2]
+                    self.levels[height + 1].extend(promoted)
+                    self.levels[height] = keep
+                    self._size += len(keep) + len(promoted) - len(level)
+                    break
+            else:
+                return
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(array("d"))
+        self._update_capacities()
+        for height, level in enumerate(other.levels):
+            self.levels[height].extend(level)
+        self.n += other.n
+        self._size = sum(len(level) for level in self.levels)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        samples = [(value, 1 << height) for height, level in enumerate(self.levels) for value in level]
+        samples.sort()
+        return samples
+
+    def quantile(self, q):
+        """The value at rank q * n (0 <= q <= 1), or None if the sketch is empty."""
+        samples = self._weighted()
+        if not samples:
+            return None
+        total = sum(weight for _, weight in samples)
+        target = q * total
+        cumulative = 0
+        for value, weight in samples:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return samples[-1][0]
+
+    def quantiles(self, qs):
+        """Several quantiles from a single pass over the retained samples."""
+        samples = self._weighted()
+        if not samples:
+            return [None] * len(qs)
+        total = sum(weight for _, weight in samples)
+        results = []
+        for q in qs:
+            target = q * total
+            cumulative = 0
+            for value, weight in samples:
+                cumulative += weight
+                if cumulative >= target:
+                    results.append(value)
+                    break
+            else:
+                results.append(samples[-1][0])
+        return results
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "n": self.n,
+            "levels": [base64.b64encode(level.tobytes()).decode("ascii") for level in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(int(data.get("k", DEFAULT_SKETCH_K)))
+        sketch.n = int(data.get("n", 0))
+        sketch.levels = []
+        for encoded in data.get("levels") or [""]:
+            level = array("d")
+            level.frombytes(base64.b64decode(encoded))
+            sketch.levels.append(level)
+        sketch._size = sum(len(level) for level in sketch.levels)
+        sketch._update_capacities()
+        return sketch
+
+
+class EWMA:
+    """Exponentially weighted mean and variance (West's incremental form)."""
+
+    __slots__ = ("alpha", "count", "mean", "variance")
+
+    def __init__(self, alpha: float = DEFAULT_ALPHA, count: int = 0, mean: float = 0.0, variance: float = 0.0):
+        self.alpha = alpha
+        self.count = count
+        self.mean = mean
+        self.variance = variance
+
+    def update(self, value):
+        if self.count == 0:
+            self.mean = value
+        else:
+            difference = value - self.mean
+            increment = self.alpha * difference
+            self.mean += increment
+            self.variance = (1.0 - self.alpha) * (self.variance + difference * increment)
+        self.count += 1
+
+    def merge(self, other):
+        """Pool two baselines, weighting each by its sample count (capped at the EWMA's memory)."""
+        memory = 2.0 / self.alpha
+        weight = min(self.count, memory)
+        other_weight = min(other.count, memory)
+        total = weight + other_weight
+        if total == 0:
+            return self
+        mean = (weight * self.mean + other_weight * other.mean) / total
+        self.variance = (
+            weight * (self.variance + (self.mean - mean) ** 2)
+            + other_weight * (other.variance + (other.mean - mean) ** 2)
+        ) / total
+        self.mean = mean
+        self.count += other.count
+        return self
+
+
+class SeriesBaseline:
+
+    __slots__ = ("ewma", "sketch")
+
+    def __init__(self, alpha=DEFAULT_ALPHA, sketch_k=DEFAULT_SKETCH_K):
+        self.ewma = EWMA(alpha)
+        self.sketch = KLLSketch(sketch_k)
+
+    def to_dict(self):
+        return {
+            "ewma": [self.ewma.count, self.ewma.mean, self.ewma.variance],
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data, alpha=DEFAULT_ALPHA):
+        baseline = cls.__new__(cls)
+        count, mean, variance = data["ewma"]
+        baseline.ewma = EWMA(alpha, int(count), float(mean), float(variance))
+        baseline.sketch = KLLSketch.from_dict(data["sketch"])
+        return baseline
+
+
+class BaselineStore:
+
+    def __init__(
+        self,
+        metrics: dict = None,
+        alpha: float = DEFAULT_ALPHA,
+        z_threshold: float = DEFAULT_Z_THRESHOLD,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+        quantiles=DEFAULT_QUANTILES,
+        sketch_k: int = DEFAULT_SKETCH_K,
+        max_series: int = DEFAULT_MAX_SERIES,
+        min_deviation: float = 0.0,
+        status: str = "WARN",
+    ):
+        # {"cpu": ["Usage Percent"], ...}: only these series are baselined.
+        self.metrics = {name: frozenset(names) for name, names in (metrics or {}).items()}
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.quantiles = tuple(quantiles)
+        self.sketch_k = sketch_k
+        if min(self.quantiles[0], 1.0 - self.quantiles[1]) < 1.65 / sketch_k:
+            logger.warning(f"Anomaly quantiles {self.quantiles} are finer than sketch_k={sketch_k} can resolve "
+                           f"(~{1.65 / sketch_k:.2%} rank error); raise sketch_k or widen the band")
+        self.max_series = max_series
+        # Deviations smaller than this (in the metric's unit) are never anomalous,
+        # so a perfectly flat series does not alert on its first wobble.
+        self.min_deviation = min_deviation
+        self.status = Status.coerce(status)
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, anomaly_config):
+        return cls(
+            metrics=anomaly_config.get("metrics"),
+            alpha=float(anomaly_config.get("alpha", DEFAULT_ALPHA)),
+            z_threshold=float(anomaly_config.get("z_threshold", DEFAULT_Z_THRESHOLD)),
+            min_samples=int(anomaly_config.get("min_samples", DEFAULT_MIN_SAMPLES)),
+            quantiles=anomaly_config.get("quantiles", DEFAULT_QUANTILES),
+            sketch_k=int(anomaly_config.get("sketch_k", DEFAULT_SKETCH_K)),
+            max_series=int(anomaly_config.get("max_series", DEFAULT_MAX_SERIES)),
+            min_deviation=float(anomaly_config.get("min_deviation", 0.0)),
+            status=anomaly_config.get("status", "WARN"),
+        )
+
+    def __len__(self):
+        return len(self._series)
+
+    def watches(self, check_name):
+        return check_name in self.metrics
+
+    def _baseline_for(self, key):
+        baseline = self._series.get(key)
+        if baseline is None:
+            baseline = self._series[key] = SeriesBaseline(self.alpha, self.sketch_k)
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+        return baseline
+
+    def _is_anomalous(self, baseline, value):
+        ewma = baseline.ewma
+        if ewma.count < self.min_samples:
+            return False
+        deviation = abs(value - ewma.mean)
+        if deviation <= self.min_deviation or deviation < self.z_threshold * math.sqrt(ewma.variance):
+            return False
+        lower, upper = baseline.sketch.quantiles(self.quantiles)
+        return value < lower or value > upper
+
+    def observe(self, check_name, results):
+        """
+        Score every watched metric of `results` against its baseline, then
+        fold the value in. Results with anomalies get their status raised to
+        `status` and an "Anomalies" metric naming the deviating metrics.
+        Returns the number of anomalies found.
+        """
+        watched = self.metrics.get(check_name)
+        if not watched:
+            return 0
+
+        found = 0
+        with self._lock:
+            for result in results:
+                anomalies = []
+                for component, metric, labels, value in flatten_result(result):
+                    if metric not in watched or math.isnan(value):
+                        continue
+                    baseline = self._baseline_for((component, metric, labels))
+                    if self._is_anomalous(baseline, value):
+                        anomalies.append(metric)
+                    baseline.ewma.update(value)
+                    baseline.sketch.update(value)
+
+                if anomalies:
+                    found += len(anomalies)
+                    if self.status.severity > result.status.severity:
+                        result.status = self.status
+                    result.metrics = result.metrics + (Metric("Anomalies", tuple(anomalies)),)
+        return found
+
+    def to_dict(self):
+        with self._lock:
+            series = [
+                {"component": component, "metric": metric, "labels": labels, **baseline.to_dict()}
+                for (component, metric, labels), baseline in self._series.items()
+            ]
+        return {"version": STATE_VERSION, "series": series}
+
+    def load_dict(self, data, merge=False):
+        """Replace (or, with merge=True, merge into) the stored baselines. Returns the series count read."""
+        if data.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported baseline state version: {data.get('version')}")
+        with self._lock:
+            if not merge:
+                self._series.clear()
+            for entry in data.get("series", []):
+                key = (entry["component"], entry["metric"], entry["labels"])
+                loaded = SeriesBaseline.from_dict(entry, self.alpha)
+                existing = self._series.get(key) if merge else None
+                if existing is not None:
+                    existing.ewma.merge(loaded.ewma)
+                    existing.sketch.merge(loaded.sketch)
+                else:
+                    self._series[key] = loaded
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+            return len(data.get("series", []))
+
+    def save(self, path):
+        """Write the baselines to `path` atomically."""
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(self.to_dict(), file, separators=(",", ":"))
+        os.replace(temporary_path, path)
+
+    def load(self, path, merge=False):
+        with open(path, "r", encoding="utf-8") as file:
+            return self.load_dict(json.load(file), merge)
+
+
+# Shared by every Check (see Check.collect); watches nothing until configured.
+baseline_store = BaselineStore()
+
+
+def configure_baselines(anomaly_config=None, state_path=None):
+    """
+    Apply the "anomaly" config section to the shared store in place, keeping
+    the learned baselines, and load saved state from `state_path` when the
+    store is still empty. Returns the store.
+    """
+    anomaly_config = anomaly_config or {}
+    configured = BaselineStore.from_config(anomaly_config) if anomaly_config.get("enabled") else BaselineStore()
+    with baseline_store._lock:
+        for name, value in vars(configured).items():
+            if name not in ("_series", "_lock"):
+                setattr(baseline_store, name, value)
+
+    if state_path and not len(baseline_store) and os.path.exists(state_path):
+        try:
+            count = baseline_store.load(state_path)
+            logger.info(f"Loaded {count} series baselines from {state_path}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Failed to load baselines from {state_path}: {e}")
+    return baseline_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or merge saved series baselines.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    merge = subcommands.add_parser("merge", help="Merge baseline files (e.g. from several hosts) into one")
+    merge.add_argument("output")
+    merge.add_argument("inputs", nargs="+")
+    show = subcommands.add_parser("show", help="Print each series' baseline")
+    show.add_argument("path")
+    args = parser.parse_args(argv)
+
+    store = BaselineStore(max_series=10 ** 9)
+    if args.command == "merge":
+        for path in args.inputs:
+            store.load(path, merge=True)
+        store.save(args.output)
+        print(f"Merged {len(args.inputs)} files into {len(store)} series in {args.output}")
+        return
+
+    store.load(args.path)
+    for (component, metric, labels), baseline in store._series.items():
+        p50, p99 = baseline.sketch.quantiles((0.5, 0.99))
+        print(
+            f"{component} {metric} {labels}: n={baseline.sketch.n} mean={baseline.ewma.mean:.3f} "
+            f"stddev={math.sqrt(baseline.ewma.variance):.3f} p50={p50} p99={p99}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Change-only emission of check results.
+
+In "delta" mode each result is compared with the last one emitted for the
+same series (record section, check name and label metrics such as Mount
+Point or Interface):
+
+  * a status transition emits the full result;
+  * otherwise only the metrics that moved beyond the deadband since they were
+    last emitted are written, together with the labels, as a result marked
+    "emission": "delta";
+  * a result with nothing new is dropped;
+  * every `heartbeat_seconds` each series is written in full, marked
+    "emission": "heartbeat", so a consumer can rebuild the current state
+    from the latest heartbeat plus the deltas after it.
+
+A metric counts as changed when it differs from its last emitted value by
+more than `absolute` and by more than `relative` times that value; the
+comparison is always against the last emitted value, so slow drift is still
+reported once it adds up. Non-numeric metrics are emitted whenever they
+differ.
+
+The results file and the reporter pipeline (main.reporters.pipeline) each
+keep their own emitter. The fleet pusher always sends full cycles: the
+collector scores a host's latest cycle as its whole state.
+"""
+
+import threading
+import time
+
+from main.checks.result import as_result
+from tools.history_store import LABEL_KEYS
+
+MODE_FULL = "full"
+MODE_DELTA = "delta"
+
+DEFAULT_HEARTBEAT_SECONDS = 600.0
+
+
+class _SeriesState:
+
+    __slots__ = ("status", "values", "heartbeat_at", "seen_at")
+
+    def __init__(self, status, values, now):
+        self.status = status
+        self.values = values
+        self.heartbeat_at = now
+        self.seen_at = now
+
+
+class EmittedResult:
+    """
+    A heartbeat or delta for the results file. Like a CheckResult it is only
+    turned into a dict when the store encodes it, by which time the run's
+    wall time has been filled in.
+    """
+
+    __slots__ = ("result", "emission", "names")
+
+    def __init__(self, result, emission, names=None):
+        self.result = result
+        self.emission = emission
+        self.names = names
+
+    def to_dict(self):
+        record = self.result.to_dict()
+        if self.names is not None:
+            names = set(self.names)
+            metrics = {}
+            for metric in self.result.metrics:
+                if metric.name in names:
+                    parent, dot, child = metric.name.partition(".")
+                    if dot:
+                        metrics.setdefault(parent, {})[child] = metric.value
+                    else:
+                        metrics[metric.name] = list(metric.value) if isinstance(metric.value, tuple) else metric.value
+            record["metrics"] = metrics
+            # Details describe the whole result and are repeated by heartbeats.
+            record.pop("details", None)
+        record["emission"] = self.emission
+        return record
+
+
+class DeltaEmitter:
+
+    def __init__(
+        self,
+        absolute_deadband: float = 0.0,
+        relative_deadband: float = 0.0,
+        heartbeat_seconds: float = DEFAULT_HEARTBEAT_SECONDS,
+        deadbands: dict = None,
+    ):
+        self.absolute_deadband = absolute_deadband
+        self.relative_deadband = relative_deadband
+        self.heartbeat_seconds = heartbeat_seconds
+        # Per-metric overrides: {"Percentage Used": {"absolute": 1.0, "relative": 0.0}}
+        self.deadbands = deadbands or {}
+        self.emitted = 0
+        self.suppressed = 0
+        self._series = {}
+        self._pruned_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, emission_config):
+        return cls(
+            absolute_deadband=float(emission_config.get("absolute_deadband", 0.0)),
+            relative_deadband=float(emission_config.get("relative_deadband", 0.0)),
+            heartbeat_seconds=float(emission_config.get("heartbeat_sec", DEFAULT_HEARTBEAT_SECONDS)),
+            deadbands=emission_config.get("deadbands"),
+        )
+
+    def _changed(self, name, previous, value):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not isinstance(previous, (int, float)):
+            return value != previous
+        deadband = self.deadbands.get(name, {})
+        absolute = deadband.get("absolute", self.absolute_deadband)
+        relative = deadband.get("relative", self.relative_deadband)
+        difference = abs(value - previous)
+        return difference > absolute and difference > relative * abs(previous)
+
+    def _prune(self, now):
+        # Forget series that stopped reporting (e.g. an unmounted partition).
+        expiry = now - 2 * self.heartbeat_seconds
+        for key in [key for key, state in self._series.items() if state.seen_at < expiry]:
+            del self._series[key]
+        self._pruned_at = now
+
+    def filter(self, section, result, now=None):
+        """
+        Return what to write for `result` under `section` (e.g. "Disk
+        Information"): the result itself, an EmittedResult heartbeat or
+        delta, or None when nothing changed.
+        """
+        now = now if now is not None else time.monotonic()
+        result = as_result(result)
+        values = {metric.name: metric.value for metric in result.metrics}
+        labels = tuple((name, values[name]) for name in LABEL_KEYS if isinstance(values.get(name), str))
+        key = (section, result.name, labels)
+
+        with self._lock:
+            if self._pruned_at is None or now - self._pruned_at >= self.heartbeat_seconds:
+                self._prune(now)
+
+            state = self._series.get(key)
+            if state is None or state.status != result.status:
+                self._series[key] = _SeriesState(result.status, values, now)
+                self.emitted += 1
+                return result
+
+            state.seen_at = now
+            if now - state.heartbeat_at >= self.heartbeat_seconds:
+                state.values = values
+                state.heartbeat_at = now
+                self.emitted += 1
+                return EmittedResult(result, "heartbeat")
+
+            changed = [
+                name for name, value in values.items()
+                if name not in state.values or self._changed(name, state.values[name], value)
+            ]
+            if not changed:
+                self.suppressed += 1
+                return None
+            for name in changed:
+                state.values[name] = values[name]
+            self.emitted += 1
+
+        return EmittedResult(result, "delta", [name for name, _ in labels] + changed)
+
+    def filter_record(self, record, now=None):
+        """
+        Apply `filter` to a `{section: result}` record as passed to
+        write_to_check_results. Records of any other shape pass through.
+        Returns the record to write, or None.
+        """
+        if not isinstance(record, dict) or len(record) != 1:
+            return record
+        section, result = next(iter(record.items()))
+        if not hasattr(result, "metrics_dict") and not (isinstance(result, dict) and "status" in result):
+            return record
+        emitted = self.filter(section, result, now)
+        return {section: emitted} if emitted is not None else None
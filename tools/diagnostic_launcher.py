@@ -0,0 +1,435 @@
+"""
+Resident diagnostic daemon.
+
+Runs each enabled check on its own interval from a single long-lived process,
+instead of starting a new interpreter per cycle from cron. Scheduling uses the
+monotonic clock, and every run time is computed from the job's start offset
+plus whole intervals, so slow runs do not accumulate drift. A run that would
+overlap the previous run of the same check is skipped rather than stacked.
+
+With the "adaptive" config section enabled, each check's interval moves
+between a floor and a ceiling after every run (see tools.adaptive_scheduler):
+it drops toward the floor as metrics approach their thresholds and backs off
+while they stay healthy. The interval in use is published per check as the
+"scheduler" component's Interval Seconds metric.
+
+SIGTERM/SIGINT stop the daemon after in-flight checks finish (bounded by
+scheduler.grace_period_sec). SIGHUP reloads the config file and reschedules.
+
+    python -m tools.diagnostic_launcher --config outdated/config.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+script_directory = os.path.dirname(__file__)
+merlin_root_directory = os.path.dirname(script_directory)
+
+DEFAULT_CONFIG_PATH = os.path.join(merlin_root_directory, "outdated", "config.json")
+DEFAULT_SCAN_INTERVAL = 600.0
+DEFAULT_MAX_JITTER = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+def load_config(path=DEFAULT_CONFIG_PATH):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+class ScheduledJob:
+    """One check on a fixed interval. Run times are offset + n * interval."""
+
+    def __init__(self, check, interval, offset, now):
+        self.check = check
+        self.interval = interval
+        self.next_run = now + offset
+        self.future = None
+        self.runs = 0
+        self.skipped = 0
+        self.adaptive = None
+
+    def advance(self, now):
+        """Move to the next slot after `now`, dropping any slots that were missed."""
+        missed = math.floor((now - self.next_run) / self.interval) + 1
+        self.next_run += max(missed, 1) * self.interval
+        return max(missed - 1, 0)
+
+
+class DiagnosticDaemon:
+
+    def __init__(self, config_path=DEFAULT_CONFIG_PATH, config=None):
+        self.config_path = config_path
+        self.config = config if config is not None else load_config(config_path)
+        self.jobs = []
+        # Signal handlers only set flags and wake the scheduler loop.
+        self._wake = threading.Event()
+        self._stopping = False
+        self._reload = threading.Event()
+        self._executor = None
+        # Checks run on a pool of their own, one worker per enabled check.
+        self._check_executor = None
+        self._check_workers = None
+        self.history = None
+        self.exporter = None
+        self.fleet_pusher = None
+        self._baseline_path = None
+        self._baseline_save_interval = 300.0
+        # Latest results per check, rendered together for the metrics endpoint.
+        self._latest_results = {}
+        self._latest_lock = threading.Lock()
+
+    def _check_config(self):
+        from main.checks.run_all_checks import check_config
+
+        merged = dict(check_config)
+        for key in ("thresholds", "executor", "disk", "network", "gpu", "cgroup", "process_scan"):
+            if key in self.config:
+                merged[key] = self.config[key]
+        return merged
+
+    def _build_jobs(self, previous_jobs=()):
+        from main.checks.run_all_checks import build_checks
+        from tools.adaptive_scheduler import AdaptiveInterval
+
+        scan_interval = float(self.config.get("scan_interval", DEFAULT_SCAN_INTERVAL))
+        intervals = {name.lower(): float(value) for name, value in self.config.get("check_intervals", {}).items()}
+        max_jitter = float(self.config.get("scheduler", {}).get("max_jitter_sec", DEFAULT_MAX_JITTER))
+        adaptive_config = self.config.get("adaptive", {})
+
+        # Seed from the hostname so each host keeps the same offset across restarts
+        # while a fleet started at the same moment still spreads out.
+        jitter = random.Random(socket.gethostname())
+        previous = {job.check.name: job for job in previous_jobs}
+        now = time.monotonic()
+
+        jobs = []
+        for check in build_checks(self._check_config(), self.config.get("components_enabled")):
+            interval = intervals.get(check.name, scan_interval)
+            job = ScheduledJob(check, interval, jitter.uniform(0, min(interval, max_jitter)), now)
+            if adaptive_config.get("enabled"):
+                job.adaptive = AdaptiveInterval.from_config(interval, adaptive_config, check.name)
+            old = previous.get(check.name)
+            if old is not None:
+                if job.adaptive is not None and old.adaptive is not None:
+                    # Carry the adapted interval over rather than starting again from the base.
+                    job.interval = job.adaptive.interval = job.adaptive.clamp(old.adaptive.interval)
+                # Keep the running phase so a reload does not trigger a burst of runs.
+                job.next_run = old.next_run if old.interval == job.interval else min(old.next_run, now + job.interval)
+                job.future, job.runs, job.skipped = old.future, old.runs, old.skipped
+            jobs.append(job)
+            logger.info(f"Scheduled {check.name} check every {interval}s")
+        return jobs
+
+    def _adapt_interval(self, job, results, started):
+        """Pick the job's next interval from this run and reschedule it from the run's start."""
+        from main.checks.result import CheckResult, Metric, UNIT_SECONDS
+
+        if job.adaptive is None:
+            return None
+
+        previous_interval = job.interval
+        interval = job.adaptive.update(job.check.last_evaluations, [result.status for result in results], started)
+        if interval != previous_interval:
+            logger.info(f"{job.check.name} check interval {previous_interval:g}s -> {interval:g}s ({job.adaptive.reason})")
+            job.interval = interval
+            job.next_run = started + interval
+            # The scheduler may be sleeping toward the old slot.
+            self._wake.set()
+
+        return CheckResult(
+            "scheduler", "OK",
+            [Metric("Check", job.check.name), Metric("Interval Seconds", interval, UNIT_SECONDS)],
+            "{} check sampled every {:g}s ({}).", (job.check.name, interval, job.adaptive.reason),
+        )
+
+    def _run_job(self, job, snapshot=None):
+        from main.checks.run_all_checks import run_checks_concurrently
+        from main.reporters.pipeline import publish_results
+        from tools.metric_history import metric_history
+        from tools.write_to_json_file import flush_check_results
+
+        try:
+            started = time.monotonic()
+            results = run_checks_concurrently([job.check], job.check.config, snapshot, self._check_executor)
+            for result in results:
+                if result.get("status") not in ("OK", None):
+                    logger.warning(f"{result.get('name')} check reported {result.get('status')}: {result.get('details')}")
+
+            interval_result = self._adapt_interval(job, results, started)
+            if interval_result is not None:
+                metric_history.record([interval_result])
+                results = results + [interval_result]
+
+            if self.history is not None:
+                self.history.record_cycle(results)
+                self.history.prune()
+
+            # Always full: the collector scores each host's latest cycle as its whole state.
+            if self.fleet_pusher is not None:
+                self.fleet_pusher.submit(results)
+
+            publish_results(results)
+
+            if self.exporter is not None:
+                with self._latest_lock:
+                    self._latest_results[job.check.name] = results
+                    latest = [result for check_results in self._latest_results.values() for result in check_results]
+                    self.exporter.update(latest)
+        finally:
+            flush_check_results()
+
+    def _size_check_pool(self):
+        """Give every enabled check a worker, so checks due together run side by side."""
+        max_workers = self._check_config().get("executor", {}).get("max_workers") or max(len(self.jobs), 1)
+        if max_workers == self._check_workers:
+            return
+        # A check still running on the old pool keeps its worker there until it returns.
+        if self._check_executor is not None:
+            self._check_executor.shutdown(wait=False)
+        self._check_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="merlin-check")
+        self._check_workers = max_workers
+
+    def _dispatch_due(self, now):
+        from main.checks.snapshot import next_snapshot
+
+        # Checks due in the same pass share one snapshot, so a source they
+        # both need is read once.
+        snapshot = None
+        for job in self.jobs:
+            if job.next_run > now:
+                continue
+            if job.future is not None and not job.future.done():
+                job.skipped += 1
+                logger.warning(f"Skipping {job.check.name} check: the previous run is still in progress")
+            else:
+                snapshot = snapshot or next_snapshot()
+                job.future = self._executor.submit(self._run_job, job, snapshot)
+                job.runs += 1
+            missed = job.advance(now)
+            if missed:
+                job.skipped += missed
+                logger.warning(f"{job.check.name} check missed {missed} scheduled runs")
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def request_reload(self):
+        self._reload.set()
+        self._wake.set()
+
+    def _apply_reload(self):
+        self._reload.clear()
+        try:
+            self.config = load_config(self.config_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to reload config from {self.config_path}; keeping the current schedule: {e}")
+            return
+        self.jobs = self._build_jobs(self.jobs)
+        self._size_check_pool()
+        self._configure_baselines()
+        self._configure_emission()
+        self._configure_reporters()
+        logger.info(f"Reloaded config from {self.config_path}")
+
+    def _open_history(self):
+        from tools.history_store import HistoryStore
+        from tools.metric_history import configure_metric_history
+
+        memory_config = self.config.get("history", {})
+        configure_metric_history(
+            memory_config.get("samples_per_series"),
+            int(memory_config["max_memory_mb"] * 1024 * 1024) if "max_memory_mb" in memory_config else None,
+        )
+
+        database_config = self.config.get("database", {})
+        if database_config.get("enabled") and self.history is None:
+            try:
+                self.history = HistoryStore.from_config(database_config)
+            except Exception as e:
+                logger.error(f"Failed to open history database {database_config.get('path')}: {e}")
+
+    def _configure_baselines(self):
+        from tools.baseline import DEFAULT_STATE_PATH, configure_baselines
+
+        anomaly_config = self.config.get("anomaly", {})
+        self._baseline_path = anomaly_config.get("state_path", DEFAULT_STATE_PATH)
+        self._baseline_save_interval = float(anomaly_config.get("save_interval_sec", 300))
+        configure_baselines(anomaly_config, self._baseline_path if anomaly_config.get("enabled") else None)
+
+    def _save_baselines(self):
+        from tools.baseline import baseline_store
+
+        if self._baseline_path is None or not self.config.get("anomaly", {}).get("enabled") or not len(baseline_store):
+            return
+        try:
+            baseline_store.save(self._baseline_path)
+        except OSError as e:
+            logger.error(f"Failed to save baselines to {self._baseline_path}: {e}")
+
+    def _configure_emission(self):
+        from tools.write_to_json_file import configure_result_emission
+
+        emitter = configure_result_emission(self.config.get("emission"))
+        if emitter is not None:
+            logger.info(f"Writing changed results only, with a full heartbeat every {emitter.heartbeat_seconds:g}s")
+
+    def _start_exporter(self):
+        from tools.metrics_exporter import DEFAULT_MAX_SERIES_PER_FAMILY, MetricsExporter
+
+        exporter_config = self.config.get("exporter", {})
+        if exporter_config.get("enabled") and self.exporter is None:
+            try:
+                self.exporter = MetricsExporter(
+                    host=exporter_config.get("host", "0.0.0.0"),
+                    port=int(exporter_config.get("port", 9464)),
+                    max_series_per_family=int(exporter_config.get("max_series_per_family", DEFAULT_MAX_SERIES_PER_FAMILY)),
+                ).start()
+            except OSError as e:
+                self.exporter = None
+                logger.error(f"Failed to start the metrics endpoint: {e}")
+
+    def _configure_reporters(self):
+        from main.reporters.pipeline import configure_reporters
+
+        pipeline = configure_reporters(self.config.get("reporters"), emission_config=self.config.get("emission"))
+        if pipeline is not None and pipeline.workers:
+            logger.info(f"Reporting to {len(pipeline.workers)} sinks: {', '.join(worker.name for worker in pipeline.workers)}")
+
+    def _start_fleet_pusher(self):
+        from tools.fleet_collector import FleetPusher
+
+        fleet_config = self.config.get("fleet", {})
+        if fleet_config.get("enabled") and self.fleet_pusher is None:
+            self.fleet_pusher = FleetPusher.from_config(fleet_config).start()
+
+    def run_forever(self):
+        max_workers = int(self.config.get("scheduler", {}).get("max_concurrent_diagnostics", 3))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="merlin-job")
+        self._open_history()
+        self._configure_baselines()
+        self._configure_emission()
+        self._start_exporter()
+        self._start_fleet_pusher()
+        self._configure_reporters()
+        self.jobs = self._build_jobs()
+        self._size_check_pool()
+        logger.info(f"Diagnostic daemon started with {len(self.jobs)} checks (pid {os.getpid()})")
+
+        baselines_saved_at = time.monotonic()
+        try:
+            while True:
+                now = time.monotonic()
+                self._dispatch_due(now)
+
+                if now - baselines_saved_at >= self._baseline_save_interval:
+                    baselines_saved_at = now
+                    self._executor.submit(self._save_baselines)
+
+                next_run = min((job.next_run for job in self.jobs), default=now + DEFAULT_SCAN_INTERVAL)
+                self._wake.wait(max(0.0, next_run - time.monotonic()))
+                self._wake.clear()
+
+                if self._stopping:
+                    break
+                if self._reload.is_set():
+                    self._apply_reload()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        from main.reporters.pipeline import close_reporters
+        from tools.write_to_json_file import flush_check_results
+
+        grace_period = float(self.config.get("scheduler", {}).get("grace_period_sec", 15))
+        logger.info(f"Diagnostic daemon stopping; waiting up to {grace_period}s for running checks")
+
+        deadline = time.monotonic() + grace_period
+        for job in self.jobs:
+            if job.future is not None:
+                try:
+                    job.future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except Exception:
+                    logger.warning(f"{job.check.name} check did not finish before shutdown")
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        if self._check_executor is not None:
+            self._check_executor.shutdown(wait=False)
+        flush_check_results()
+        self._save_baselines()
+        if self.history is not None:
+            self.history.close()
+        if self.exporter is not None:
+            self.exporter.stop()
+        if self.fleet_pusher is not None:
+            self.fleet_pusher.stop()
+        close_reporters()
+        logger.info("Diagnostic daemon stopped")
+
+
+def configure_logging(config):
+    from main.logging_setup import configure_daily_logging
+
+    logging_config = config.get("logging", {})
+    level = getattr(logging, str(logging_config.get("log_level", "INFO")).upper(), logging.INFO)
+    configure_daily_logging(
+        log_directory=logging_config.get("log_directory", "logs"),
+        level=level,
+        max_log_size_mb=logging_config.get("max_log_size_mb", 5),
+        log_retention_days=logging_config.get("log_retention_days", 30),
+        rotate_logs=logging_config.get("rotate_logs", True),
+        json_lines=logging_config.get("log_format") == "json",
+        prune_logs=True,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Merlin checks as a resident daemon.")
+    parser.add_argument("--config", default=DEFAULT_CONFIG_PATH, help="Path to the JSON config file")
+    parser.add_argument("--once", action="store_true", help="Run every enabled check once and exit")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    # Configure logging before the check modules are imported; they configure
+    # it with defaults on import if nothing has yet.
+    configure_logging(config)
+
+    daemon = DiagnosticDaemon(args.config, config)
+    if args.once:
+        from main.checks.run_all_checks import build_checks, run_checks_concurrently
+        from main.reporters.pipeline import close_reporters, configure_reporters, publish_results
+        from tools.write_to_json_file import flush_check_results
+
+        check_config = daemon._check_config()
+        configure_reporters(config.get("reporters"))
+        results = run_checks_concurrently(build_checks(check_config, config.get("components_enabled")), check_config)
+        for result in results:
+            print(result)
+        flush_check_results()
+        # Anything a sink cannot take before exit is spilled and replayed by the next run.
+        publish_results(results)
+        close_reporters()
+        return
+
+    daemon.install_signal_handlers()
+    daemon.run_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,686 @@
+"""
+Fleet collector: central ingest of check results pushed by many agents.
+
+Agents keep one TCP connection open to the collector and push batches of
+cycles (a cycle is one timestamp plus the result dicts of that run) as
+length-prefixed frames:
+
+    header  !BBIQ  frame type, flags, payload length, sequence number
+    payload JSON, zlib-compressed when flags has FLAG_ZLIB
+
+An agent opens with a HELLO frame naming its host, then sends BATCH frames.
+The collector answers each batch with an ACK (or a NACK for a batch it
+cannot decode) carrying the batch's sequence number. Agents keep at most
+`window` batches unacknowledged and resend unacknowledged batches after a
+reconnect, so delivery is at least once.
+
+Backpressure is end to end: decoded batches go into a bounded queue, and a
+connection whose batch does not fit stops reading (and acknowledging) until
+the ingest worker catches up. The agent's window then fills, and the agent
+buffers or drops locally instead of the collector growing without bound.
+
+The ingest worker folds batches into the history store (with a Host label)
+and the severity engine in a worker thread, and keeps a live fleet-state
+table in memory: per host the latest results, last-seen time, status and
+health.
+
+    python -m tools.fleet_collector serve --port 9465
+    python -m tools.fleet_collector bench --agents 2000 --batches 20 --interval 1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+script_directory = os.path.dirname(__file__)
+merlin_root_directory = os.path.dirname(script_directory)
+
+DEFAULT_PORT = 9465
+DEFAULT_WINDOW = 8
+DEFAULT_QUEUE_SIZE = 1024
+DEFAULT_MAX_FRAME_BYTES = 16 * 1024 * 1024
+DEFAULT_INGEST_BATCH = 256
+
+FRAME_HELLO = 1
+FRAME_BATCH = 2
+FRAME_ACK = 3
+FRAME_NACK = 4
+
+FLAG_ZLIB = 1
+
+PROTOCOL_VERSION = 1
+
+_HEADER = struct.Struct("!BBIQ")
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(frame_type, sequence=0, payload=None, compress_level=1):
+    """One frame; `payload` is JSON-encoded and, for non-empty payloads, zlib-compressed."""
+    body = b""
+    flags = 0
+    if payload is not None:
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        if compress_level:
+            body = zlib.compress(body, compress_level)
+            flags |= FLAG_ZLIB
+    return _HEADER.pack(frame_type, flags, len(body), sequence) + body
+
+
+def decode_payload(flags, body, max_bytes=DEFAULT_MAX_FRAME_BYTES):
+    """The JSON payload of a frame. A compressed payload may not inflate past `max_bytes`."""
+    if not body:
+        return None
+    if flags & FLAG_ZLIB:
+        decompressor = zlib.decompressobj()
+        body = decompressor.decompress(body, max_bytes)
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"Payload decompresses to more than {max_bytes} bytes")
+    return json.loads(body)
+
+
+def parse_cycles(payload):
+    """[(timestamp, [result dicts]), ...] from a decoded BATCH payload; ValueError if it is malformed."""
+    if payload is None:
+        return []
+    if not isinstance(payload, list):
+        raise ValueError("Batch payload is not a list of cycles")
+    cycles = []
+    for cycle in payload:
+        try:
+            timestamp, results = cycle
+        except (TypeError, ValueError):
+            raise ValueError(f"Malformed cycle {cycle!r:.80}") from None
+        if not isinstance(timestamp, (int, float)) or not isinstance(results, list) \
+                or not all(isinstance(result, dict) for result in results):
+            raise ValueError(f"Malformed cycle {cycle!r:.80}")
+        cycles.append((timestamp, results))
+    return cycles
+
+
+async def read_frame(reader, max_frame_bytes=DEFAULT_MAX_FRAME_BYTES):
+    """(frame type, flags, sequence, raw payload) of the next frame."""
+    header = await reader.readexactly(_HEADER.size)
+    frame_type, flags, length, sequence = _HEADER.unpack(header)
+    if length > max_frame_bytes:
+        raise ProtocolError(f"Frame of {length} bytes exceeds the {max_frame_bytes} byte limit")
+    body = await reader.readexactly(length) if length else b""
+    return frame_type, flags, sequence, body
+
+
+def _with_host_label(result, host):
+    # The history store keys series by the Host label, so each agent's series stay apart.
+    metrics = dict(result.get("metrics") or {})
+    metrics["Host"] = host
+    labelled = dict(result)
+    labelled["metrics"] = metrics
+    return labelled
+
+
+class HostState:
+
+    __slots__ = ("host", "address", "connections", "last_seen", "last_cycle", "results", "status", "health", "batches", "cycles")
+
+    def __init__(self, host):
+        self.host = host
+        self.address = None
+        # An agent can briefly hold two connections (a reconnect racing the old one's close).
+        self.connections = 0
+        self.last_seen = None
+        self.last_cycle = None
+        self.results = []
+        self.status = None
+        self.health = None
+        self.batches = 0
+        self.cycles = 0
+
+    @property
+    def connected(self):
+        return self.connections > 0
+
+    def to_dict(self):
+        return {
+            "host": self.host,
+            "address": self.address,
+            "connected": self.connected,
+            "last_seen": self.last_seen,
+            "last_cycle": self.last_cycle,
+            "status": self.status,
+            "health": self.health,
+            "batches": self.batches,
+            "cycles": self.cycles,
+            "results": self.results,
+        }
+
+
+class FleetCollector:
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = DEFAULT_PORT,
+        history=None,
+        severity_engine=None,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        ingest_batch: int = DEFAULT_INGEST_BATCH,
+        max_frame_bytes: int = DEFAULT_MAX_FRAME_BYTES,
+    ):
+        self.host = host
+        self.port = port
+        self.history = history
+        self.severity_engine = severity_engine
+        self.queue_size = queue_size
+        self.ingest_batch = ingest_batch
+        self.max_frame_bytes = max_frame_bytes
+
+        # Live fleet-state table, only touched from the event loop.
+        self.fleet = {}
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.cycles_ingested = 0
+        self.results_ingested = 0
+        self.rejected_batches = 0
+
+        self._queue = None
+        self._server = None
+        self._worker = None
+
+    @property
+    def bound_port(self):
+        return self._server.sockets[0].getsockname()[1] if self._server else None
+
+    async def start(self):
+        self._queue = asyncio.Queue(self.queue_size)
+        # A large backlog so a fleet reconnecting at once is not refused.
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port, backlog=4096)
+        self._worker = asyncio.ensure_future(self._ingest_worker())
+        logger.info(f"Fleet collector listening on {self.host}:{self.bound_port}")
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._worker is not None:
+            await self._queue.join()
+            self._worker.cancel()
+
+    async def drained(self):
+        """Wait until every accepted batch has been ingested."""
+        await self._queue.join()
+
+    def _host_state(self, host):
+        state = self.fleet.get(host)
+        if state is None:
+            state = self.fleet[host] = HostState(host)
+        return state
+
+    async def _handle_connection(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            # ACKs are tiny; do not let Nagle hold them back.
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        state = None
+        try:
+            frame_type, flags, _, body = await read_frame(reader, self.max_frame_bytes)
+            try:
+                hello = decode_payload(flags, body, self.max_frame_bytes) if frame_type == FRAME_HELLO else None
+            except (zlib.error, ValueError):
+                hello = None
+            if not isinstance(hello, dict) or not isinstance(hello.get("host"), str) or not hello["host"]:
+                raise ProtocolError("Expected a HELLO frame naming the host")
+
+            state = self._host_state(hello["host"])
+            state.connections += 1
+            state.address = f"{peer[0]}:{peer[1]}" if peer else None
+
+            while True:
+                frame_type, flags, sequence, body = await read_frame(reader, self.max_frame_bytes)
+                self.frames_received += 1
+                self.bytes_received += _HEADER.size + len(body)
+                if frame_type != FRAME_BATCH:
+                    raise ProtocolError(f"Unexpected frame type {frame_type}")
+
+                try:
+                    cycles = parse_cycles(decode_payload(flags, body, self.max_frame_bytes))
+                except (zlib.error, ValueError) as e:
+                    self.rejected_batches += 1
+                    logger.warning(f"Rejected batch {sequence} from {state.host}: {e}")
+                    writer.write(encode_frame(FRAME_NACK, sequence))
+                    await writer.drain()
+                    continue
+
+                state.last_seen = time.time()
+                state.batches += 1
+                if cycles:
+                    timestamp, results = cycles[-1]
+                    state.last_cycle = timestamp
+                    state.results = results
+                    state.cycles += len(cycles)
+
+                # Blocks (and so stops reading this connection) while the queue is full.
+                await self._queue.put((state.host, cycles))
+                writer.write(encode_frame(FRAME_ACK, sequence))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ProtocolError as e:
+            logger.warning(f"Closing connection from {peer}: {e}")
+        finally:
+            if state is not None:
+                state.connections -= 1
+            writer.close()
+
+    async def _ingest_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            while len(items) < self.ingest_batch and not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            try:
+                scores = await loop.run_in_executor(None, self._ingest, items)
+                for host, entry in scores.items():
+                    state = self.fleet.get(host)
+                    if state is not None:
+                        state.status, state.health = entry["status"], entry["health"]
+            except Exception as e:
+                logger.error(f"Failed to ingest {len(items)} batches: {e}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _ingest(self, items):
+        """Record the batches in history and score each host's latest cycle. Runs in a worker thread."""
+        latest = {}
+        cycles = 0
+        results = 0
+        for host, host_cycles in items:
+            for timestamp, cycle_results in host_cycles:
+                cycles += 1
+                results += len(cycle_results)
+                if self.history is not None:
+                    self.history.record_cycle([_with_host_label(result, host) for result in cycle_results], timestamp)
+            if host_cycles:
+                latest[host] = host_cycles[-1][1]
+        self.cycles_ingested += cycles
+        self.results_ingested += results
+
+        if self.severity_engine is None or not latest:
+            return {}
+        return self.severity_engine.score_hosts(
+            {host: self.severity_engine.metrics_from_results(cycle_results) for host, cycle_results in latest.items()}
+        )
+
+    def summary(self):
+        """Fleet-wide status counts and health from the latest scores."""
+        from tools.severity_engine import SeverityEngine
+
+        scored = {host: {"status": state.status, "health": state.health} for host, state in self.fleet.items() if state.status}
+        summary = SeverityEngine.fleet_health(scored)
+        summary["connected"] = sum(1 for state in self.fleet.values() if state.connected)
+        return summary
+
+
+class FleetAgent:
+    """
+    Async client that pushes batches of cycles to a collector over one
+    persistent connection, with at most `window` batches unacknowledged.
+    """
+
+    def __init__(self, hostname, collector_host, collector_port=DEFAULT_PORT, window=DEFAULT_WINDOW, compress_level=1):
+        self.hostname = hostname
+        self.collector_host = collector_host
+        self.collector_port = collector_port
+        self.window = window
+        self.compress_level = compress_level
+        # Send-to-acknowledgement times, in seconds.
+        self.ack_latencies = []
+        self.rejected = 0
+
+        self._sequence = 0
+        self._unacked = {}
+        self._slots = None
+        self._reader = None
+        self._writer = None
+        self._ack_task = None
+
+    @property
+    def in_flight(self):
+        return len(self._unacked)
+
+    async def connect(self):
+        # A fresh window for this connection; the batches resent below take their slots again.
+        self._slots = asyncio.Semaphore(max(self.window - len(self._unacked), 0))
+        self._reader, self._writer = await asyncio.open_connection(self.collector_host, self.collector_port)
+        sock = self._writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._writer.write(encode_frame(FRAME_HELLO, 0, {"host": self.hostname, "version": PROTOCOL_VERSION}, 0))
+        # Anything sent before a dropped connection may not have arrived.
+        for sequence, (frame, _) in sorted(self._unacked.items()):
+            self._writer.write(frame)
+            self._unacked[sequence] = (frame, time.perf_counter())
+        await self._writer.drain()
+        self._ack_task = asyncio.ensure_future(self._read_acks())
+        return self
+
+    async def _read_acks(self):
+        try:
+            while True:
+                frame_type, _, sequence, _ = await read_frame(self._reader)
+                entry = self._unacked.pop(sequence, None)
+                if entry is None:
+                    continue
+                if frame_type == FRAME_NACK:
+                    self.rejected += 1
+                else:
+                    self.ack_latencies.append(time.perf_counter() - entry[1])
+                self._slots.release()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            # No more acks will arrive on this connection: wake a send() waiting
+            # for a slot so it fails instead of blocking until a reconnect.
+            self._slots.release()
+
+    async def send(self, cycles, timeout=None):
+        """
+        Queue one batch of cycles [(timestamp, [result dicts]), ...]. Waits
+        (up to `timeout` seconds, then asyncio.TimeoutError) while `window`
+        batches are unacknowledged; raises ConnectionError if the connection
+        is lost first. In both cases the batch was not sent.
+        """
+        await asyncio.wait_for(self._slots.acquire(), timeout)
+        if self._ack_task is None or self._ack_task.done():
+            # Pass the wake-up on to any other waiting send().
+            self._slots.release()
+            raise ConnectionError("Not connected to the fleet collector")
+        self._sequence += 1
+        frame = encode_frame(FRAME_BATCH, self._sequence, cycles, self.compress_level)
+        self._unacked[self._sequence] = (frame, time.perf_counter())
+        self._writer.write(frame)
+        try:
+            await self._writer.drain()
+        except ConnectionError:
+            # The batch is already queued for resending after a reconnect; the
+            # ack reader sees the lost connection and the next send() fails.
+            pass
+        return self._sequence
+
+    async def flush(self, timeout=None):
+        """Wait until every sent batch is acknowledged. False on timeout or a lost connection."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._unacked:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            if self._ack_task is None or self._ack_task.done():
+                return False
+            await asyncio.sleep(0.001)
+        return True
+
+    async def close(self):
+        if self._ack_task is not None:
+            self._ack_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+class FleetPusher:
+    """
+    Pushes the daemon's results to a collector from a background thread
+    running a FleetAgent. submit() never blocks: cycles wait in a bounded
+    queue (the oldest is dropped when full) and are sent in batches of up to
+    `max_batch_cycles`. Connection failures are retried with backoff.
+    """
+
+    def __init__(self, hostname, collector_host, collector_port=DEFAULT_PORT, window=DEFAULT_WINDOW,
+                 max_batch_cycles=32, max_queued_cycles=1000, retry_interval=5.0):
+        self.agent = FleetAgent(hostname, collector_host, collector_port, window)
+        self.max_batch_cycles = max_batch_cycles
+        self.retry_interval = retry_interval
+        self.dropped_cycles = 0
+        self._cycles = queue.Queue(max_queued_cycles)
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, fleet_config):
+        return cls(
+            fleet_config.get("hostname") or socket.gethostname(),
+            fleet_config.get("collector_host", "127.0.0.1"),
+            int(fleet_config.get("collector_port", DEFAULT_PORT)),
+            window=int(fleet_config.get("window", DEFAULT_WINDOW)),
+            max_batch_cycles=int(fleet_config.get("max_batch_cycles", 32)),
+            max_queued_cycles=int(fleet_config.get("max_queued_cycles", 1000)),
+        )
+
+    def start(self):
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), name="merlin-fleet", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, results, timestamp=None):
+        cycle = (timestamp if timestamp is not None else time.time(), [result.to_dict() if hasattr(result, "to_dict") else result for result in results])
+        while True:
+            try:
+                self._cycles.put_nowait(cycle)
+                return
+            except queue.Full:
+                try:
+                    self._cycles.get_nowait()
+                    self.dropped_cycles += 1
+                except queue.Empty:
+                    pass
+
+    def _take_batch(self):
+        batch = []
+        while len(batch) < self.max_batch_cycles:
+            try:
+                batch.append(self._cycles.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    async def _run(self):
+        connected = False
+        batch = []
+        while not self._stopping.is_set():
+            if not connected:
+                try:
+                    await self.agent.connect()
+                    connected = True
+                    logger.info(f"Connected to fleet collector {self.agent.collector_host}:{self.agent.collector_port}")
+                except OSError as e:
+                    logger.warning(f"Fleet collector unavailable ({e}); retrying in {self.retry_interval}s")
+                    await asyncio.sleep(self.retry_interval)
+                    continue
+
+            # A batch that could not be sent is retried on the next connection.
+            batch = batch or self._take_batch()
+            if not batch:
+                await asyncio.sleep(0.2)
+                continue
+            try:
+                # Bounded so stop() is seen while the collector is not acknowledging.
+                await self.agent.send(batch, timeout=1.0)
+                batch = []
+            except asyncio.TimeoutError:
+                continue
+            except (ConnectionError, OSError) as e:
+                logger.warning(f"Lost the fleet collector connection: {e}; reconnecting in {self.retry_interval}s")
+                await self.agent.close()
+                connected = False
+                await asyncio.sleep(self.retry_interval)
+
+        if connected:
+            await self.agent.flush(timeout=2.0)
+            await self.agent.close()
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(q / 100.0 * len(ordered))) - 1)]
+
+
+def _synthetic_cycle(host_index, cycle_index, results_per_cycle):
+    timestamp = time.time()
+    usage = (host_index * 7 + cycle_index * 3) % 100
+    results = [
+        {"name": "cpu", "status": "OK", "metrics": {"Usage Percent": float(usage), "IOWait Percent": 0.5}},
+        {"name": "memory", "status": "OK", "metrics": {"Percentage Used": float((usage * 3) % 100), "Swap In Rate": 0.0}},
+    ]
+    for disk in range(max(results_per_cycle - 2, 0)):
+        results.append({
+            "name": "disk", "status": "OK",
+            "metrics": {"Device": f"sd{chr(97 + disk % 26)}", "Average Wait Ms": float(disk % 10), "Utilization Percent": float(usage)},
+        })
+    return timestamp, results
+
+
+def _run_agents(port, agents, batches, cycles_per_batch, results_per_cycle, window, interval, connections_per_second, outcome):
+    """
+    Simulated agents for the benchmark, in their own process so they do not
+    share the collector's loop. Each agent sends a batch every `interval`
+    seconds (phases spread evenly), or as fast as its window allows when 0.
+    """
+
+    async def agent_main(index):
+        agent = FleetAgent(f"agent-{index:05d}", "127.0.0.1", port, window)
+        # Stagger connection setup the way a real fleet's restarts are spread out.
+        await asyncio.sleep(index / connections_per_second)
+        await agent.connect()
+        loop = asyncio.get_running_loop()
+        first_send = loop.time() + interval * index / agents
+        for batch in range(batches):
+            if interval:
+                await asyncio.sleep(max(0.0, first_send + batch * interval - loop.time()))
+            await agent.send([_synthetic_cycle(index, batch * cycles_per_batch + cycle, results_per_cycle)
+                              for cycle in range(cycles_per_batch)])
+        await agent.flush()
+        await agent.close()
+        return agent.ack_latencies
+
+    async def run_all():
+        latencies = []
+        for agent_latencies in await asyncio.gather(*(agent_main(index) for index in range(agents))):
+            latencies.extend(agent_latencies)
+        return latencies
+
+    started = time.perf_counter()
+    latencies = asyncio.run(run_all())
+    outcome.put((time.perf_counter() - started, latencies))
+
+
+async def _benchmark(agents, batches, cycles_per_batch, results_per_cycle, window, interval, history_path):
+    from tools.history_store import HistoryStore
+    from tools.severity_engine import SeverityEngine
+
+    history = HistoryStore(history_path) if history_path else None
+    collector = await FleetCollector("127.0.0.1", 0, history=history, severity_engine=SeverityEngine.from_file()).start()
+
+    outcome = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_run_agents,
+        args=(collector.bound_port, agents, batches, cycles_per_batch, results_per_cycle, window, interval, 2000.0, outcome),
+    )
+    started = time.perf_counter()
+    process.start()
+
+    loop = asyncio.get_running_loop()
+    agent_seconds, latencies = await loop.run_in_executor(None, outcome.get)
+    await collector.drained()
+    elapsed = time.perf_counter() - started
+    await loop.run_in_executor(None, process.join)
+    await collector.stop()
+    if history is not None:
+        history.close()
+
+    milliseconds = [latency * 1000 for latency in latencies]
+    pacing = f"one batch per {interval:g}s each" if interval else "unpaced"
+    print(f"{agents} agents x {batches} batches x {cycles_per_batch} cycles x {results_per_cycle} results, {pacing}")
+    print(f"  ingested {collector.results_ingested} results in {collector.cycles_ingested} cycles over {elapsed:.2f}s "
+          f"(agents finished in {agent_seconds:.2f}s)")
+    print(f"  {collector.results_ingested / elapsed:,.0f} results/s, {collector.frames_received / elapsed:,.0f} batches/s, "
+          f"{collector.bytes_received / elapsed / 1e6:.2f} MB/s on the wire")
+    print("  ack latency ms: " + ", ".join(
+        f"p{q}={_percentile(milliseconds, q):.2f}" for q in (50, 95, 99, 99.9)
+    ) + f", max={max(milliseconds):.2f}")
+    print(f"  fleet: {collector.summary()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect check results pushed by Merlin agents.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    serve = subcommands.add_parser("serve", help="Run the collector")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--history", default=os.path.join(merlin_root_directory, "fleet_history.db"),
+                       help="SQLite history path ('' to disable)")
+    serve.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE)
+
+    bench = subcommands.add_parser("bench", help="Benchmark against simulated agents on loopback")
+    bench.add_argument("--agents", type=int, default=2000)
+    bench.add_argument("--batches", type=int, default=20)
+    bench.add_argument("--cycles-per-batch", type=int, default=1)
+    bench.add_argument("--results-per-cycle", type=int, default=6)
+    bench.add_argument("--window", type=int, default=DEFAULT_WINDOW)
+    bench.add_argument("--interval", type=float, default=1.0,
+                       help="Seconds between an agent's batches; 0 sends as fast as acks allow (saturation)")
+    bench.add_argument("--history", default="", help="SQLite history path to ingest into ('' to skip)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "bench":
+        asyncio.run(_benchmark(args.agents, args.batches, args.cycles_per_batch, args.results_per_cycle, args.window, args.interval, args.history))
+        return
+
+    async def serve_forever():
+        from tools.history_store import HistoryStore
+        from tools.severity_engine import SeverityEngine
+
+        collector = FleetCollector(
+            args.host, args.port,
+            history=HistoryStore(args.history) if args.history else None,
+            severity_engine=SeverityEngine.from_file(),
+            queue_size=args.queue_size,
+        )
+        await collector.start()
+        while True:
+            await asyncio.sleep(60)
+            logger.info(f"Fleet: {collector.summary()} | {collector.results_ingested} results ingested")
+
+    try:
+        asyncio.run(serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Local SQLite time-series history for check results.
+
+Every numeric metric in a result becomes a row in a normalized series table
+(component, metric, labels). Each cycle's samples are inserted in one
+transaction, and the same transaction folds them into 1-minute and 1-hour
+min/max/sum/count rollups. A sample is stored once per series and whole
+second: a repeat (e.g. a batch resent after a reconnect) is ignored by the
+samples table and the rollups alike, so both keep agreeing. Expired rows are pruned a few series at a time in
+short transactions, so pruning never holds the write lock for long. Queries
+read from the finest tier that still covers the requested range.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+script_directory = os.path.dirname(__file__)
+merlin_root_directory = os.path.dirname(script_directory)
+
+DEFAULT_DB_PATH = os.path.join(merlin_root_directory, "diagnostic_history.db")
+
+# Status strings are stored as a numeric "status" metric so they can be graphed.
+STATUS_VALUES = {"OK": 0, "UNKNOWN": 1, "WARN": 2, "CRIT": 3}
+
+# Result metric keys whose string values identify the series (e.g. which disk).
+LABEL_KEYS = ("Host", "Check", "Mount Point", "File System", "Interface", "Device", "Card", "Cgroup", "partition")
+
+TIER_RAW = "raw"
+TIER_MINUTE = "1m"
+TIER_HOUR = "1h"
+
+_ROLLUP_TABLES = {TIER_MINUTE: ("rollup_1m", 60), TIER_HOUR: ("rollup_1h", 3600)}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    component TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    UNIQUE (component, metric, labels)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (series_id, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1m (
+    series_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series_id, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_1h (
+    series_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    sum REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (series_id, bucket)
+) WITHOUT ROWID;
+"""
+
+_INSERT_SAMPLE = "INSERT INTO samples (series_id, ts, value) VALUES (?, ?, ?) ON CONFLICT (series_id, ts) DO NOTHING"
+
+_UPSERT_ROLLUP = """
+INSERT INTO {table} (series_id, bucket, min, max, sum, count) VALUES (?, ?, ?, ?, ?, 1)
+ON CONFLICT (series_id, bucket) DO UPDATE SET
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    sum = sum + excluded.sum,
+    count = count + 1
+"""
+_UPSERT_ROLLUP_1M = _UPSERT_ROLLUP.format(table="rollup_1m")
+_UPSERT_ROLLUP_1H = _UPSERT_ROLLUP.format(table="rollup_1h")
+
+
+def flatten_result(result):
+    """
+    Yield (component, metric, labels, value) for every numeric value in one
+    result (a CheckResult or a result dict). String metrics named in
+    LABEL_KEYS become labels, and one level of nested numeric dicts (e.g.
+    per-core usage) is flattened.
+    """
+    if hasattr(result, "metrics_dict"):
+        yield from _flatten_check_result(result)
+        return
+
+    component = result.get("name", "unknown")
+    metrics = result.get("metrics") or {}
+    labels = json.dumps(
+        {key: metrics[key] for key in LABEL_KEYS if isinstance(metrics.get(key), str)},
+        sort_keys=True, separators=(",", ":"),
+    )
+
+    status = STATUS_VALUES.get(result.get("status"))
+    if status is not None:
+        yield component, "status", labels, float(status)
+
+    for key, value in metrics.items():
+        if isinstance(value, bool):
+            yield component, key, labels, float(value)
+        elif isinstance(value, (int, float)):
+            yield component, key, labels, float(value)
+        elif isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                if isinstance(sub_value, (int, float)) and not isinstance(sub_value, bool):
+                    yield component, f"{key}.{sub_key}", labels, float(sub_value)
+
+
+def _flatten_check_result(result):
+    # CheckResult metrics are already flat ("Per Core Usage.cpu0"), so no dict is built.
+    metrics = result.metrics
+    labels = json.dumps(
+        {metric.name: metric.value for metric in metrics if metric.name in LABEL_KEYS and isinstance(metric.value, str)},
+        sort_keys=True, separators=(",", ":"),
+    )
+
+    status = STATUS_VALUES.get(result.status)
+    if status is not None:
+        yield result.name, "status", labels, float(status)
+
+    for metric in metrics:
+        value = metric.value
+        if isinstance(value, (int, float)):
+            yield result.name, metric.name, labels, float(value)
+
+
+class HistoryStore:
+
+    def __init__(
+        self,
+        path: str = DEFAULT_DB_PATH,
+        raw_retention_days: float = 2,
+        minute_retention_days: float = 14,
+        hour_retention_days: float = 60,
+        prune_batch_series: int = 200,
+    ):
+        self.path = path
+        self.retention_seconds = {
+            TIER_RAW: raw_retention_days * 86400,
+            TIER_MINUTE: minute_retention_days * 86400,
+            TIER_HOUR: hour_retention_days * 86400,
+        }
+        self.prune_batch_series = prune_batch_series
+
+        self._lock = threading.Lock()
+        self._series_ids = {}
+        self._prune_cursor = 0
+
+        new_database = not os.path.exists(path)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if new_database:
+            # Must be set before the first table exists to take effect.
+            self._connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+        self._load_series_ids()
+
+    @classmethod
+    def from_config(cls, database_config):
+        """Build a store from the "database" section of config.json."""
+        return cls(
+            database_config.get("path", DEFAULT_DB_PATH),
+            hour_retention_days=database_config.get("retention_policy_days", 60),
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _load_series_ids(self):
+        self._series_ids = {
+            (component, metric, labels): series_id
+            for series_id, component, metric, labels in self._connection.execute(
+                "SELECT id, component, metric, labels FROM series"
+            )
+        }
+
+    def _series_id(self, key):
+        series_id = self._series_ids.get(key)
+        if series_id is None:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO series (component, metric, labels) VALUES (?, ?, ?)", key
+            )
+            series_id = self._connection.execute(
+                "SELECT id FROM series WHERE component = ? AND metric = ? AND labels = ?", key
+            ).fetchone()[0]
+            self._series_ids[key] = series_id
+        return series_id
+
+    def record_cycle(self, results, timestamp=None):
+        """
+        Insert every numeric metric of one cycle's results in a single
+        transaction. Returns the samples stored; ones already stored for the
+        same second are skipped and not folded into the rollups again.
+        """
+        ts = int(timestamp if timestamp is not None else time.time())
+        minute_bucket = ts - ts % 60
+        hour_bucket = ts - ts % 3600
+
+        rows = []
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = connection.cursor()
+                for result in results:
+                    for component, metric, labels, value in flatten_result(result):
+                        series_id = self._series_id((component, metric, labels))
+                        cursor.execute(_INSERT_SAMPLE, (series_id, ts, value))
+                        if cursor.rowcount:
+                            rows.append((series_id, value))
+
+                connection.executemany(
+                    _UPSERT_ROLLUP_1M,
+                    [(series_id, minute_bucket, value, value, value) for series_id, value in rows],
+                )
+                connection.executemany(
+                    _UPSERT_ROLLUP_1H,
+                    [(series_id, hour_bucket, value, value, value) for series_id, value in rows],
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                # Series inserted in the rolled-back transaction no longer exist.
+                self._load_series_ids()
+                raise
+        return len(rows)
+
+    def prune(self, now=None, vacuum_pages: int = 100):
+        """
+        Delete expired rows for the next batch of series, one short transaction
+        per table. Call once per cycle; a full pass over all series takes
+        ceil(series / prune_batch_series) calls. Returns the rows deleted.
+        """
+        now = now if now is not None else time.time()
+        deleted = 0
+
+        with self._lock:
+            series_ids = sorted(self._series_ids.values())
+            if not series_ids:
+                return 0
+            start = self._prune_cursor % len(series_ids)
+            batch = series_ids[start:start + self.prune_batch_series]
+            self._prune_cursor = start + len(batch)
+
+            for table, column, tier in (("samples", "ts", TIER_RAW), ("rollup_1m", "bucket", TIER_MINUTE), ("rollup_1h", "bucket", TIER_HOUR)):
+                cutoff = int(now - self.retention_seconds[tier])
+                self._connection.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor = self._connection.executemany(
+                        f"DELETE FROM {table} WHERE series_id = ? AND {column} < ?",
+                        [(series_id, cutoff) for series_id in batch],
+                    )
+                    deleted += max(cursor.rowcount, 0)
+                    self._connection.execute("COMMIT")
+                except Exception:
+                    self._connection.execute("ROLLBACK")
+                    raise
+
+            if deleted and vacuum_pages:
+                self._connection.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+
+        return deleted
+
+    def choose_tier(self, start, end, now=None):
+        """Pick the finest tier whose retention still covers `start` and whose resolution suits the span."""
+        now = now if now is not None else time.time()
+        span = end - start
+        age = now - start
+        if age <= self.retention_seconds[TIER_RAW] and span <= 6 * 3600:
+            return TIER_RAW
+        if age <= self.retention_seconds[TIER_MINUTE] and span <= 7 * 86400:
+            return TIER_MINUTE
+        return TIER_HOUR
+
+    def query(self, component, metric, start, end, labels=None, tier=None):
+        """
+        Return {labels_json: [(ts, min, max, avg), ...]} for `metric` of `component`
+        between `start` and `end` (unix seconds). `labels` limits the result to
+        one series, given as the dict of label values. Raw samples report the
+        same value for min, max and avg.
+        """
+        tier = tier or self.choose_tier(start, end)
+        conditions = "s.component = ? AND s.metric = ?"
+        parameters = [component, metric]
+        if labels is not None:
+            conditions += " AND s.labels = ?"
+            parameters.append(json.dumps(labels, sort_keys=True, separators=(",", ":")))
+
+        start = int(start)
+        if tier == TIER_RAW:
+            sql = (f"SELECT s.labels, d.ts, d.value, d.value, d.value FROM series s "
+                   f"JOIN samples d ON d.series_id = s.id "
+                   f"WHERE {conditions} AND d.ts BETWEEN ? AND ? ORDER BY s.labels, d.ts")
+        else:
+            table, width = _ROLLUP_TABLES[tier]
+            # Include the bucket that contains `start`.
+            start -= start % width
+            sql = (f"SELECT s.labels, d.bucket, d.min, d.max, d.sum / d.count FROM series s "
+                   f"JOIN {table} d ON d.series_id = s.id "
+                   f"WHERE {conditions} AND d.bucket BETWEEN ? AND ? ORDER BY s.labels, d.bucket")
+        parameters.extend([start, int(end)])
+
+        series = {}
+        with self._lock:
+            for labels_text, ts, minimum, maximum, average in self._connection.execute(sql, parameters):
+                series.setdefault(labels_text, []).append((ts, minimum, maximum, average))
+        return series
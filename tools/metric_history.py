@@ -0,0 +1,267 @@
+"""
+In-memory ring-buffer history of recent metric samples.
+
+Every numeric metric of every result (the same series as the SQLite history:
+component, metric, labels) gets a fixed-capacity ring of timestamps and
+values stored in two `array('d')` columns, so appending is O(1) and a sample
+costs 16 bytes with no Python object behind it. Windowed queries walk back
+from the newest sample and stop at the window start.
+
+The whole store has a hard memory cap. Once a new series would exceed it,
+series that have not been updated for `max_idle_seconds` are evicted to make
+room; if none have gone idle the new series is refused and its samples are
+counted in `refused_samples`. Evicting live series would not help: every
+cycle updates them all, so each would push out another and the whole store
+would cycle through eviction without ever holding a full window. Memory
+stays flat however long the daemon runs and however many series come and go.
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; percentiles fall back to a sort.
+    numpy = None
+
+from tools.history_store import flatten_result
+
+DEFAULT_SAMPLES_PER_SERIES = 720            # e.g. one hour at a 5s interval
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+# A series not updated for this long belongs to something that went away
+# (an unmounted disk, a removed container) and may be evicted for a new one.
+DEFAULT_MAX_IDLE_SECONDS = 3600.0
+
+# Rough fixed cost of a series beyond its two columns: the ring object, the
+# array headers, the key tuple and its entry in the index.
+SERIES_OVERHEAD_BYTES = 512
+
+
+class SeriesRing:
+
+    __slots__ = ("capacity", "timestamps", "values", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.head = 0
+        self.count = 0
+
+    @property
+    def nbytes(self):
+        return 16 * self.capacity + SERIES_OVERHEAD_BYTES
+
+    def append(self, timestamp, value):
+        head = self.head
+        self.timestamps[head] = timestamp
+        self.values[head] = value
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def last(self):
+        """(timestamp, value) of the newest sample, or None."""
+        if not self.count:
+            return None
+        index = (self.head - 1) % self.capacity
+        return self.timestamps[index], self.values[index]
+
+    def window(self, start=None):
+        """Values with timestamps >= `start` (all when None), oldest first."""
+        capacity = self.capacity
+        timestamps = self.timestamps
+        values = self.values
+        index = self.head
+        selected = []
+        for _ in range(self.count):
+            index = (index - 1) % capacity
+            if start is not None and timestamps[index] < start:
+                break
+            selected.append(values[index])
+        selected.reverse()
+        return selected
+
+    def first_in_window(self, start=None):
+        """(timestamp, value) of the oldest sample with timestamp >= `start`, or None."""
+        capacity = self.capacity
+        oldest = None
+        index = self.head
+        for _ in range(self.count):
+            index = (index - 1) % capacity
+            if start is not None and self.timestamps[index] < start:
+                break
+            oldest = (self.timestamps[index], self.values[index])
+        return oldest
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile (same definition as numpy.percentile's default)."""
+    if not values:
+        return None
+    if numpy is not None:
+        return float(numpy.percentile(numpy.asarray(values), q))
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class MetricHistory:
+
+    def __init__(self, samples_per_series: int = DEFAULT_SAMPLES_PER_SERIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_idle_seconds: float = DEFAULT_MAX_IDLE_SECONDS):
+        self.samples_per_series = samples_per_series
+        self.max_bytes = max_bytes
+        self.max_idle_seconds = max_idle_seconds
+        self.evicted_series = 0
+        self.refused_samples = 0
+        self._series = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._series)
+
+    def resize(self, samples_per_series=None, max_bytes=None):
+        """
+        Change the ring size and/or the memory cap. A new ring size drops the
+        stored samples; a lower cap only limits new series, which are refused
+        until idle series free enough room.
+        """
+        with self._lock:
+            if samples_per_series and samples_per_series != self.samples_per_series:
+                self.samples_per_series = samples_per_series
+                self._series.clear()
+                self._bytes = 0
+            if max_bytes:
+                self.max_bytes = max_bytes
+
+    def _ring_for(self, key, timestamp):
+        ring = self._series.get(key)
+        if ring is not None:
+            self._series.move_to_end(key)
+            return ring
+
+        ring = SeriesRing(self.samples_per_series)
+        # The index is in update order, so idle series are at the front.
+        idle_before = timestamp - self.max_idle_seconds
+        while self._series and self._bytes + ring.nbytes > self.max_bytes:
+            oldest = next(iter(self._series.values())).last()
+            if oldest is not None and oldest[0] > idle_before:
+                break
+            _, evicted = self._series.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evicted_series += 1
+        if self._bytes + ring.nbytes > self.max_bytes:
+            self.refused_samples += 1
+            return None
+        self._series[key] = ring
+        self._bytes += ring.nbytes
+        return ring
+
+    def append(self, component, metric, labels, value, timestamp=None):
+        """Add one sample; `labels` is the JSON label text used by flatten_result."""
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._lock:
+            ring = self._ring_for((component, metric, labels), timestamp)
+            if ring is not None:
+                ring.append(timestamp, value)
+
+    def record(self, results, timestamp=None):
+        """Append every numeric metric of `results` (CheckResults or result dicts)."""
+        timestamp = timestamp if timestamp is not None else time.time()
+        count = 0
+        with self._lock:
+            for result in results:
+                for component, metric, labels, value in flatten_result(result):
+                    ring = self._ring_for((component, metric, labels), timestamp)
+                    if ring is not None:
+                        ring.append(timestamp, value)
+                        count += 1
+        return count
+
+    def series(self, component, metric):
+        """Label texts of every stored series of `metric` in `component`."""
+        with self._lock:
+            return [key[2] for key in self._series if key[0] == component and key[1] == metric]
+
+    def window(self, component, metric, labels="{}", seconds=None, now=None):
+        """Values of one series from the last `seconds` (all stored samples when None), oldest first."""
+        start = None
+        if seconds is not None:
+            start = (now if now is not None else time.time()) - seconds
+        with self._lock:
+            ring = self._series.get((component, metric, labels))
+            return ring.window(start) if ring is not None else []
+
+    def last(self, component, metric, labels="{}"):
+        with self._lock:
+            ring = self._series.get((component, metric, labels))
+            return ring.last() if ring is not None else None
+
+    def rate(self, component, metric, labels="{}", seconds=None, now=None):
+        """Change per second between the oldest and newest sample in the window, or None."""
+        start = None
+        if seconds is not None:
+            start = (now if now is not None else time.time()) - seconds
+        with self._lock:
+            ring = self._series.get((component, metric, labels))
+            if ring is None:
+                return None
+            oldest = ring.first_in_window(start)
+            newest = ring.last()
+        if oldest is None or newest[0] <= oldest[0]:
+            return None
+        return (newest[1] - oldest[1]) / (newest[0] - oldest[0])
+
+    def summary(self, component, metric, labels="{}", seconds=None, percentiles=(50, 95, 99), now=None):
+        """count/min/max/mean and the requested percentiles over the window, or None if it is empty."""
+        values = self.window(component, metric, labels, seconds, now)
+        if not values:
+            return None
+        summary = {
+            "count": len(values),
+            "min": min(values),
+            "max": max(values),
+            "mean": math.fsum(values) / len(values),
+        }
+        for q in percentiles:
+            summary[f"p{q}"] = percentile(values, q)
+        return summary
+
+
+# Shared by run_checks_concurrently (which records every result) and anything
+# that wants to look back, e.g. checks and scoring.
+metric_history = MetricHistory()
+
+
+def configure_metric_history(samples_per_series=None, max_bytes=None):
+    """Resize the shared store in place (see MetricHistory.resize)."""
+    metric_history.resize(samples_per_series, max_bytes)
+    return metric_history
+
+
+def main():
+    history = MetricHistory(samples_per_series=600, max_bytes=4 * 1024 * 1024)
+    now = time.time()
+
+    started = time.perf_counter()
+    for second in range(100000):
+        history.append("cpu", "Usage Percent", "{}", (second % 100) * 1.0, now - 100000 + second)
+    elapsed = time.perf_counter() - started
+
+    print(f"100000 appends in {elapsed * 1000:.1f} ms ({elapsed * 10:.2f} us each)")
+    print(history.summary("cpu", "Usage Percent", seconds=300, now=now))
+    print(f"{len(history)} series, {history.nbytes} bytes of {history.max_bytes}")
+
+if __name__ == "__main__":
+    main()
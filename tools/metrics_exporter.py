@@ -0,0 +1,262 @@
+"""
+Prometheus/OpenMetrics exposition endpoint.
+
+The latest results are rendered into exposition text once per cycle by
+`update()`. The identity and gzip encodings of both the OpenMetrics and the
+classic Prometheus text formats are built at that point. A scrape only picks
+the matching pre-encoded buffer and writes it, so scrapes never trigger a
+collection and cost the same however many scrapers there are.
+
+Label cardinality is bounded per metric family (`max_series_per_family`);
+series past the cap are dropped and counted in
+merlin_exporter_dropped_series.
+"""
+
+import gzip
+import http.client
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tools.history_store import flatten_result
+
+logger = logging.getLogger(__name__)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_MAX_SERIES_PER_FAMILY = 64
+
+_INVALID_NAME_CHARACTERS = re.compile(r"[^a-zA-Z0-9_]+")
+
+
+def metric_name(*parts):
+    name = "_".join(_INVALID_NAME_CHARACTERS.sub("_", part.strip()).strip("_").lower() for part in parts if part)
+    return name if not name[:1].isdigit() else f"_{name}"
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{metric_name(key)}="{_escape_label_value(value)}"' for key, value in sorted(labels.items())) + "}"
+
+
+def _format_value(value):
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_exposition(results, max_series_per_family=DEFAULT_MAX_SERIES_PER_FAMILY, timestamp=None):
+    """
+    Render result dicts into (openmetrics_text, prometheus_text). Every numeric
+    metric becomes a gauge named merlin_<check>_<metric>; identifying strings
+    (mount point, interface, ...) become labels, and nested per-key values
+    (e.g. per-core usage) get a `key` label.
+    """
+    families = {}
+    dropped = 0
+
+    for result in results:
+        for component, metric, labels_text, value in flatten_result(result):
+            labels = json.loads(labels_text)
+            if "." in metric:
+                metric, key = metric.split(".", 1)
+                labels["key"] = key
+            name = metric_name("merlin", component, metric)
+            series = families.setdefault(name, {})
+            label_text = _format_labels(labels)
+            if label_text not in series and len(series) >= max_series_per_family:
+                dropped += 1
+                continue
+            series[label_text] = value
+
+    families[metric_name("merlin", "exporter", "dropped_series")] = {"": float(dropped)}
+    families[metric_name("merlin", "exporter", "last_update_timestamp_seconds")] = {
+        "": float(timestamp if timestamp is not None else time.time())
+    }
+
+    lines = []
+    for name in sorted(families):
+        lines.append(f"# TYPE {name} gauge")
+        for label_text, value in families[name].items():
+            lines.append(f"{name}{label_text} {_format_value(value)}")
+    body = "\n".join(lines) + "\n"
+
+    return body + "# EOF\n", body
+
+
+def accepts(header, value):
+    """
+    Whether an Accept or Accept-Encoding `header` lists `value` (a media type
+    or coding) with a q-value above zero; "gzip;q=0" refuses gzip. The "*"
+    coding counts, but not media ranges such as */*, so a generic client
+    still gets the classic text format.
+    """
+    allowed = False
+    for item in header.split(","):
+        name, *parameters = (part.strip() for part in item.split(";"))
+        name = name.lower()
+        if name not in (value, "*"):
+            continue
+        quality = 1.0
+        for parameter in parameters:
+            key, _, text = parameter.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(text)
+                except ValueError:
+                    quality = 0.0
+        if name == value:
+            # An exact entry overrides any wildcard, e.g. "*, gzip;q=0".
+            return quality > 0
+        allowed = allowed or quality > 0
+    return allowed
+
+
+class _Snapshot:
+    """Pre-encoded response bodies for one rendered cycle."""
+
+    __slots__ = ("openmetrics", "openmetrics_gzip", "prometheus", "prometheus_gzip")
+
+    def __init__(self, openmetrics_text, prometheus_text):
+        self.openmetrics = openmetrics_text.encode("utf-8")
+        self.prometheus = prometheus_text.encode("utf-8")
+        # mtime=0 keeps the gzip bytes identical for identical bodies.
+        self.openmetrics_gzip = gzip.compress(self.openmetrics, compresslevel=6, mtime=0)
+        self.prometheus_gzip = gzip.compress(self.prometheus, compresslevel=6, mtime=0)
+
+
+class _ExpositionHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive
+    # scrapers wait out the peer's delayed ACK (~40 ms) on every response.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+
+        snapshot = self.server.exporter.snapshot
+        wants_openmetrics = accepts(self.headers.get("Accept", ""), "application/openmetrics-text")
+        wants_gzip = accepts(self.headers.get("Accept-Encoding", ""), "gzip")
+
+        if wants_openmetrics:
+            content_type = OPENMETRICS_CONTENT_TYPE
+            body = snapshot.openmetrics_gzip if wants_gzip else snapshot.openmetrics
+        else:
+            content_type = PROMETHEUS_CONTENT_TYPE
+            body = snapshot.prometheus_gzip if wants_gzip else snapshot.prometheus
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if wants_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the log files.
+        pass
+
+
+class _ExpositionServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+    # Many scrapers may connect at once; the default backlog of 5 makes the
+    # kernel drop SYNs and the client retry a second later.
+    request_queue_size = 256
+
+
+class MetricsExporter:
+
+    def __init__(self, host="0.0.0.0", port=9464, max_series_per_family=DEFAULT_MAX_SERIES_PER_FAMILY):
+        self.host = host
+        self.port = port
+        self.max_series_per_family = max_series_per_family
+        self.snapshot = _Snapshot(*render_exposition([], max_series_per_family))
+        self._server = None
+        self._thread = None
+
+    def update(self, results):
+        """Render `results` once and swap in the new buffers for all later scrapes."""
+        # Attribute assignment is atomic, so scrapes see either the old or the new snapshot.
+        self.snapshot = _Snapshot(*render_exposition(results, self.max_series_per_family))
+
+    def start(self):
+        self._server = _ExpositionServer((self.host, self.port), _ExpositionHandler)
+        self._server.exporter = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="merlin-exporter", daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def scrape(connection, openmetrics=True, gzip_encoding=True):
+    """Fetch /metrics over an open (keep-alive) connection; returns (seconds, decoded body)."""
+    headers = {}
+    if openmetrics:
+        headers["Accept"] = "application/openmetrics-text; version=1.0.0"
+    if gzip_encoding:
+        headers["Accept-Encoding"] = "gzip"
+    started = time.perf_counter()
+    connection.request("GET", "/metrics", headers=headers)
+    response = connection.getresponse()
+    body = response.read()
+    elapsed = time.perf_counter() - started
+    if response.getheader("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return elapsed, body.decode("utf-8")
+
+
+def benchmark(host, port, scrapers=16, scrapes_per_scraper=200):
+    """Scrape from `scrapers` concurrent keep-alive clients; returns sorted latencies in seconds."""
+
+    def run_scraper(_):
+        connection = http.client.HTTPConnection(host, port)
+        try:
+            return [scrape(connection)[0] for _ in range(scrapes_per_scraper)]
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=scrapers) as pool:
+        return sorted(latency for latencies in pool.map(run_scraper, range(scrapers)) for latency in latencies)
+
+
+def main():
+    from main.checks.run_all_checks import run_all_checks
+
+    exporter = MetricsExporter(host="127.0.0.1", port=0).start()
+    exporter.update(run_all_checks())
+
+    connection = http.client.HTTPConnection("127.0.0.1", exporter.port)
+    print(scrape(connection)[1])
+    connection.close()
+
+    latencies = benchmark("127.0.0.1", exporter.port)
+    print(f"{len(latencies)} scrapes from 16 concurrent scrapers | "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.3f} ms | p99 {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms")
+    exporter.stop()
+
+if __name__ == "__main__":
+    main()
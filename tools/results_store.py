@@ -0,0 +1,282 @@
+"""
+Append-only JSON Lines store for check results.
+
+Each record is written as one line of JSON. Appends are buffered in memory and
+written with a single write per flush (once per collection cycle), so the cost
+of recording a result no longer depends on how large the history has grown.
+
+The first line of every active file is a header, {"segment_started": <epoch>},
+so its age survives restarts and one-shot runs; read_results skips it.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024      # rotate once the active file reaches 50 MiB
+DEFAULT_MAX_AGE_SECONDS = 24 * 60 * 60    # ...or once it is a day old
+DEFAULT_BACKUP_COUNT = 7                  # rotated segments kept on disk
+DEFAULT_BUFFER_RECORDS = 10000            # force a flush if a cycle buffers this many records
+
+SEGMENT_HEADER_KEY = "segment_started"
+
+
+def _encode_default(value):
+    # Typed results (main.checks.result.CheckResult) serialize through to_dict().
+    to_dict = getattr(value, "to_dict", None)
+    return to_dict() if to_dict is not None else str(value)
+
+
+class ResultsStore:
+    """
+    Buffered, append-only writer for a JSON Lines results file with size and
+    age based rotation. Safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        backup_count: int = DEFAULT_BACKUP_COUNT,
+        buffer_records: int = DEFAULT_BUFFER_RECORDS,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.backup_count = backup_count
+        self.buffer_records = buffer_records
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._opened_at = self._file_created_at()
+
+    def append(self, record) -> None:
+        """Queue `record` for the next flush; it is only encoded when written."""
+        with self._lock:
+            self._buffer.append(record)
+            if len(self._buffer) >= self.buffer_records:
+                self._flush_locked()
+
+    def flush(self) -> int:
+        """Write every buffered record in one append. Returns the number written."""
+        with self._lock:
+            return self._flush_locked()
+
+    def close(self) -> None:
+        self.flush()
+
+    def _flush_locked(self) -> int:
+        if not self._buffer:
+            return 0
+
+        if self._should_rotate():
+            self._rotate()
+
+        lines = [
+            json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=_encode_default) for record in self._buffer
+        ]
+        count = len(self._buffer)
+        self._buffer.clear()
+
+        if self._active_size() == 0:
+            # A new active file: stamp when it was started.
+            self._opened_at = time.time()
+            lines.insert(0, json.dumps({SEGMENT_HEADER_KEY: self._opened_at}, separators=(",", ":")))
+        payload = "\n".join(lines) + "\n"
+
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(payload)
+
+        return count
+
+    def _file_created_at(self) -> float:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                first_line = file.readline()
+        except OSError:
+            # No active file yet; the first flush stamps a new one.
+            return time.time()
+        try:
+            return float(json.loads(first_line)[SEGMENT_HEADER_KEY])
+        except (ValueError, TypeError, KeyError):
+            pass
+
+        # A file written before headers: the last write to the newest rotated
+        # segment is when it was started, and failing that, its own last write
+        # is the earliest time it is known to have existed.
+        for candidate in rotated_segments(self.path)[-1:] + [self.path]:
+            try:
+                return os.path.getmtime(candidate)
+            except OSError:
+                pass
+        return time.time()
+
+    def _active_size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def _should_rotate(self) -> bool:
+        size = self._active_size()
+        if size == 0:
+            return False
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        if self.max_age_seconds and time.time() - self._opened_at >= self.max_age_seconds:
+            return True
+        return False
+
+    def _rotate(self) -> None:
+        base_path = f"{self.path}.{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}"
+        rotated_path = base_path
+        suffix = 1
+        while os.path.exists(rotated_path):
+            rotated_path = f"{base_path}.{suffix}"
+            suffix += 1
+
+        os.replace(self.path, rotated_path)
+        self._opened_at = time.time()
+        logger.info(f"Rotated results file {self.path} to {rotated_path}")
+
+        segments = rotated_segments(self.path)
+        expired = segments[:-self.backup_count] if self.backup_count else segments
+        for stale_path in expired:
+            try:
+                os.remove(stale_path)
+                logger.info(f"Removed expired results segment {stale_path}")
+            except OSError as e:
+                logger.error(f"Failed to remove expired results segment {stale_path}: {e}")
+
+
+def rotated_segments(path: str):
+    """Return the rotated segments of `path`, oldest first."""
+    directory = os.path.dirname(path) or "."
+    prefix = os.path.basename(path) + "."
+    try:
+        names = [
+            name for name in os.listdir(directory)
+            if name.startswith(prefix) and name[len(prefix):][:1].isdigit()
+        ]
+    except OSError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+def read_results(path: str, include_rotated: bool = True):
+    """
+    Stream records back from a JSON Lines results file one at a time, oldest
+    first. Rotated segments are read before the active file. Segment headers
+    are skipped, and lines that fail to decode (e.g. a torn final write) are
+    logged and skipped.
+    """
+    paths = rotated_segments(path) if include_rotated else []
+    paths.append(path)
+
+    for segment in paths:
+        try:
+            file = open(segment, "r", encoding="utf-8")
+        except FileNotFoundError:
+            continue
+
+        with file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    logger.error(f"Skipping unreadable record at {segment}:{line_number}: {e}")
+                    continue
+                if isinstance(record, dict) and len(record) == 1 and SEGMENT_HEADER_KEY in record:
+                    continue
+                yield record
+
+
+def iter_json_list(path: str, chunk_size: int = 1024 * 1024):
+    """
+    Incrementally decode the elements of a top-level JSON list (the legacy
+    check_results.json layout) without loading the whole document.
+    """
+    decoder = json.JSONDecoder()
+    separators = ", \r\n\t"
+
+    with open(path, "r", encoding="utf-8") as file:
+        buffer = file.read(chunk_size).lstrip()
+        if not buffer:
+            return
+        if buffer[0] != "[":
+            # A single object rather than a list: treat it as one record.
+            yield json.loads(buffer + file.read())
+            return
+
+        position = 1
+        eof = False
+        while True:
+            while position < len(buffer) and buffer[position] in separators:
+                position += 1
+
+            if position < len(buffer) and buffer[position] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+                # A scalar ending exactly at the chunk edge may be truncated.
+                complete = eof or end < len(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+
+            if not complete:
+                # The next record straddles the chunk boundary: drop what has
+                # been consumed and read more.
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            position = end
+            yield record
+
+
+def migrate_json_results(json_path: str, jsonl_path: str) -> int:
+    """
+    One-time conversion of a list-shaped results file into JSON Lines. The
+    legacy file is renamed to `<json_path>.migrated` once every record has been
+    copied, so the migration never runs twice. Returns the number of records.
+    """
+    if not os.path.exists(json_path):
+        return 0
+
+    count = 0
+    temporary_path = json_path + ".migrating"
+    try:
+        with open(temporary_path, "w", encoding="utf-8") as output:
+            for record in iter_json_list(json_path):
+                output.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str))
+                output.write("\n")
+                count += 1
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"Failed to migrate {json_path} to JSON Lines: {e}")
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        return 0
+
+    # Any records already appended to the new file come after the migrated history.
+    if os.path.exists(jsonl_path):
+        with open(temporary_path, "a", encoding="utf-8") as output, open(jsonl_path, "r", encoding="utf-8") as existing:
+            for line in existing:
+                output.write(line)
+
+    os.replace(temporary_path, jsonl_path)
+    os.replace(json_path, json_path + ".migrated")
+    logger.info(f"Migrated {count} records from {json_path} to {jsonl_path}")
+    return count
@@ -0,0 +1,338 @@
+"""
+Severity-driven cumulative scoring (see reference_images/).
+
+Each component's metrics carry warning/critical levels and a weight. A metric
+classified CRIT adds its weight to the component's critical subtotal, a WARN
+metric to its warning subtotal. The component is CRIT when the critical
+subtotal reaches `critical_score` (5), WARN when the warning subtotal reaches
+`warning_score` (3), and OK otherwise. Any insta-fail flag makes the component
+CRIT regardless of score.
+
+The rules are compiled once into per-component threshold/weight arrays so a
+whole batch of hosts is scored in one pass: a NumPy matrix operation when
+NumPy is installed, a tight pure-Python loop otherwise.
+"""
+
+import json
+import math
+import os
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional; the pure-Python path gives the same results.
+    numpy = None
+
+script_directory = os.path.dirname(__file__)
+merlin_root_directory = os.path.dirname(script_directory)
+
+DEFAULT_RULES_PATH = os.path.join(merlin_root_directory, "outdated", "severity_rules.json")
+
+STATUS_OK = "OK"
+STATUS_WARN = "WARN"
+STATUS_CRIT = "CRIT"
+STATUS_RANK = {STATUS_OK: 0, STATUS_WARN: 1, STATUS_CRIT: 2}
+
+# Check names and threshold keys used elsewhere in Merlin, mapped to rule components.
+COMPONENT_ALIASES = {"memory": "RAM", "ram": "RAM", "cpu": "CPU", "disk": "Disk", "network": "Network", "gpu": "GPU"}
+
+# Result metric keys reported by the checks, mapped to rule metric names.
+RESULT_METRIC_ALIASES = {
+    "CPU": {"Usage Percent": "usage"},
+    "Disk": {"Average Wait Ms": "io_wait_time"},
+    "RAM": {"Percentage Used": "usage", "Swap In Rate": "swap_fault_rate"},
+    "Network": {
+        "Packet Loss Percent": "packet_loss",
+        "Error Rate": "interface_errors",
+        "Link Speed Mbps": "link_speed_drop",
+        "Link Flaps": "disconnection_rate",
+    },
+    "GPU": {
+        "Temperature Celsius": "temperature",
+        "Memory Used Percent": "memory_usage",
+        "Utilization Percent": "utilization",
+        "Fan Failure": "fan_failure",
+    },
+}
+
+_INF = float("inf")
+_NAN = float("nan")
+
+
+class CompiledComponent:
+    """
+    Array-backed scoring table for one component. Thresholds are stored
+    pre-multiplied by the metric's direction (+1 when higher is worse, -1 when
+    lower is worse, e.g. link speed), so classification is always `value >= level`.
+    """
+
+    __slots__ = ("name", "metric_names", "index", "direction", "warn", "crit", "weight", "insta_fail",
+                 "total_weight", "_np_direction", "_np_warn", "_np_crit", "_np_weight")
+
+    def __init__(self, name, rule):
+        self.name = name
+        self.metric_names = []
+        self.direction = []
+        self.warn = []
+        self.crit = []
+        self.weight = []
+
+        for metric in rule.get("metrics", []):
+            warning = metric.get("warning")
+            critical = metric.get("critical")
+            if metric.get("critical_only") or isinstance(critical, bool):
+                # Boolean condition (throttling, SMART failure, ...): any truthy value is CRIT.
+                direction, warning, critical = 1.0, _INF, 1.0
+            else:
+                warning = _INF if warning is None else float(warning)
+                critical = _INF if critical is None else float(critical)
+                direction = -1.0 if warning != _INF and critical != _INF and critical < warning else 1.0
+
+            self.metric_names.append(metric["name"])
+            self.direction.append(direction)
+            self.warn.append(warning * direction)
+            self.crit.append(critical * direction)
+            self.weight.append(float(metric.get("weight", 1)))
+
+        self.index = {metric_name: position for position, metric_name in enumerate(self.metric_names)}
+        self.insta_fail = tuple(rule.get("insta_fail", ()))
+        self.total_weight = sum(self.weight) or 1.0
+
+        if numpy is not None:
+            self._np_direction = numpy.array(self.direction)
+            self._np_warn = numpy.array(self.warn)
+            self._np_crit = numpy.array(self.crit)
+            self._np_weight = numpy.array(self.weight)
+
+    def vectorize(self, metric_rows):
+        """
+        Turn a list of {metric_name: value} dicts into a row-major value matrix
+        (missing metrics are NaN and never trip a threshold) plus an insta-fail
+        flag per row. Insta-fail names may appear as truthy metric values.
+        """
+        width = len(self.metric_names)
+        index = self.index
+        matrix = []
+        insta = []
+        for row in metric_rows:
+            values = [_NAN] * width
+            failed = False
+            for metric_name, value in row.items():
+                position = index.get(metric_name)
+                if position is not None:
+                    values[position] = _NAN if value is None else float(value)
+                elif value and metric_name in self.insta_fail:
+                    failed = True
+            matrix.append(values)
+            insta.append(failed)
+        return matrix, insta
+
+
+class ComponentScores:
+    """Scores for a batch of rows of one component, in input order."""
+
+    __slots__ = ("component", "statuses", "critical_subtotals", "warning_subtotals", "health")
+
+    def __init__(self, component, statuses, critical_subtotals, warning_subtotals, health):
+        self.component = component
+        self.statuses = statuses
+        self.critical_subtotals = critical_subtotals
+        self.warning_subtotals = warning_subtotals
+        self.health = health
+
+    def row(self, position):
+        return {
+            "status": self.statuses[position],
+            "critical_subtotal": self.critical_subtotals[position],
+            "warning_subtotal": self.warning_subtotals[position],
+            "health": self.health[position],
+        }
+
+
+class SeverityEngine:
+
+    def __init__(self, rules, critical_score: float = 5, warning_score: float = 3, use_numpy: bool = True):
+        self.critical_score = critical_score
+        self.warning_score = warning_score
+        self.use_numpy = use_numpy and numpy is not None
+        self.components = {name: CompiledComponent(name, rule) for name, rule in rules.items()}
+        self._lookup = {name.lower(): name for name in self.components}
+        self._lookup.update({alias: name for alias, name in COMPONENT_ALIASES.items() if name in self.components})
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_RULES_PATH, **kwargs):
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file), **kwargs)
+
+    def component(self, name):
+        try:
+            return self.components[self._lookup.get(name.lower(), name)]
+        except KeyError:
+            raise KeyError(f"No severity rules for component {name!r}") from None
+
+    def score_component(self, component_name, metric_rows):
+        """Score a batch of {metric_name: value} dicts for one component."""
+        component = self.component(component_name)
+        matrix, insta = component.vectorize(metric_rows)
+        return self.score_matrix(component, matrix, insta)
+
+    def score_matrix(self, component, matrix, insta_fail=None):
+        """
+        Score a pre-built value matrix (rows x component.metric_names). This is
+        the hot path: one vectorized pass over the whole batch.
+        """
+        if isinstance(component, str):
+            component = self.component(component)
+        rows = len(matrix)
+        if insta_fail is None:
+            insta_fail = [False] * rows
+        if rows == 0:
+            return ComponentScores(component.name, [], [], [], [])
+
+        if self.use_numpy:
+            critical, warning = self._subtotals_numpy(component, matrix)
+        else:
+            critical, warning = self._subtotals_python(component, matrix)
+
+        critical_score = self.critical_score
+        warning_score = self.warning_score
+        total_weight = component.total_weight
+        statuses = []
+        health = []
+        for position in range(rows):
+            critical_subtotal = critical[position]
+            warning_subtotal = warning[position]
+            if insta_fail[position] or critical_subtotal >= critical_score:
+                statuses.append(STATUS_CRIT)
+            elif warning_subtotal >= warning_score:
+                statuses.append(STATUS_WARN)
+            else:
+                statuses.append(STATUS_OK)
+            if insta_fail[position]:
+                health.append(0.0)
+            else:
+                penalty = (critical_subtotal + 0.5 * warning_subtotal) / total_weight
+                health.append(round(100.0 * max(0.0, 1.0 - penalty), 1))
+
+        return ComponentScores(component.name, statuses, critical, warning, health)
+
+    @staticmethod
+    def _subtotals_numpy(component, matrix):
+        values = numpy.asarray(matrix, dtype=float) * component._np_direction
+        # NaN compares False, so missing metrics contribute nothing.
+        with numpy.errstate(invalid="ignore"):
+            is_critical = values >= component._np_crit
+            is_warning = (values >= component._np_warn) & ~is_critical
+        return (is_critical @ component._np_weight).tolist(), (is_warning @ component._np_weight).tolist()
+
+    @staticmethod
+    def _subtotals_python(component, matrix):
+        table = list(zip(component.direction, component.warn, component.crit, component.weight))
+        critical_subtotals = []
+        warning_subtotals = []
+        for values in matrix:
+            critical = 0.0
+            warning = 0.0
+            for value, (direction, warn, crit, weight) in zip(values, table):
+                value *= direction
+                if value >= crit:
+                    critical += weight
+                elif value >= warn:
+                    warning += weight
+            critical_subtotals.append(critical)
+            warning_subtotals.append(warning)
+        return critical_subtotals, warning_subtotals
+
+    def score_hosts(self, hosts):
+        """
+        Score many hosts at once. `hosts` maps host -> {component: {metric: value}}.
+        Each component is scored as one batch across every host that reported
+        it. Returns host -> {"status", "health", "components": {component: scores}}.
+        """
+        batches = {}
+        for host, components in hosts.items():
+            for component_name, metrics in components.items():
+                try:
+                    name = self.component(component_name).name
+                except KeyError:
+                    continue
+                batch = batches.setdefault(name, ([], []))
+                batch[0].append(host)
+                batch[1].append(metrics)
+
+        host_scores = {host: {"status": STATUS_OK, "health": 100.0, "components": {}} for host in hosts}
+        for name, (batch_hosts, metric_rows) in batches.items():
+            scores = self.score_component(name, metric_rows)
+            for position, host in enumerate(batch_hosts):
+                host_scores[host]["components"][name] = scores.row(position)
+
+        for entry in host_scores.values():
+            components = entry["components"].values()
+            if components:
+                entry["status"] = max((score["status"] for score in components), key=STATUS_RANK.get)
+                entry["health"] = min(score["health"] for score in components)
+        return host_scores
+
+    def metrics_from_results(self, results):
+        """
+        Collapse one host's check result dicts into {component: {metric: value}}.
+        When a check reports several results (e.g. one per disk) the worst value
+        of each metric is kept. Results may also carry rule-named values
+        directly under a "severity_metrics" key.
+        """
+        collected = {}
+        for result in results:
+            component_name = COMPONENT_ALIASES.get(str(result.get("name", "")).lower())
+            if component_name not in self.components:
+                continue
+            component = self.components[component_name]
+
+            aliases = RESULT_METRIC_ALIASES.get(component_name, {})
+            values = {aliases[key]: value for key, value in (result.get("metrics") or {}).items() if key in aliases}
+            values.update(result.get("severity_metrics") or {})
+
+            merged = collected.setdefault(component_name, {})
+            for metric_name, value in values.items():
+                if isinstance(value, bool):
+                    value = 1.0 if value else 0.0
+                if not isinstance(value, (int, float)):
+                    continue
+                position = component.index.get(metric_name)
+                direction = component.direction[position] if position is not None else 1.0
+                current = merged.get(metric_name)
+                if current is None or value * direction > current * direction:
+                    merged[metric_name] = value
+        return collected
+
+    @staticmethod
+    def fleet_health(host_scores):
+        """Summarize host scores into fleet-wide status counts and health."""
+        counts = {STATUS_OK: 0, STATUS_WARN: 0, STATUS_CRIT: 0}
+        health = []
+        for entry in host_scores.values():
+            counts[entry["status"]] += 1
+            health.append(entry["health"])
+
+        if not health:
+            return {"hosts": 0, "status_counts": counts, "mean_health": None, "min_health": None, "status": STATUS_OK}
+
+        status = STATUS_CRIT if counts[STATUS_CRIT] else STATUS_WARN if counts[STATUS_WARN] else STATUS_OK
+        return {
+            "hosts": len(health),
+            "status_counts": counts,
+            "mean_health": round(math.fsum(health) / len(health), 1),
+            "min_health": min(health),
+            "status": status,
+        }
+
+
+def main():
+    engine = SeverityEngine.from_file()
+    example = {
+        "localhost": {"RAM": {"usage": 92, "ecc_errors": 0, "temperature": 40, "swap_fault_rate": 60}},
+    }
+    scores = engine.score_hosts(example)
+    print(scores)
+    print(SeverityEngine.fleet_health(scores))
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,93 @@
 import os
-import json
+import atexit
+import threading
 
-def write_to_check_results(data, filename ="check_results.json"):
-    
-    script_directory = os.path.dirname(__file__)
-    merlin_root_directory = os.path.dirname(script_directory)
+from tools.results_store import ResultsStore, migrate_json_results, read_results
 
-    full_path = os.path.join(merlin_root_directory, "check_results.json")
+script_directory = os.path.dirname(__file__)
+merlin_root_directory = os.path.dirname(script_directory)
 
-    # check if the file exists
-    if os.path.exists(full_path):
-        with open(full_path, 'r', encoding = 'utf-8') as file:
-            try:
-                existing_data = json.load(file)
-                if not isinstance(existing_data, list):
-                    existing_data = [existing_data]
-            except json.JSONDecodeError:
-                existing_data = []
-    else:
-        existing_data = []
+_stores = {}
+_stores_lock = threading.Lock()
 
-    existing_data.append(data)
+# Set by configure_result_emission(); None writes every record in full.
+_emitter = None
+
+
+def _results_path(filename):
+    """Map a legacy `*.json` results filename onto its JSON Lines counterpart."""
+    base_name = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(merlin_root_directory, f"{base_name}.jsonl")
+
+
+def get_results_store(filename="check_results.json"):
+    """
+    Return the shared append-only store for `filename`, migrating the legacy
+    list-shaped JSON file the first time it is opened.
+    """
+    with _stores_lock:
+        store = _stores.get(filename)
+        if store is None:
+            legacy_path = os.path.join(merlin_root_directory, os.path.basename(filename))
+            jsonl_path = _results_path(filename)
+            if legacy_path != jsonl_path:
+                migrate_json_results(legacy_path, jsonl_path)
+
+            store = ResultsStore(jsonl_path)
+            _stores[filename] = store
+        return store
+
+
+def write_to_check_results(data, filename="check_results.json"):
+    """
+    Queue one result record for the results file. Records are buffered and
+    written by `flush_check_results()`, which `run_all_checks` calls once per
+    cycle, instead of rewriting the whole file on every call.
+
+    In delta emission mode the record is reduced to what changed since it was
+    last written, or dropped (see tools.delta_emission).
+    """
+    emitter = _emitter
+    if emitter is not None:
+        data = emitter.filter_record(data)
+        if data is None:
+            return
+    get_results_store(filename).append(data)
+
+
+def configure_result_emission(emission_config=None):
+    """
+    Select full or change-only emission from the "emission" config section,
+    e.g. {"mode": "delta", "relative_deadband": 0.01, "heartbeat_sec": 600}.
+    Returns the DeltaEmitter in use, or None in full mode.
+    """
+    from tools.delta_emission import MODE_DELTA, DeltaEmitter
+
+    global _emitter
+    emission_config = emission_config or {}
+    _emitter = DeltaEmitter.from_config(emission_config) if emission_config.get("mode") == MODE_DELTA else None
+    return _emitter
+
+
+def flush_check_results():
+    """Write every buffered record to disk. Returns the number of records written."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    return sum(store.flush() for store in stores)
+
+
+def read_check_results(filename="check_results.json"):
+    """Stream previously written records back, oldest first."""
+    get_results_store(filename)
+    return read_results(_results_path(filename))
+
+
+atexit.register(flush_check_results)
 
-    with open(full_path, 'w', encoding='utf-8') as file:
-        json.dump(existing_data, file, ensure_ascii=False, indent=2)
 
 def main():
-    write_to_check_results()
+    count = sum(1 for _ in read_check_results())
+    print(f"{count} records in {_results_path('check_results.json')}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()